@@ -2,6 +2,8 @@
 ASGI config for clothing_factory project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the app through it (e.g. uvicorn) for the /async/ views, including the
+live-update stream at /async/events/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,15 +46,37 @@ INSTALLED_APPS = [
     'production_tracker',
 ]
 
+# How the API resolves the user behind a bearer token (API_AUTHENTICATION):
+#   jwt              query the user on every request (simplejwt's JWTAuthentication).
+#   cached           cache the user until the token expires; saving or deleting
+#                    the user drops the entry.
+#   stateless-reads  serve GET/HEAD/OPTIONS as a TokenUser built from the token's
+#                    claims with no query; other methods as "cached". A
+#                    deactivated user keeps read access until the token expires.
+# Compare them with `manage.py benchmark_auth`.
+
+API_AUTHENTICATION_CLASSES = {
+    "jwt": "rest_framework_simplejwt.authentication.JWTAuthentication",
+    "cached": "production_tracker.authentication.CachedJWTAuthentication",
+    "stateless-reads": "production_tracker.authentication.StatelessReadJWTAuthentication",
+}
+API_AUTHENTICATION = os.environ.get("API_AUTHENTICATION", "cached")
+if API_AUTHENTICATION not in API_AUTHENTICATION_CLASSES:
+    raise ImproperlyConfigured(f"Unknown API_AUTHENTICATION mode {API_AUTHENTICATION!r}.")
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        API_AUTHENTICATION_CLASSES[API_AUTHENTICATION],
+    ),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticated',
+    ),
 }
 
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'production_tracker.instrumentation.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,15 +111,98 @@ WSGI_APPLICATION = 'clothing_factory.wsgi.application'
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME": "clothing",
-        "USER": "postgres",
-        "PASSWORD": "1234",
-        "HOST": "127.0.0.1",
-        "PORT": "5432",
+        "NAME": os.environ.get("DB_NAME", "clothing"),
+        "USER": os.environ.get("DB_USER", "postgres"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", "1234"),
+        "HOST": os.environ.get("DB_HOST", "127.0.0.1"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+    }
+}
+
+# How each worker process holds its database connections (DB_CONNECTIONS):
+#   per-request  open a connection for every request and close it afterwards.
+#   persistent   keep each thread's connection open for DB_CONN_MAX_AGE seconds.
+#   pool         share a psycopg pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+#                connections between the worker's threads.
+# Persistent and pooled connections are health-checked before reuse. A worker
+# never uses more connections than it has threads, so the pool defaults to
+# GUNICORN_THREADS; keep workers x pool size below PostgreSQL's max_connections.
+# Under ASGI (the /async/ views) use "pool": persistent connections are held per
+# thread, and ASGI runs every request's sync code on a thread of its own.
+# `manage.py benchmark_connections` compares the modes.
+
+DB_CONNECTIONS = os.environ.get("DB_CONNECTIONS", "persistent")
+
+if DB_CONNECTIONS == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", "600"))
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif DB_CONNECTIONS == "pool":
+    _threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "1")),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", str(_threads))),
+            # Seconds a request waits for a free connection before failing.
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            # Seconds a connection may sit idle before the pool closes it.
+            "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", "600")),
+        },
+    }
+elif DB_CONNECTIONS != "per-request":
+    raise ImproperlyConfigured(f"Unknown DB_CONNECTIONS mode {DB_CONNECTIONS!r}.")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The dashboard snapshot and the API's ETag/Last-Modified markers are updated
+# from model signals, so deployments with more than one worker process must
+# point this at a shared backend (Redis, Memcached) for changes to reach every
+# worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
     }
 }
 
 
+# Dashboard counts (production_tracker/counts.py)
+# "approximate" takes the order, customer and vendor totals from the table
+# statistics once a table passes counts.EXACT_COUNT_LIMIT rows, so the dashboard
+# never scans a large table; completed orders are then the total less the
+# pending and in-progress orders, which are always counted exactly, as are the
+# stages in progress and the invoice tiles. "exact" counts everything.
+
+DASHBOARD_COUNTS = os.environ.get("DASHBOARD_COUNTS", "approximate")
+if DASHBOARD_COUNTS not in ("approximate", "exact"):
+    raise ImproperlyConfigured(f"Unknown DASHBOARD_COUNTS mode {DASHBOARD_COUNTS!r}.")
+
+
+# Request instrumentation (production_tracker/instrumentation.py)
+# A sampled request gets a Server-Timing header and is counted in the per-view
+# histograms at /metrics; sampled requests slower than SLOW_REQUEST_MS are
+# logged with their SQL. Lower the sample rate on busy deployments. Set
+# METRICS_TOKEN to let Prometheus scrape with a bearer token; without it
+# /metrics is open to logged-in staff only.
+
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get("REQUEST_METRICS_SAMPLE_RATE", "1.0"))
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "production_tracker.slow_requests": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,12 @@
+# gunicorn -c gunicorn.conf.py clothing_factory.wsgi
+#
+# Each worker holds at most one database connection per thread (see
+# DB_CONNECTIONS in clothing_factory/settings.py), so WEB_CONCURRENCY x
+# GUNICORN_THREADS is the most connections the app will open.
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+worker_class = 'gthread' if threads > 1 else 'sync'
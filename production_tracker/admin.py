@@ -1,9 +1,35 @@
 from django.contrib import admin
+from .customers import filter_customers
+from .forms import StageChoiceField, VendorChoiceField
 from .models import (
-    Customer, Measurement, VendorRole, Vendor, PipelineStage, Order, OrderStage, Invoice, Particulars
+    Customer, Measurement, VendorRole, Vendor, PipelineStage, Order, OrderStage, Invoice, Particulars,
+    ArchivedOrder, ArchivedOrderStage, ArchivedParticulars,
 )
+from .pagination import EstimatedCountPaginator
 
-class OrderStageInline(admin.TabularInline):
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Admin for tables that grow with the business. An unfiltered changelist
+    takes its count from table statistics once large, and filtered ones skip
+    the second, unfiltered count shown next to their results. Foreign keys into large tables
+    should be autocomplete_fields or raw_id_fields, never a full <select>.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class ReferenceChoicesMixin:
+    """
+    Render the stage and vendor selects from the reference-data cache, like the
+    app's own stage forms, instead of querying both tables for every form.
+    """
+    reference_fields = {'stage': StageChoiceField, 'assigned_vendor': VendorChoiceField}
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.reference_fields:
+            kwargs['form_class'] = self.reference_fields[db_field.name]
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+class OrderStageInline(ReferenceChoicesMixin, admin.TabularInline):
     model = OrderStage
     extra = 1
 
@@ -12,21 +38,103 @@ class ParticularsInline(admin.TabularInline):
     extra = 1
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'order_placed_on', 'status')
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'order_placed_on', 'status', 'current_stage')
+    list_select_related = ('customer', 'current_stage')
+    # order_status_placed_on_idx and order_current_stage_idx, in the changelist ordering.
+    list_filter = ('status', 'current_stage')
+    ordering = ('-order_placed_on', '-id')
+    search_fields = ('=id',)
+    autocomplete_fields = ('customer',)
+    raw_id_fields = ('invoice',)
+    # Maintained from the particulars by production_tracker.totals.
+    readonly_fields = ('amount',)
     inlines = [OrderStageInline, ParticularsInline]
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ('name', 'email', 'phone', 'address')
+    # customer_name_id_idx; also orders the customer autocomplete.
+    ordering = ('name', 'id')
+    # Required for autocomplete; get_search_results does the matching.
+    search_fields = ('name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Prefix match on customer_search_idx instead of an icontains scan.
+        return filter_customers(queryset, search_term), False
+
+@admin.register(Measurement)
+class MeasurementAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'measurement_type')
+    list_select_related = ('customer',)
+    autocomplete_fields = ('customer',)
 
 @admin.register(Vendor)
 class VendorAdmin(admin.ModelAdmin):
     list_display = ('name', 'role')
+    list_select_related = ('role',)
+    search_fields = ('name',)
+
+@admin.register(PipelineStage)
+class PipelineStageAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+@admin.register(OrderStage)
+class OrderStageAdmin(ReferenceChoicesMixin, LargeTableAdmin):
+    list_display = ('id', 'order', 'stage', 'assigned_vendor', 'status', 'start_date', 'end_date')
+    list_select_related = ('order', 'stage', 'assigned_vendor')
+    # Served by the foreign key indexes.
+    list_filter = ('stage', 'assigned_vendor')
+    search_fields = ('=order__id',)
+    raw_id_fields = ('order',)
+
+@admin.register(Invoice)
+class InvoiceAdmin(LargeTableAdmin):
+    list_display = ('id', 'total_amount', 'paid', 'paid_on_date')
+    list_filter = ('paid',)
+    search_fields = ('=id',)
+
+@admin.register(Particulars)
+class ParticularsAdmin(LargeTableAdmin):
+    list_display = ('id', 'order', 'name', 'amount')
+    list_select_related = ('order',)
+    search_fields = ('=order__id',)
+    raw_id_fields = ('order',)
+
+class ReadOnlyInline(admin.TabularInline):
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class ArchivedOrderStageInline(ReadOnlyInline):
+    model = ArchivedOrderStage
+
+    def get_queryset(self, request):
+        # The read-only rows show their stage and vendor names.
+        return super().get_queryset(request).select_related('stage', 'assigned_vendor')
+
+class ArchivedParticularsInline(ReadOnlyInline):
+    model = ArchivedParticulars
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    """Archived orders are history moved out by `manage.py archive_orders`; view only."""
+    list_display = ('id', 'customer', 'order_placed_on', 'completion_date', 'amount', 'invoice', 'archived_on')
+    list_select_related = ('customer', 'invoice')
+    inlines = [ArchivedOrderStageInline, ArchivedParticularsInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
-admin.site.register(Measurement)
 admin.site.register(VendorRole)
-admin.site.register(PipelineStage)
-admin.site.register(OrderStage)
-admin.site.register(Invoice)
-admin.site.register(Particulars)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import hashlib
+import time
+
+from django.db.models import Prefetch
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status, viewsets
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import pagination
+from .changes import last_changed
+from .forms import MeasurementSearchForm
+from .models import ArchivedOrder, Customer, Invoice, Measurement, Order, OrderStage, Particulars, PipelineStage, Vendor, VendorRole
+from .serializers import (
+    CustomerSerializer, InvoiceSerializer, MeasurementSerializer, OrderSerializer, VendorSerializer,
+)
+
+
+class ApiCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+
+class OrderCursorPagination(ApiCursorPagination):
+    """
+    Keyset pagination on (order_placed_on, id) with ``?after=`` / ``?before=``
+    cursors, as in pagination.KeysetPaginationMixin. CursorPagination only
+    seeks on the first ordering field and steps through rows sharing a date
+    by OFFSET, which stops at offset_cutoff and repeats rows on busy days.
+    """
+    ordering = ('-order_placed_on', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        after = pagination.decode_cursor(request.query_params.get('after'), self.ordering, queryset.model)
+        before = pagination.decode_cursor(request.query_params.get('before'), self.ordering, queryset.model)
+        rows, backwards = pagination.keyset_rows(queryset, self.ordering, size, after, before)
+        self.page = pagination.keyset_page(list(rows), self.ordering, size, backwards, after)
+        return self.page.object_list
+
+    def get_next_link(self):
+        if not self.page.has_next:
+            return None
+        return replace_query_param(remove_query_param(self.base_url, 'before'), 'after', self.page.next_cursor)
+
+    def get_previous_link(self):
+        if not self.page.has_previous:
+            return None
+        return replace_query_param(remove_query_param(self.base_url, 'after'), 'before', self.page.previous_cursor)
+
+
+class ReadOnlyApiViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only endpoint with ``?fields=`` sparse fieldsets and conditional
+    responses. The ETag and Last-Modified validators come from the change
+    markers of ``etag_models``, so a client polling unchanged data gets a 304
+    without a single query against those tables.
+    """
+    pagination_class = ApiCursorPagination
+    etag_models = ()
+
+    def requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            raw = self.request.query_params.get('fields', '')
+            self._requested_fields = {name.strip() for name in raw.split(',') if name.strip()} or None
+        return self._requested_fields
+
+    def wants(self, field):
+        requested = self.requested_fields()
+        return requested is None or field in requested
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, handler, *args, **kwargs):
+        changed = last_changed(*self.etag_models)
+        fingerprint = f'{request.accepted_renderer.format}:{request.get_full_path()}:{changed}'
+        etag = quote_etag(hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest())
+        # HTTP dates have whole seconds: stamp the end of the second of the last
+        # change. Until that second is over a later change could share it, so
+        # no Last-Modified is sent, and clients fall back on the ETag.
+        last_modified = int(changed) + 1
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            not_modified = etag in parse_etags(if_none_match)
+        else:
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since'))
+            not_modified = since is not None and last_modified <= since
+
+        if not_modified:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified <= time.time():
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class OrderViewSet(ReadOnlyApiViewSet):
+    serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
+    etag_models = (Order, OrderStage, Particulars, Customer, PipelineStage, Vendor)
+
+    def get_queryset(self):
+        queryset = Order.objects.all()
+        if self.wants('customer_name'):
+            queryset = queryset.select_related('customer')
+        if self.wants('stages'):
+            stages = OrderStage.objects.select_related('stage', 'assigned_vendor').order_by('stage_id')
+            queryset = queryset.prefetch_related(Prefetch('orderstage_set', queryset=stages))
+        if self.wants('particulars'):
+            queryset = queryset.prefetch_related(Prefetch('particulars', queryset=Particulars.objects.order_by('id')))
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+
+class CustomerViewSet(ReadOnlyApiViewSet):
+    queryset = Customer.objects.all()
+    serializer_class = CustomerSerializer
+    etag_models = (Customer,)
+
+
+class MeasurementViewSet(ReadOnlyApiViewSet):
+    serializer_class = MeasurementSerializer
+    etag_models = (Measurement,)
+
+    def get_queryset(self):
+        queryset = Measurement.objects.all()
+        customer = self.request.query_params.get('customer')
+        if customer and customer.isdigit():
+            queryset = queryset.filter(customer_id=customer)
+        return MeasurementSearchForm(self.request.query_params).filter(queryset)
+
+
+class VendorViewSet(ReadOnlyApiViewSet):
+    serializer_class = VendorSerializer
+    etag_models = (Vendor, VendorRole)
+
+    def get_queryset(self):
+        queryset = Vendor.objects.all()
+        if self.wants('role_name'):
+            queryset = queryset.select_related('role')
+        return queryset
+
+
+class InvoiceViewSet(ReadOnlyApiViewSet):
+    serializer_class = InvoiceSerializer
+    etag_models = (Invoice, Order, ArchivedOrder)
+
+    def get_queryset(self):
+        queryset = Invoice.objects.all()
+        if self.wants('orders'):
+            orders = Order.objects.only('id', 'invoice_id').order_by('id')
+            queryset = queryset.prefetch_related(Prefetch('orders', queryset=orders))
+        if self.wants('archived_orders'):
+            archived = ArchivedOrder.objects.only('id', 'invoice_id').order_by('id')
+            queryset = queryset.prefetch_related(Prefetch('archived_orders', queryset=archived))
+        return queryset
@@ -0,0 +1,12 @@
+from rest_framework.routers import DefaultRouter
+
+from .api import CustomerViewSet, InvoiceViewSet, MeasurementViewSet, OrderViewSet, VendorViewSet
+
+router = DefaultRouter()
+router.register('orders', OrderViewSet, basename='api-order')
+router.register('customers', CustomerViewSet, basename='api-customer')
+router.register('measurements', MeasurementViewSet, basename='api-measurement')
+router.register('vendors', VendorViewSet, basename='api-vendor')
+router.register('invoices', InvoiceViewSet, basename='api-invoice')
+
+urlpatterns = router.urls
@@ -0,0 +1,154 @@
+from collections import namedtuple
+from datetime import date
+
+from django.db import connection, transaction
+
+from . import durations, totals, workload
+from .changes import mark_changed
+from .models import ArchivedOrder, ArchivedOrderStage, ArchivedParticulars, Order, OrderStage, Particulars
+
+# Orders moved per statement (and transaction).
+BATCH_SIZE = 1000
+
+ArchiveRun = namedtuple('ArchiveRun', ['orders', 'stages', 'particulars'])
+
+ARCHIVE_MODELS = (ArchivedOrder, ArchivedOrderStage, ArchivedParticulars)
+
+# Moves the next `limit` archivable orders, with their stages and particulars,
+# into the archive tables. Only invoiced orders qualify, so batch invoicing
+# never has to look in the archive. The foreign keys into Order are deferred,
+# so deleting parent and children in one statement is fine.
+MOVE_SQL = """
+WITH batch AS (
+    SELECT id FROM {order}
+    WHERE status = 'Completed' AND invoice_id IS NOT NULL AND order_placed_on < %(before)s
+    ORDER BY id
+    LIMIT %(limit)s
+    FOR UPDATE
+),
+orders AS (
+    DELETE FROM {order} o USING batch b WHERE o.id = b.id
+    RETURNING o.id, o.customer_id, o.order_placed_on, o.status, o.completion_date, o.amount, o.invoice_id
+),
+archived_orders AS (
+    INSERT INTO {order_archive} (id, customer_id, order_placed_on, status, completion_date, amount, invoice_id, archived_on)
+    SELECT *, %(today)s FROM orders
+),
+stages AS (
+    DELETE FROM {stage} s USING orders o WHERE s.order_id = o.id
+    RETURNING s.id, s.order_id, o.order_placed_on, s.stage_id, s.assigned_vendor_id, s.start_date, s.end_date, s.status
+),
+archived_stages AS (
+    INSERT INTO {stage_archive} (id, order_id, order_placed_on, stage_id, assigned_vendor_id, start_date, end_date, status)
+    SELECT * FROM stages
+),
+particulars AS (
+    DELETE FROM {particulars} p USING orders o WHERE p.order_id = o.id
+    RETURNING p.id, p.order_id, o.order_placed_on, p.name, p.details, p.amount
+),
+archived_particulars AS (
+    INSERT INTO {particulars_archive} (id, order_id, order_placed_on, name, details, amount)
+    SELECT * FROM particulars
+)
+SELECT (SELECT COUNT(*) FROM orders), (SELECT COUNT(*) FROM stages), (SELECT COUNT(*) FROM particulars)
+"""
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {
+        'order': qn(Order._meta.db_table),
+        'stage': qn(OrderStage._meta.db_table),
+        'particulars': qn(Particulars._meta.db_table),
+        'order_archive': qn(ArchivedOrder._meta.db_table),
+        'stage_archive': qn(ArchivedOrderStage._meta.db_table),
+        'particulars_archive': qn(ArchivedParticulars._meta.db_table),
+    }
+
+
+def _partition(model, year):
+    return f'{model._meta.db_table}_{year}'
+
+
+def ensure_partitions(years):
+    """Create the yearly archive partitions for `years` that do not exist yet."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for year in sorted(set(years)):
+            for model in ARCHIVE_MODELS:
+                # DDL takes no parameters; the bounds are built from integers.
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM ('{}-01-01') TO ('{}-01-01')".format(
+                        qn(_partition(model, year)), qn(model._meta.db_table), int(year), int(year) + 1,
+                    )
+                )
+
+
+def archivable_orders(before):
+    return Order.objects.filter(status='Completed', invoice__isnull=False, order_placed_on__lt=before)
+
+
+def archive_orders(before, batch_size=BATCH_SIZE):
+    """
+    Move completed, invoiced orders placed before `before` into the archive,
+    `batch_size` orders per transaction. Returns an ArchiveRun of row counts.
+    """
+    first = archivable_orders(before).order_by('order_placed_on').values_list('order_placed_on', flat=True).first()
+    if first is None:
+        return ArchiveRun(0, 0, 0)
+    ensure_partitions(range(first.year, before.year + 1))
+
+    sql = MOVE_SQL.format(**_tables())
+    params = {'before': before, 'limit': batch_size, 'today': date.today()}
+    totals = [0, 0, 0]
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            counts = cursor.fetchone()
+            if counts[0]:
+                # The DELETEs and INSERTs bypass model signals.
+                mark_changed(Order, OrderStage, Particulars, ArchivedOrder)
+                transaction.on_commit(workload.invalidate)
+        if not counts[0]:
+            return ArchiveRun(*totals)
+        totals = [total + count for total, count in zip(totals, counts)]
+
+
+def detach_year(year):
+    """
+    Detach the archive partitions for `year` from the archive tables. They are
+    left in place as plain tables, without foreign keys, to be dumped and
+    dropped. Returns their names.
+
+    What the year adds to invoice totals and the duration rollup is saved
+    first, so totals.recompute() and durations.rebuild() keep counting it.
+    """
+    qn = connection.ops.quote_name
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # ALTER TABLE refuses tables with deferred foreign key checks still
+        # pending, e.g. from archiving earlier in the same transaction.
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        totals.save_detached(year)
+        durations.save_detached(year)
+        # Children first: their foreign keys point at the order partition.
+        for model in reversed(ARCHIVE_MODELS):
+            name = _partition(model, year)
+            cursor.execute(
+                'SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = %s::regclass',
+                [name, model._meta.db_table],
+            )
+            if cursor.fetchone() is None:
+                continue
+            cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(qn(model._meta.db_table), qn(name)))
+            # A detached table keeps its foreign keys, which would hold up
+            # detaching the order partition and deleting customers or vendors.
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name],
+            )
+            for constraint, in cursor.fetchall():
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(qn(name), qn(constraint)))
+            detached.append(name)
+        if detached:
+            mark_changed(ArchivedOrder)
+    return detached
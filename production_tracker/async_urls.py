@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .async_views import (
+    AsyncCustomerListView, AsyncDashboardView, AsyncInvoiceListView, AsyncMeasurementListView, AsyncOrderListView,
+    TransitionStreamView,
+)
+
+urlpatterns = [
+    path('', AsyncDashboardView.as_view(), name='async_dashboard'),
+    path('orders/', AsyncOrderListView.as_view(), name='async_order_list'),
+    path('customers/', AsyncCustomerListView.as_view(), name='async_customer_list'),
+    path('measurements/', AsyncMeasurementListView.as_view(), name='async_measurement_list'),
+    path('invoices/', AsyncInvoiceListView.as_view(), name='async_invoice_list'),
+    path('events/', TransitionStreamView.as_view(), name='transition_stream'),
+]
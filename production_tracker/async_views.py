@@ -0,0 +1,96 @@
+"""
+Async counterparts of the read-only views, served under /async/ when the app
+runs under ASGI (clothing_factory/asgi.py). They reuse the sync views'
+querysets and templates and only change how the data is fetched.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.generic import View
+
+from . import events
+from .concurrency import run_in_thread
+from .models import Order
+from .stats import aget_dashboard_stats
+from .views import CustomerListView, DashboardView, InvoiceListView, MeasurementListView, OrderListView
+
+
+class AsyncLoginRequiredMixin:
+    async def dispatch(self, request, *args, **kwargs):
+        # request.user would load lazily, and synchronously, on first access.
+        request.user = await request.auser()
+        # Hand back the connection the session and user lookups used (to the
+        # pool, or closed), so a request never sits on one while it waits for
+        # queries running on other threads; with a small pool that deadlocks.
+        await sync_to_async(close_old_connections)()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await View.dispatch(self, request, *args, **kwargs)
+
+
+class AsyncDashboardView(AsyncLoginRequiredMixin, DashboardView):
+
+    async def get(self, request, *args, **kwargs):
+        recent = Order.objects.select_related('customer').order_by('-order_placed_on')[:5]
+        stats, recent_orders = await asyncio.gather(
+            aget_dashboard_stats(),
+            run_in_thread(lambda: list(recent)),
+        )
+        context = self.get_context_data(**kwargs)
+        context.update(stats, recent_orders=recent_orders)
+        return self.render_to_response(context)
+
+    def get_context_data(self, **kwargs):
+        # Skip DashboardView's synchronous queries.
+        context = super(DashboardView, self).get_context_data(**kwargs)
+        context['live_after'] = events.latest_id
+        return context
+
+
+class AsyncKeysetListMixin(AsyncLoginRequiredMixin):
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        page = await self.apaginate_keyset(self.object_list)
+        return self.render_to_response(self.get_context_data(page=page))
+
+
+class AsyncOrderListView(AsyncKeysetListMixin, OrderListView):
+    pass
+
+
+class AsyncCustomerListView(AsyncKeysetListMixin, CustomerListView):
+    pass
+
+
+class AsyncMeasurementListView(AsyncKeysetListMixin, MeasurementListView):
+    pass
+
+
+class AsyncInvoiceListView(AsyncKeysetListMixin, InvoiceListView):
+    pass
+
+
+class TransitionStreamView(AsyncLoginRequiredMixin, View):
+    """
+    Server-sent events feeding the live dashboard and order list. Resumes
+    after the browser's Last-Event-ID, or the page's ?after= on first connect.
+    An open stream holds no thread or database connection, which only holds
+    under ASGI; a WSGI worker would be tied up for as long as the page is open.
+    Streams never end on their own, so give the server a graceful shutdown
+    timeout (uvicorn --timeout-graceful-shutdown).
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse('Live updates are only served through clothing_factory/asgi.py.', status=501)
+        after = request.headers.get('Last-Event-ID') or request.GET.get('after')
+        after = int(after) if after and after.isdigit() else None
+        response = StreamingHttpResponse(events.stream(after), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,105 @@
+"""
+JWT authentication for the API that avoids the per-request user query, and
+upkeep of simplejwt's token blacklist tables. settings.API_AUTHENTICATION
+picks the authentication class.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+USER_KEY = 'jwt-user:v1:{}'
+
+# Expired tokens deleted per statement (and transaction).
+PRUNE_BATCH_SIZE = 5000
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the user behind a token until the token
+    expires. Entries are per user, so every token a user holds shares one, and
+    saving or deleting the user drops it (signals.invalidate_token_user).
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        key = USER_KEY.format(user_id)
+        user = cache.get(key) if user_id is not None else None
+        if user is None:
+            # Raises for unknown and inactive users, which are never cached.
+            user = super().get_user(validated_token)
+            timeout = int(validated_token['exp'] - time.time())
+            if timeout > 0:
+                cache.set(key, user, timeout)
+        return user
+
+
+class StatelessReadJWTAuthentication(CachedJWTAuthentication):
+    """
+    Serve GET, HEAD and OPTIONS requests as a TokenUser built from the token's
+    claims, without reading the user at all; writes resolve the real user as
+    CachedJWTAuthentication does. A deactivated user keeps read access until
+    their access token expires (ACCESS_TOKEN_LIFETIME).
+    """
+
+    def authenticate(self, request):
+        # DRF creates the authenticators per request.
+        self.stateless = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if self.stateless:
+            return JWTStatelessUserAuthentication.get_user(self, validated_token)
+        return super().get_user(validated_token)
+
+
+def invalidate_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+# Deletes the next batch of expired outstanding tokens and their blacklist
+# entries. Tokens are issued in id order with a fixed lifetime, so the expired
+# ones sit at the start of the primary key index.
+PRUNE_SQL = """
+WITH expired AS (
+    SELECT id FROM {outstanding}
+    WHERE expires_at <= %(now)s
+    ORDER BY id
+    LIMIT %(limit)s
+    FOR UPDATE SKIP LOCKED
+),
+blacklisted AS (
+    DELETE FROM {blacklisted} b USING expired e WHERE b.token_id = e.id RETURNING b.id
+),
+outstanding AS (
+    DELETE FROM {outstanding} o USING expired e WHERE o.id = e.id RETURNING o.id
+)
+SELECT (SELECT COUNT(*) FROM outstanding), (SELECT COUNT(*) FROM blacklisted)
+"""
+
+
+def prune_expired_tokens(batch_size=PRUNE_BATCH_SIZE):
+    """
+    Delete expired outstanding tokens and their blacklist entries in batches.
+    An expired token is rejected on its signature's expiry alone, so neither
+    row is needed any more. Returns (outstanding, blacklisted) rows deleted.
+    """
+    qn = connection.ops.quote_name
+    sql = PRUNE_SQL.format(
+        outstanding=qn(OutstandingToken._meta.db_table), blacklisted=qn(BlacklistedToken._meta.db_table),
+    )
+    params = {'now': timezone.now(), 'limit': batch_size}
+    outstanding = blacklisted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            tokens, entries = cursor.fetchone()
+        outstanding += tokens
+        blacklisted += entries
+        if tokens < batch_size:
+            return outstanding, blacklisted
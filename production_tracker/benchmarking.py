@@ -0,0 +1,128 @@
+"""Helpers shared by the benchmark_* management commands."""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+BENCHMARK_USER = 'benchmark'
+
+
+def summarise(latencies, elapsed):
+    """Requests/sec and latency percentiles (ms) for `latencies` seconds measured over `elapsed` seconds."""
+    ms = sorted(latency * 1000 for latency in latencies)
+    cuts = statistics.quantiles(ms, n=100, method='inclusive') if len(ms) > 1 else ms * 99
+    return {
+        'requests': len(ms),
+        'rps': len(ms) / elapsed if elapsed else 0.0,
+        'p50': cuts[49],
+        'p95': cuts[94],
+        'p99': cuts[98],
+        'max': ms[-1],
+    }
+
+
+def benchmark_user(username=BENCHMARK_USER):
+    """The staff user benchmarks run as, so staff-only pages are measured rather than their 403."""
+    user, _ = get_user_model().objects.get_or_create(username=username, defaults={'is_staff': True})
+    if not user.is_staff:
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+    return user
+
+
+def session_cookie(username=BENCHMARK_USER):
+    """A logged-in session cookie for `username`, creating the user if needed."""
+    user = benchmark_user(username)
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def bearer_token(username=BENCHMARK_USER):
+    """An Authorization header value with a fresh access token for `username`, creating the user if needed."""
+    user = benchmark_user(username)
+    return f'Bearer {AccessToken.for_user(user)}'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """Run an app server subprocess for the duration of a `with` block."""
+
+    def __init__(self, args, port, env=None, timeout=30):
+        self.args = args
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.env = {**os.environ, **(env or {})}
+        self.timeout = timeout
+
+    @classmethod
+    def gunicorn(cls, env=None, workers=2, threads=1):
+        """The WSGI app under gunicorn, configured by gunicorn.conf.py."""
+        port = free_port()
+        args = [
+            sys.executable, '-m', 'gunicorn', 'clothing_factory.wsgi',
+            '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+            '--log-level', 'warning',
+        ]
+        return cls(args, port, {'GUNICORN_THREADS': str(threads), **(env or {})})
+
+    @classmethod
+    def uvicorn(cls, env=None, workers=2):
+        """The ASGI app under uvicorn."""
+        port = free_port()
+        args = [
+            sys.executable, '-m', 'uvicorn', 'clothing_factory.asgi:application',
+            '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+            '--log-level', 'warning', '--no-access-log',
+        ]
+        return cls(args, port, env)
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.args, cwd=settings.BASE_DIR, env=self.env)
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f'{self.base_url}/login/', timeout=1).close()
+                return self
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                if self.process.poll() is not None:
+                    raise RuntimeError(f'gunicorn exited with status {self.process.returncode}')
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f'gunicorn did not start within {self.timeout}s')
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+
+def load(url, requests, concurrency, headers=None, warmup=20):
+    """GET `url` `requests` times from `concurrency` threads; return summarise() of the timings."""
+    def fetch(_):
+        request = urllib.request.Request(url, headers=headers or {})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(fetch, range(warmup)))
+        start = time.perf_counter()
+        latencies = list(executor.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - start
+    return summarise(latencies, elapsed)
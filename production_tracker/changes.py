@@ -0,0 +1,37 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import stats
+
+
+def _key(model):
+    return f'changed:{model._meta.label_lower}'
+
+
+def mark_changed(*models):
+    """
+    Record that rows of `models` changed once the current transaction commits:
+    bumps their last-changed markers and the dashboard sections built from them.
+    Model signals call this for ORM saves; bulk and raw SQL writes call it directly.
+    """
+    def publish():
+        cache.set_many({_key(model): time.time() for model in models}, None)
+        sections = {stats.SECTION_MODELS[model] for model in models if model in stats.SECTION_MODELS}
+        if sections:
+            stats.invalidate(*sections)
+
+    transaction.on_commit(publish)
+
+
+def last_changed(*models):
+    """Return the latest change timestamp across `models`."""
+    keys = [_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Unknown (fresh or evicted cache): assume it changed just now.
+            cache.add(key, time.time(), None)
+            found[key] = cache.get(key)
+    return max(found.values())
@@ -0,0 +1,25 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+
+
+def _with_own_connection(func):
+    def run():
+        close_old_connections()
+        try:
+            return func()
+        finally:
+            # Executor threads live on without request_finished ever firing, so
+            # a connection left open here would never be closed. Under the pool
+            # (the setting ASGI deployments use) this hands it back instead.
+            connections.close_all()
+    return run
+
+
+async def run_in_thread(func):
+    """
+    Run the blocking `func` on its own worker thread and database connection,
+    so several can be awaited concurrently (sync_to_async's default shares one
+    thread between them). Concurrency is bounded by the event loop's default
+    executor, and each running call holds a connection.
+    """
+    return await sync_to_async(_with_own_connection(func), thread_sensitive=False)()
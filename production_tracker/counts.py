@@ -0,0 +1,60 @@
+"""
+Row counts that stay cheap on large tables.
+
+count(queryset) counts exactly. count(queryset, approximate=True) returns the
+table's statistics instead when the queryset is a whole table of at least
+`exact_limit` rows. Estimates follow the table between ANALYZE runs by scaling
+to its current size, and are typically within a few percent. Filtered
+querysets are always counted exactly: the planner's row estimate for a filter
+or a search can be off by orders of magnitude.
+"""
+from django.db import connections
+
+EXACT_COUNT_LIMIT = 10000
+
+# Rows in a table (summed over its partitions) from the statistics stored by
+# ANALYZE and autovacuum, scaled by how much the table has grown or shrunk
+# since, as the planner does. NULL if it has never been analyzed.
+RELTUPLES_SQL = """
+SELECT SUM(
+    CASE WHEN relpages > 0
+         THEN reltuples / relpages * (pg_relation_size(oid) / current_setting('block_size')::int)
+         ELSE reltuples END
+)::bigint
+FROM pg_class
+WHERE (oid = %(table)s::regclass OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %(table)s::regclass))
+  AND relkind = 'r' AND reltuples >= 0
+"""
+
+# The estimate if it reaches the limit, else an exact count. The COUNT(*) is
+# an initplan, which PostgreSQL only runs if the CASE needs it.
+TABLE_COUNT_SQL = """
+SELECT CASE WHEN estimate >= %(limit)s THEN estimate ELSE (SELECT COUNT(*) FROM {table}) END
+FROM ({reltuples}) AS stats (estimate)
+"""
+
+
+def estimate(queryset):
+    """
+    The statistics' estimate of the rows in the whole table behind `queryset`,
+    or None if it has never been analyzed.
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(RELTUPLES_SQL, {'table': connection.ops.quote_name(queryset.model._meta.db_table)})
+        return cursor.fetchone()[0]
+
+
+def count(queryset, approximate=False, exact_limit=EXACT_COUNT_LIMIT):
+    """
+    Number of rows in `queryset`; with `approximate`, an estimate if it is a
+    whole table of at least `exact_limit` rows.
+    """
+    if not approximate or queryset.query.where:
+        return queryset.count()
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    sql = TABLE_COUNT_SQL.format(table=table, reltuples=RELTUPLES_SQL)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'table': table, 'limit': exact_limit})
+        return cursor.fetchone()[0]
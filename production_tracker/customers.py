@@ -0,0 +1,40 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery
+
+from .models import CUSTOMER_SEARCH_VECTOR, Customer
+
+TERM_RE = re.compile(r'[\w@.+-]+')
+SEARCH_LIMIT = 10
+
+
+class PrefixQuery(SearchQuery):
+    """
+    Match every term as a prefix of some lexeme. The terms go in as a tsquery
+    literal instead of through to_tsquery, whose parser would split a partly
+    typed e-mail address into pieces that no longer match the indexed one.
+    """
+    template = '%(expressions)s::tsquery'
+
+    def __init__(self, terms):
+        super().__init__(' & '.join(f"'{term}':*" for term in terms))
+
+
+def search_terms(query):
+    terms = (term.strip('.+-').lower() for term in TERM_RE.findall(query or ''))
+    return [term for term in terms if term]
+
+
+def filter_customers(queryset, query):
+    """Restrict `queryset` to customers whose name, email, phone or address match every term of `query`."""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    return queryset.alias(document=CUSTOMER_SEARCH_VECTOR).filter(document=PrefixQuery(terms))
+
+
+def search_customers(query, limit=SEARCH_LIMIT):
+    """Typeahead matches for `query`; nothing until it has at least one term."""
+    if not search_terms(query):
+        return Customer.objects.none()
+    return filter_customers(Customer.objects.all(), query).order_by('name', 'id')[:limit]
@@ -0,0 +1,226 @@
+from collections import namedtuple
+from datetime import date
+
+from django.db import connection, transaction
+
+from . import changes
+from .models import (
+    DURATION_BUCKETS, ArchivedOrderStage, DetachedStageDuration, OrderStage, PipelineStage, StageDurationRollup, Vendor,
+)
+
+# Months of history shown on the dashboard, including the current one.
+ANALYTICS_MONTHS = 12
+
+DurationStats = namedtuple('DurationStats', ['label', 'count', 'mean', 'p50', 'p90'])
+
+UPSERT_SQL = """
+INSERT INTO {rollup} AS r (stage_id, vendor_id, month, count, total_days, histogram)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT (stage_id, vendor_id, month) DO UPDATE SET
+    count = r.count + EXCLUDED.count,
+    total_days = r.total_days + EXCLUDED.total_days,
+    histogram = ARRAY(
+        SELECT a + b FROM unnest(r.histogram, EXCLUDED.histogram) WITH ORDINALITY AS h(a, b, i) ORDER BY i
+    )
+"""
+
+# Moves a vendor's rollup rows onto the unassigned (NULL vendor) rows.
+UNASSIGN_SQL = """
+WITH moved AS (
+    DELETE FROM {rollup} WHERE vendor_id = %s RETURNING stage_id, month, count, total_days, histogram
+)
+INSERT INTO {rollup} AS r (stage_id, vendor_id, month, count, total_days, histogram)
+SELECT stage_id, NULL, month, count, total_days, histogram FROM moved
+ON CONFLICT (stage_id, vendor_id, month) DO UPDATE SET
+    count = r.count + EXCLUDED.count,
+    total_days = r.total_days + EXCLUDED.total_days,
+    histogram = ARRAY(
+        SELECT a + b FROM unnest(r.histogram, EXCLUDED.histogram) WITH ORDINALITY AS h(a, b, i) ORDER BY i
+    )
+"""
+
+REBUILD_SQL = """
+WITH durations AS (
+    SELECT stage_id, assigned_vendor_id AS vendor_id, date_trunc('month', end_date)::date AS month,
+           GREATEST(end_date - start_date, 0) AS days
+    FROM (
+        SELECT stage_id, assigned_vendor_id, start_date, end_date, status FROM {stage}
+        UNION ALL
+        SELECT stage_id, assigned_vendor_id, start_date, end_date, status FROM {stage_archive}
+    ) s
+    WHERE status = 'Completed' AND end_date IS NOT NULL
+),
+buckets AS (
+    SELECT stage_id, vendor_id, month, bucket, SUM(n) AS n, SUM(days) AS days
+    FROM (
+        SELECT stage_id, vendor_id, month, LEAST(days, %(last)s) AS bucket, 1 AS n, days FROM durations
+        UNION ALL
+        -- Detached archive years, as saved by archive.detach_year.
+        SELECT stage_id, vendor_id, month, bucket, count, total_days FROM {detached}
+    ) d
+    GROUP BY 1, 2, 3, 4
+)
+INSERT INTO {rollup} (stage_id, vendor_id, month, count, total_days, histogram)
+SELECT stage_id, vendor_id, month, SUM(n), SUM(days),
+       ARRAY(SELECT COALESCE((jsonb_object_agg(bucket, n) ->> b::text)::int, 0) FROM generate_series(0, %(last)s) b)
+FROM buckets
+GROUP BY 1, 2, 3
+"""
+
+# Saves what a year's archived stages add to the rollup, in REBUILD_SQL's
+# buckets, before archive.detach_year detaches them.
+SAVE_DETACHED_SQL = """
+INSERT INTO {detached} (year, stage_id, vendor_id, month, bucket, count, total_days)
+SELECT %(year)s, stage_id, assigned_vendor_id, month, LEAST(days, %(last)s), COUNT(*), SUM(days)
+FROM (
+    SELECT stage_id, assigned_vendor_id, date_trunc('month', end_date)::date AS month,
+           GREATEST(end_date - start_date, 0) AS days
+    FROM {stage_archive}
+    WHERE order_placed_on >= %(start)s AND order_placed_on < %(end)s
+      AND status = 'Completed' AND end_date IS NOT NULL
+) s
+GROUP BY 2, 3, 4, 5
+"""
+
+# Sums the rollup rows since %(since)s per {key}, histograms element by element.
+STATS_SQL = """
+WITH recent AS (
+    SELECT r.*, {key} AS key, {label} AS label FROM {rollup} r {join} WHERE r.month >= %(since)s
+),
+totals AS (
+    SELECT key, MIN(label) AS label, SUM(count) AS count, SUM(total_days) AS total_days
+    FROM recent GROUP BY key
+),
+cells AS (
+    SELECT key, h.i, SUM(h.n) AS n
+    FROM recent, unnest(recent.histogram) WITH ORDINALITY AS h(n, i)
+    GROUP BY key, h.i
+)
+SELECT t.label, t.count, t.total_days, (SELECT array_agg(c.n ORDER BY c.i) FROM cells c WHERE c.key = t.key)
+FROM totals t
+WHERE t.count > 0
+"""
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {
+        'rollup': qn(StageDurationRollup._meta.db_table),
+        'stage': qn(OrderStage._meta.db_table),
+        'stage_archive': qn(ArchivedOrderStage._meta.db_table),
+        'detached': qn(DetachedStageDuration._meta.db_table),
+        'pipeline_stage': qn(PipelineStage._meta.db_table),
+        'vendor': qn(Vendor._meta.db_table),
+    }
+
+
+def record_completions(rows):
+    """Fold completed stages (pipeline.StageRow tuples or OrderStage rows) into the rollup, in the caller's transaction."""
+    _fold(rows, 1)
+
+
+def remove_completions(rows):
+    """Take back the completions record_completions() counted for `rows`, e.g. of a reopened stage."""
+    _fold(rows, -1)
+
+
+def _fold(rows, sign):
+    groups = {}
+    for row in rows:
+        days = max((row.end_date - row.start_date).days, 0)
+        key = (row.stage_id, row.assigned_vendor_id, row.end_date.replace(day=1))
+        group = groups.setdefault(key, [0, 0, [0] * DURATION_BUCKETS])
+        group[0] += sign
+        group[1] += sign * days
+        group[2][min(days, DURATION_BUCKETS - 1)] += sign
+    if not groups:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            UPSERT_SQL.format(**_tables()),
+            [(*key, count, total, histogram) for key, (count, total, histogram) in groups.items()],
+        )
+    changes.mark_changed(StageDurationRollup)
+
+
+def unassign_vendor(vendor_id):
+    """Count a vendor's completed stages as unassigned, as OrderStage does once the vendor is deleted."""
+    with connection.cursor() as cursor:
+        cursor.execute(UNASSIGN_SQL.format(**_tables()), [vendor_id])
+        if cursor.rowcount:
+            changes.mark_changed(StageDurationRollup)
+
+
+def save_detached(year):
+    """Save what `year`'s archived stages add to the rollup, in the caller's transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SAVE_DETACHED_SQL.format(**_tables()),
+            {'year': year, 'start': date(year, 1, 1), 'end': date(year + 1, 1, 1), 'last': DURATION_BUCKETS - 1},
+        )
+
+
+def rebuild():
+    """
+    Recompute the whole rollup from OrderStage, its archive and the detached
+    archive years. Returns the number of rollup rows.
+    """
+    tables = _tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Hold off completions and archiving so no stage is counted twice or lost.
+        cursor.execute('LOCK TABLE {stage}, {stage_archive}, {detached} IN SHARE MODE'.format(**tables))
+        cursor.execute('DELETE FROM {rollup}'.format(**tables))
+        cursor.execute(REBUILD_SQL.format(**tables), {'last': DURATION_BUCKETS - 1})
+        rows = cursor.rowcount
+        changes.mark_changed(StageDurationRollup)
+    return rows
+
+
+def percentile(histogram, fraction):
+    """Smallest number of days within which `fraction` of the stages completed."""
+    target = fraction * sum(histogram)
+    seen = 0
+    for days, count in enumerate(histogram):
+        seen += count
+        if seen and seen >= target:
+            return days
+    return None
+
+
+def _format_days(days):
+    return f'{days}+' if days == DURATION_BUCKETS - 1 else str(days)
+
+
+def window_start(today=None):
+    today = today or date.today()
+    year, month = divmod(today.year * 12 + today.month - ANALYTICS_MONTHS, 12)
+    return date(year, month + 1, 1)
+
+
+def _stats(key, label, join=''):
+    tables = _tables()
+    sql = STATS_SQL.format(key=key, label=label, join=join.format(**tables), **tables)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'since': window_start()})
+        rows = cursor.fetchall()
+    return [
+        DurationStats(
+            label, count, round(int(total_days) / count, 1),
+            _format_days(percentile(histogram, 0.5)), _format_days(percentile(histogram, 0.9)),
+        )
+        for label, count, total_days, histogram in rows
+    ]
+
+
+def by_stage():
+    rows = _stats('r.stage_id', 's.name', 'JOIN {pipeline_stage} s ON s.id = r.stage_id')
+    return sorted(rows, key=lambda row: -row.mean)
+
+
+def by_vendor(limit=10):
+    rows = _stats('r.vendor_id', "COALESCE(v.name, 'Unassigned')", 'LEFT JOIN {vendor} v ON v.id = r.vendor_id')
+    return sorted(rows, key=lambda row: -row.mean)[:limit]
+
+
+def by_month():
+    return sorted(_stats('r.month', 'r.month'), key=lambda row: row.label)
@@ -0,0 +1,306 @@
+"""
+Live updates for open dashboards and order lists.
+
+Order creations and stage changes are appended to TransitionEvent in the
+transaction that makes them, and a trigger NOTIFYs CHANNEL when it commits.
+Each server process keeps one LISTEN connection (Feed) while any browser is
+connected: on every notification it reads the new events with one query and
+hands them to all open streams, which send them as server-sent events. A
+browser applies the tile deltas and order rows to the page it loaded, instead
+of reloading it.
+
+Bulk writes (imports, synthetic data, archiving) do not log events; pages pick
+those up on their next load.
+"""
+import asyncio
+import json
+import logging
+from datetime import date
+
+import psycopg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+from django.urls import reverse
+
+from .concurrency import run_in_thread
+from .models import Customer, Order, OrderStage, PipelineStage, TransitionEvent, Vendor
+
+logger = logging.getLogger(__name__)
+
+# Must match the trigger in migration 0013.
+CHANNEL = 'transition_events'
+# Events read per query.
+FEED_LIMIT = 500
+# Event ids are drawn before their transactions commit, so a smaller id can
+# become visible after a larger one. The feed looks this many ids back for
+# such stragglers.
+REPLAY_WINDOW = 100
+# Seconds between keep-alive comments on an idle stream.
+KEEPALIVE = 15
+# Seconds before reconnecting a lost LISTEN connection.
+RETRY_DELAY = 5
+# Undelivered events a stream may fall behind by before it is closed; the
+# browser reconnects and catches up from its last event id.
+MAX_BACKLOG = 1000
+
+# Dashboard tile counting orders of each status.
+ORDER_STATUS_TILES = {
+    'Pending': 'pending_orders',
+    'In Progress': 'in_progress_orders',
+    'Completed': 'completed_orders',
+}
+
+# Events after `after` with what the pages show for their orders, as of now.
+FEED_SQL = """
+SELECT e.id, e.kind, e.status, e.previous_status, es.name,
+       o.id, c.name, o.order_placed_on, o.status, cs.name, cv.name,
+       o.stages_completed, o.stages_total, o.current_stage_since
+FROM {event} e
+LEFT JOIN {order} o ON o.id = e.order_id
+LEFT JOIN {customer} c ON c.id = o.customer_id
+LEFT JOIN {stage} cs ON cs.id = o.current_stage_id
+LEFT JOIN {vendor} cv ON cv.id = o.current_vendor_id
+LEFT JOIN {order_stage} s ON s.id = e.order_stage_id
+LEFT JOIN {stage} es ON es.id = s.stage_id
+WHERE e.id > %(after)s
+ORDER BY e.id
+LIMIT %(limit)s
+"""
+
+PRUNE_SQL = """
+DELETE FROM {event} WHERE id IN (
+    SELECT id FROM {event} WHERE occurred_at < %(before)s ORDER BY id LIMIT %(limit)s
+)
+"""
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {
+        'event': qn(TransitionEvent._meta.db_table),
+        'order': qn(Order._meta.db_table),
+        'customer': qn(Customer._meta.db_table),
+        'stage': qn(PipelineStage._meta.db_table),
+        'vendor': qn(Vendor._meta.db_table),
+        'order_stage': qn(OrderStage._meta.db_table),
+    }
+
+
+def record_order_created(order):
+    TransitionEvent.objects.create(kind=TransitionEvent.ORDER_CREATED, order=order, status=order.status)
+
+
+def record_stage_update(order_stage, previous_status):
+    """Log an edit of `order_stage` made outside pipeline transitions (which log their own)."""
+    TransitionEvent.objects.create(
+        kind=TransitionEvent.STAGE_UPDATED, order_id=order_stage.order_id, order_stage=order_stage,
+        status=order_stage.status, previous_status=previous_status,
+    )
+
+
+def latest_id():
+    """Id of the newest event; pages pass it to the stream so nothing after their render is missed."""
+    return TransitionEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def tile_deltas(kind, status, previous_status):
+    """How an event changes the dashboard tiles, e.g. {'total_orders': 1, 'pending_orders': 1}."""
+    if kind == TransitionEvent.ORDER_CREATED:
+        deltas = {'total_orders': 1}
+        if status in ORDER_STATUS_TILES:
+            deltas[ORDER_STATUS_TILES[status]] = 1
+        return deltas
+    change = (status == 'In Progress') - (previous_status == 'In Progress')
+    return {'stages_in_progress': change} if change else {}
+
+
+def _event(row):
+    (event_id, kind, status, previous_status, stage, order_id, customer, placed_on, order_status,
+     current_stage, current_vendor, completed, total, since) = row
+    order = None
+    if order_id is not None:
+        order = {
+            'id': order_id,
+            'url': reverse('order_detail', args=[order_id]),
+            'customer': customer,
+            'placed_on': placed_on,
+            'status': order_status,
+            'current_stage': current_stage,
+            'current_vendor': current_vendor,
+            'stages_completed': completed,
+            'stages_total': total,
+            'days_in_stage': (date.today() - since).days if since else None,
+        }
+    return {
+        'id': event_id,
+        'kind': kind,
+        'status': status,
+        'previous_status': previous_status,
+        'stage': stage,
+        'order': order,
+        'tiles': tile_deltas(kind, status, previous_status),
+    }
+
+
+def read(after, limit=FEED_LIMIT):
+    """Up to `limit` events with ids above `after`, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(FEED_SQL.format(**_tables()), {'after': after, 'limit': limit})
+        return [_event(row) for row in cursor.fetchall()]
+
+
+def prune(before, batch_size=10000):
+    """Delete events that occurred before `before`, in batches. Returns how many."""
+    sql = PRUNE_SQL.format(**_tables())
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'before': before, 'limit': batch_size})
+            deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+
+
+def _listen_params():
+    settings_dict = connections['default'].settings_dict
+    # Django's own OPTIONS keys mean nothing to psycopg.
+    options = {
+        key: value for key, value in settings_dict['OPTIONS'].items()
+        if key not in {'pool', 'isolation_level', 'server_side_binding', 'assume_role'}
+    }
+    params = {
+        'dbname': settings_dict['NAME'],
+        'user': settings_dict['USER'],
+        'password': settings_dict['PASSWORD'],
+        'host': settings_dict['HOST'],
+        'port': settings_dict['PORT'],
+    }
+    # As Django's connections do; text would come back as bytes from a SQL_ASCII database.
+    params['client_encoding'] = 'UTF8'
+    return {**{key: value for key, value in params.items() if value}, **options, 'autocommit': True}
+
+
+class Feed:
+    """
+    Reads the event log for every stream open in this process. It listens on
+    its own connection, outside Django's connection handling, and runs only
+    while at least one stream is subscribed.
+    """
+
+    def __init__(self):
+        self.queues = set()
+        self.task = None
+        self.ready = None
+        self.last_id = None
+        self.seen = set()
+
+    async def subscribe(self):
+        """A queue that receives every event committed from now on; None means it fell too far behind."""
+        queue = asyncio.Queue()
+        self.queues.add(queue)
+        if self.task is None:
+            self.ready = asyncio.Event()
+            self.last_id = None
+            self.task = asyncio.create_task(self._run())
+        await self.ready.wait()
+        return queue
+
+    async def unsubscribe(self, queue):
+        self.queues.discard(queue)
+        if not self.queues and self.task is not None:
+            task, self.task = self.task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        sql = FEED_SQL.format(**_tables())
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**_listen_params()) as conn:
+                    await conn.execute(f'LISTEN {CHANNEL}')
+                    # Catch up on whatever committed while not listening.
+                    await self._read(conn, sql)
+                    self.ready.set()
+                    while True:
+                        # notifies() holds the connection until it returns, so
+                        # read once it has seen a notification.
+                        async for _ in conn.notifies(stop_after=1):
+                            pass
+                        await self._read(conn, sql)
+            except psycopg.Error:
+                logger.exception('Transition event feed lost its connection; retrying in %s s', RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def _read(self, conn, sql):
+        if self.last_id is None:
+            # Start from the newest event: streams fetch their own backlog.
+            cursor = await conn.execute(
+                'SELECT id FROM {event} WHERE id > (SELECT MAX(id) FROM {event}) - %s'.format(**_tables()),
+                [REPLAY_WINDOW],
+            )
+            self.seen = {event_id for event_id, in await cursor.fetchall()}
+            self.last_id = max(self.seen, default=0)
+            return
+        while True:
+            cursor = await conn.execute(sql, {'after': self.last_id - REPLAY_WINDOW, 'limit': FEED_LIMIT})
+            rows = await cursor.fetchall()
+            fresh = [_event(row) for row in rows if row[0] not in self.seen]
+            if rows:
+                self.last_id = max(self.last_id, rows[-1][0])
+            self.seen.update(event['id'] for event in fresh)
+            self.seen = {event_id for event_id in self.seen if event_id > self.last_id - REPLAY_WINDOW}
+            for event in fresh:
+                self._publish(event)
+            if len(rows) < FEED_LIMIT:
+                return
+
+    def _publish(self, event):
+        for queue in list(self.queues):
+            if queue.qsize() >= MAX_BACKLOG:
+                self.queues.discard(queue)
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait(event)
+
+
+feed = Feed()
+
+
+def _message(event):
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f'id: {event["id"]}\nevent: transition\ndata: {data}\n\n'.encode()
+
+
+async def stream(after=None):
+    """
+    Server-sent events for the events after `after` (from now on if None),
+    as an async iterator for StreamingHttpResponse.
+    """
+    queue = await feed.subscribe()
+    try:
+        yield f'retry: {RETRY_DELAY * 1000}\n\n'.encode()
+        sent = set()
+        if after is not None:
+            backlog = await run_in_thread(lambda: read(after, MAX_BACKLOG + 1))
+            if len(backlog) > MAX_BACKLOG:
+                # Too far behind to patch the page up; have it load afresh.
+                yield b'event: reload\ndata: {}\n\n'
+                return
+            for event in backlog:
+                sent.add(event['id'])
+                yield _message(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEPALIVE)
+            except TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+            if event is None:
+                return
+            if event['id'] not in sent:
+                yield _message(event)
+    finally:
+        await feed.unsubscribe(queue)
@@ -0,0 +1,86 @@
+import csv
+
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+
+from .models import ArchivedOrder, Invoice, Order, Particulars
+
+# Rows fetched per server-side cursor round trip.
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the row back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    writer = csv.writer(Echo())
+    lines = (writer.writerow(row) for row in _with_header(header, rows))
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _with_header(header, rows):
+    yield header
+    yield from rows
+
+
+ORDER_HEADER = [
+    'order_id', 'customer', 'customer_email', 'order_placed_on', 'status', 'completion_date',
+    'amount', 'invoice_id', 'particular', 'particular_details', 'particular_amount',
+]
+
+
+def order_rows(orders):
+    particulars = Particulars.objects.only('order_id', 'name', 'details', 'amount').order_by('id')
+    orders = (
+        orders.select_related('customer')
+        .prefetch_related(Prefetch('particulars', queryset=particulars))
+        .order_by('id')
+    )
+    for order in orders.iterator(chunk_size=CHUNK_SIZE):
+        head = [
+            order.id, order.customer.name, order.customer.email, order.order_placed_on, order.status,
+            order.completion_date, order.amount, order.invoice_id,
+        ]
+        items = order.particulars.all()
+        if not items:
+            yield head + ['', '', '']
+        for item in items:
+            yield head + [item.name, item.details, item.amount]
+
+
+INVOICE_HEADER = ['invoice_id', 'total_amount', 'paid', 'paid_on_date', 'orders']
+
+
+def _order_count(model):
+    counts = model.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice').annotate(n=Count('*'))
+    return Coalesce(Subquery(counts.values('n')), 0)
+
+
+def invoice_rows(orders, archived_orders):
+    """Invoices of the matching live or archived orders; all of them when no order filter applies."""
+    invoices = Invoice.objects.annotate(order_count=_order_count(Order) + _order_count(ArchivedOrder))
+    if orders.query.where:
+        invoices = invoices.filter(
+            Exists(orders.filter(invoice=OuterRef('pk'))) | Exists(archived_orders.filter(invoice=OuterRef('pk')))
+        )
+    invoices = invoices.order_by('id')
+    for invoice in invoices.iterator(chunk_size=CHUNK_SIZE):
+        yield [invoice.id, invoice.total_amount, invoice.paid, invoice.paid_on_date, invoice.order_count]
+
+
+STAGE_HEADER = ['order_id', 'stage', 'vendor', 'start_date', 'end_date', 'status', 'days']
+
+
+def stage_rows(stages):
+    stages = stages.select_related('stage', 'assigned_vendor').order_by('order_id', 'stage_id')
+    for row in stages.iterator(chunk_size=CHUNK_SIZE):
+        days = (row.end_date - row.start_date).days if row.end_date else ''
+        vendor = row.assigned_vendor.name if row.assigned_vendor else ''
+        yield [row.order_id, row.stage.name, vendor, row.start_date, row.end_date, row.status, days]
@@ -1,16 +1,78 @@
 from django import forms
-from .models import OrderStage, Vendor, Order, Customer, Measurement, PipelineStage, Particulars
+from django.urls import reverse
+from .measurements import MEASUREMENT_KEY_RE, search_measurements
+from .models import OrderStage, Vendor, Order, Customer, Measurement, PipelineStage, Particulars, INDEXED_MEASUREMENT_KEYS
+from . import reference
+from .workload import vendor_loads
+
+class ReferenceChoiceIterator(forms.models.ModelChoiceIterator):
+    """Yields the field's cached reference objects instead of running its queryset."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.reference():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.reference()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.reference())
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that renders its choices from the reference-data cache, so
+    rendering costs no queries. Submitted values are still validated against
+    the queryset.
+    """
+    iterator = ReferenceChoiceIterator
+    reference = None
+
+class StageChoiceField(ReferenceChoiceField):
+    reference = staticmethod(reference.stages)
+
+class VendorChoiceField(ReferenceChoiceField):
+    """Vendor select whose labels show how many stages each vendor has in progress."""
+    reference = staticmethod(reference.vendors)
+
+    def label_from_instance(self, obj):
+        if not hasattr(self, '_loads'):
+            self._loads = vendor_loads()
+        load = self._loads.get(obj.pk)
+        return f"{obj.name} ({load.open if load else 0} open)"
+
+class CustomerAutocomplete(forms.Widget):
+    """
+    Text box that looks customers up through the customer_search endpoint
+    instead of rendering every customer into a <select>.
+    """
+    template_name = 'production_tracker/widgets/customer_autocomplete.html'
+
+    class Media:
+        js = ['production_tracker/js/customer_autocomplete.js']
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        customer = None
+        if value and str(value).isdigit():
+            customer = Customer.objects.filter(pk=value).only('name', 'email').first()
+        context['widget']['label'] = f'{customer.name} <{customer.email}>' if customer else ''
+        context['widget']['search_url'] = reverse('customer_search')
+        return context
 
 class OrderStageUpdateForm(forms.ModelForm):
     class Meta:
         model = OrderStage
         fields = ['status', 'assigned_vendor']
+        field_classes = {'assigned_vendor': VendorChoiceField}
 
 class OrderForm(forms.ModelForm):
     class Meta:
         model = Order
         fields = ['customer', 'order_placed_on', 'status']
         widgets = {
+            'customer': CustomerAutocomplete,
             'order_placed_on': forms.DateInput(attrs={'type': 'date'})
         }
 
@@ -23,11 +85,125 @@ class MeasurementForm(forms.ModelForm):
     class Meta:
         model = Measurement
         fields = ['customer', 'measurement_type', 'value']
+        widgets = {
+            'customer': CustomerAutocomplete,
+        }
 
 class OrderStageCreateForm(forms.ModelForm):
     class Meta:
         model = OrderStage
         fields = ['stage', 'assigned_vendor', 'start_date', 'status']
+        field_classes = {'stage': StageChoiceField, 'assigned_vendor': VendorChoiceField}
         widgets = {
             'start_date': forms.DateInput(attrs={'type': 'date'})
         }
+
+class BulkStageTransitionForm(forms.Form):
+    MAX_ORDERS = 1000
+
+    stage = StageChoiceField(
+        queryset=PipelineStage.objects.all(), required=False,
+        help_text="Only complete orders currently in this stage. Leave empty to advance whatever stage each order is in.",
+    )
+    orders = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 6}),
+        help_text="Order IDs separated by commas, spaces or new lines.",
+    )
+
+    def clean_orders(self):
+        raw = self.cleaned_data['orders'].replace(',', ' ').split()
+        try:
+            ids = sorted({int(value) for value in raw})
+        except ValueError:
+            raise forms.ValidationError("Order IDs must be whole numbers.")
+        if len(ids) > self.MAX_ORDERS:
+            raise forms.ValidationError(f"At most {self.MAX_ORDERS} orders can be advanced at once.")
+        return ids
+
+class BatchInvoiceForm(forms.Form):
+    until = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text="Only invoice orders completed on or before this date, e.g. the last day of the month.",
+    )
+
+class OrderFilterForm(forms.Form):
+    status = forms.CharField(required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    stage = forms.IntegerField(required=False, help_text="Current pipeline stage id.")
+    vendor = forms.IntegerField(required=False, help_text="Id of the vendor on the current stage.")
+
+    def filter(self, queryset, prefix=''):
+        """Apply the valid filters to an Order queryset, or to one related to Order through `prefix`."""
+        self.is_valid()
+        # Holds only the fields that validated; a bad date is simply not applied.
+        data = self.cleaned_data
+        if data.get('status'):
+            queryset = queryset.filter(**{f'{prefix}status': data['status']})
+        if data.get('date_from'):
+            queryset = queryset.filter(**{f'{prefix}order_placed_on__gte': data['date_from']})
+        if data.get('date_to'):
+            queryset = queryset.filter(**{f'{prefix}order_placed_on__lte': data['date_to']})
+        if data.get('stage'):
+            queryset = queryset.filter(**{f'{prefix}current_stage': data['stage']})
+        if data.get('vendor'):
+            queryset = queryset.filter(**{f'{prefix}current_vendor': data['vendor']})
+        return queryset
+
+    def filter_archive(self, queryset):
+        """Apply the valid filters to an ArchivedOrder queryset; archived orders have no current stage or vendor."""
+        self.is_valid()
+        if self.cleaned_data.get('stage') or self.cleaned_data.get('vendor'):
+            return queryset.none()
+        return self.filter(queryset)
+
+class MeasurementSearchForm(forms.Form):
+    """Filters over Measurement.value; ranges are offered for the indexed keys."""
+
+    measurement_type = forms.CharField(required=False)
+    has = forms.CharField(required=False, help_text='Comma-separated keys that must be present.')
+    missing = forms.CharField(required=False, help_text='Comma-separated keys that must be absent.')
+    contains = forms.JSONField(required=False, help_text='JSON object the value must contain.')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for key in INDEXED_MEASUREMENT_KEYS:
+            self.fields[f'{key}_min'] = forms.FloatField(required=False, min_value=0)
+            self.fields[f'{key}_max'] = forms.FloatField(required=False, min_value=0)
+
+    def _clean_keys(self, name):
+        keys = [key.strip() for key in self.cleaned_data[name].split(',') if key.strip()]
+        for key in keys:
+            if not MEASUREMENT_KEY_RE.match(key):
+                raise forms.ValidationError(f'"{key}" is not a valid measurement key.')
+        return keys
+
+    def clean_has(self):
+        return self._clean_keys('has')
+
+    def clean_missing(self):
+        return self._clean_keys('missing')
+
+    def clean_contains(self):
+        contains = self.cleaned_data['contains']
+        if contains is not None and not isinstance(contains, dict):
+            raise forms.ValidationError('Enter a JSON object.')
+        return contains
+
+    def filter(self, queryset):
+        self.is_valid()
+        # As with OrderFilterForm, only the fields that validated are applied.
+        data = self.cleaned_data
+        ranges = []
+        for key in INDEXED_MEASUREMENT_KEYS:
+            low, high = data.get(f'{key}_min'), data.get(f'{key}_max')
+            if low is not None or high is not None:
+                ranges.append((key, low, high))
+        return search_measurements(
+            queryset,
+            measurement_type=data.get('measurement_type'),
+            has_keys=data.get('has') or (),
+            missing_keys=data.get('missing') or (),
+            contains=data.get('contains'),
+            ranges=ranges,
+        )
@@ -0,0 +1,256 @@
+"""
+Per-request performance instrumentation.
+
+InstrumentationMiddleware records, for a sample of requests, the wall time, the
+time spent in SQL, the number of queries, the time spent rendering the response
+and its size. Each sampled response carries a Server-Timing header, requests
+slower than SLOW_REQUEST_MS are logged with their SQL, and the numbers feed the
+per-view histograms served by `metrics` in the Prometheus text format.
+
+Histograms live in process memory: each gunicorn worker exposes its own, and
+they reset when the worker restarts.
+"""
+import logging
+import random
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('production_tracker.slow_requests')
+
+# Distinct statements shown in a slow-request log entry, slowest first.
+SLOW_LOG_STATEMENTS = 10
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100, 200)
+BYTES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# The timing of the request being handled in this context. Context variables
+# follow the request into sync_to_async threads, so queries run there count too.
+_current = ContextVar('request_timing', default=None)
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> [count per bucket..., count above the last bucket]
+        self.counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, labels, value):
+        self.counts[labels][bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, counts in sorted(self.counts.items()):
+            pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels))
+            total = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                total += count
+                lines.append(f'{self.name}_bucket{{{pairs},le="{bound}"}} {total}')
+            lines.append(f'{self.name}_sum{{{pairs}}} {self.sums[labels]}')
+            lines.append(f'{self.name}_count{{{pairs}}} {total}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    label_names = ('view', 'method')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.duration = Histogram('http_request_duration_seconds', 'Wall time of the request.', SECONDS)
+        self.db = Histogram('http_request_db_seconds', 'Time spent in SQL.', SECONDS)
+        self.queries = Histogram('http_request_queries', 'SQL statements executed.', QUERIES)
+        self.render_time = Histogram('http_request_render_seconds', 'Time spent rendering the response.', SECONDS)
+        self.size = Histogram('http_response_size_bytes', 'Response body size.', BYTES)
+
+    def observe(self, labels, timing, size):
+        with self.lock:
+            self.duration.observe(labels, timing.elapsed)
+            self.db.observe(labels, timing.db_time)
+            self.queries.observe(labels, len(timing.queries))
+            self.render_time.observe(labels, timing.render_time)
+            if size is not None:
+                self.size.observe(labels, size)
+
+    def render(self):
+        histograms = (self.duration, self.db, self.queries, self.render_time, self.size)
+        with self.lock:
+            lines = [line for histogram in histograms for line in histogram.render(self.label_names)]
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+
+registry = Registry()
+
+
+class RequestTiming:
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.elapsed = 0.0
+        self.queries = []
+        self.db_time = 0.0
+        self.render_start = None
+        self.render_time = 0.0
+
+    def record_query(self, sql, duration):
+        self.queries.append((sql, duration))
+        self.db_time += duration
+
+    def rendered(self, response):
+        if self.render_start is not None:
+            self.render_time = perf_counter() - self.render_start
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{len(self.queries)} queries", '
+            f'render;dur={self.render_time * 1000:.1f}, '
+            f'total;dur={self.elapsed * 1000:.1f}'
+        )
+
+    def slowest_statements(self):
+        # Identical statements are grouped, so an N+1 shows up as one line.
+        grouped = defaultdict(lambda: [0, 0.0])
+        for sql, duration in self.queries:
+            grouped[sql][0] += 1
+            grouped[sql][1] += duration
+        ranked = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)
+        return ranked[:SLOW_LOG_STATEMENTS]
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.record_query(sql, perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Connections are reopened on the same wrapper, so install once per wrapper.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class InstrumentationMiddleware:
+    """
+    Record a REQUEST_METRICS_SAMPLE_RATE fraction of requests. Unsampled
+    requests cost a random number and a context variable lookup per query.
+    Place it early in MIDDLEWARE so session and user lookups are counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, timing)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, timing)
+
+    def process_template_response(self, request, response):
+        # Runs just before a TemplateResponse (or DRF Response) is rendered;
+        # responses rendered inside the view count towards the view's time.
+        timing = _current.get()
+        if timing is not None:
+            timing.render_start = perf_counter()
+            response.add_post_render_callback(timing.rendered)
+        return response
+
+
+def _sampled():
+    rate = settings.REQUEST_METRICS_SAMPLE_RATE
+    return rate >= 1 or random.random() < rate
+
+
+def _finish(request, response, timing):
+    timing.elapsed = perf_counter() - timing.start
+    match = request.resolver_match
+    view = match.view_name if match else '<unresolved>'
+    method = request.method if request.method in METHODS else 'other'
+    size = None if response.streaming else len(response.content)
+    registry.observe((view, method), timing, size)
+    response['Server-Timing'] = timing.server_timing()
+    if timing.elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+        _log_slow_request(request, view, timing)
+    return response
+
+
+def _log_slow_request(request, view, timing):
+    statements = '\n'.join(
+        f'  {count} x {total * 1000:.1f} ms  {sql}' for sql, (count, total) in timing.slowest_statements()
+    )
+    # Statements are logged without their parameters, which carry customer data.
+    logger.warning(
+        'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, render %.0f ms\n%s',
+        request.method, request.get_full_path(), view, timing.elapsed * 1000,
+        len(timing.queries), timing.db_time * 1000, timing.render_time * 1000, statements,
+    )
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. With METRICS_TOKEN set it expects that token as
+    a bearer token; otherwise it is open to logged-in staff only.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        allowed = constant_time_compare(supplied, settings.METRICS_TOKEN)
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
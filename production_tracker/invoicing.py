@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .changes import mark_changed
+from .models import Invoice, Order
+
+# Customers invoiced per statement (and transaction).
+BATCH_SIZE = 500
+
+InvoiceRun = namedtuple('InvoiceRun', ['invoices', 'orders', 'total'])
+
+# Invoices the next `limit` customers (by id, after `after`) with completed,
+# uninvoiced orders: one invoice per customer totalling Order.amount (kept in
+# sync with the particulars by the totals module), and links the orders to it.
+# Invoice ids are drawn from the sequence up front so the order UPDATE can use
+# them in the same statement. FOR UPDATE re-checks `invoice_id IS NULL` after
+# waiting on a concurrent run, so no order is invoiced twice.
+BATCH_SQL = """
+WITH customers AS (
+    SELECT DISTINCT customer_id FROM {order} o
+    WHERE {pending} AND o.customer_id > %(after)s
+    ORDER BY customer_id
+    LIMIT %(limit)s
+),
+batch AS (
+    SELECT o.id, o.customer_id, o.amount
+    FROM {order} o
+    WHERE {pending} AND o.customer_id IN (SELECT customer_id FROM customers)
+    FOR UPDATE
+),
+totals AS (
+    SELECT customer_id, nextval(pg_get_serial_sequence(%(invoice_table)s, 'id')) AS invoice_id,
+           SUM(amount) AS total, COUNT(*) AS orders
+    FROM batch
+    GROUP BY customer_id
+),
+invoices AS (
+    INSERT INTO {invoice} (id, total_amount, paid)
+    SELECT invoice_id, total, false FROM totals
+),
+linked AS (
+    UPDATE {order} o SET invoice_id = t.invoice_id
+    FROM batch b JOIN totals t ON t.customer_id = b.customer_id
+    WHERE o.id = b.id
+)
+SELECT (SELECT MAX(customer_id) FROM customers), COUNT(*), COALESCE(SUM(orders), 0)::bigint,
+       COALESCE(SUM(total), 0)::bigint
+FROM totals
+"""
+
+PENDING_SQL = "o.status = 'Completed' AND o.invoice_id IS NULL"
+
+
+def pending_orders(until=None):
+    """Completed orders not on an invoice yet, completed on or before `until` if given."""
+    orders = Order.objects.filter(status='Completed', invoice__isnull=True)
+    if until is not None:
+        orders = orders.filter(completion_date__lte=until)
+    return orders
+
+
+def pending_summary(until=None):
+    return pending_orders(until).aggregate(
+        orders=Count('id'), customers=Count('customer', distinct=True), total=Sum('amount', default=0),
+    )
+
+
+def invoice_completed_orders(until=None, batch_size=BATCH_SIZE):
+    """
+    Create one invoice per customer for their completed, uninvoiced orders
+    (completed on or before `until`, if given). Each batch of `batch_size`
+    customers is one statement in its own transaction. Returns an InvoiceRun.
+    """
+    qn = connection.ops.quote_name
+    pending = PENDING_SQL
+    params = {'limit': batch_size, 'invoice_table': qn(Invoice._meta.db_table)}
+    if until is not None:
+        pending += ' AND o.completion_date <= %(until)s'
+        params['until'] = until
+    sql = BATCH_SQL.format(
+        order=qn(Order._meta.db_table), invoice=qn(Invoice._meta.db_table), pending=pending,
+    )
+    invoices = orders = total = 0
+    after = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, {**params, 'after': after})
+            last_customer, created, linked, amount = cursor.fetchone()
+            if created:
+                # The INSERT and UPDATE bypass model signals.
+                mark_changed(Order, Invoice)
+        if last_customer is None:
+            return InvoiceRun(invoices, orders, total)
+        invoices += created
+        orders += linked
+        total += amount
+        after = last_customer
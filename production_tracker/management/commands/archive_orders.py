@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from production_tracker import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move completed, invoiced orders placed before a cutoff, with their stages and particulars, '
+        'into the yearly partitioned archive tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', type=date.fromisoformat,
+            help='Archive orders placed before this date (YYYY-MM-DD). Defaults to January 1 of last year.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.BATCH_SIZE, help='Orders moved per transaction.',
+        )
+        parser.add_argument(
+            '--detach', type=int, action='append', default=[], metavar='YEAR',
+            help='Afterwards, detach the archive partitions for YEAR so they can be dumped and dropped. Repeatable.',
+        )
+
+    def handle(self, *args, **options):
+        before = options['before'] or date(date.today().year - 1, 1, 1)
+        run = archive.archive_orders(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {run.orders} orders placed before {before}, '
+            f'with {run.stages} stages and {run.particulars} particulars.'
+        ))
+        for year in options['detach']:
+            tables = archive.detach_year(year)
+            if tables:
+                self.stdout.write(f'Detached {", ".join(tables)}.')
+            else:
+                self.stdout.write(f'No archive partitions for {year}.')
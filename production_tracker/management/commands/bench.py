@@ -0,0 +1,157 @@
+import json
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+
+from production_tracker import benchmarking, urls
+from production_tracker.models import Customer, Order
+
+# Routes that only accept POST, and login, which redirects the logged-in client.
+SKIPPED_ROUTES = {'login', 'logout', 'update_order_stage'}
+
+# Arguments for routes that need them, looked up once per run. order_detail
+# links to the invoice, which has no page yet, so use an uninvoiced order.
+ROUTE_ARGS = {
+    'order_detail': lambda: [Order.objects.filter(invoice=None).order_by('-id').values_list('pk', flat=True).first()],
+}
+
+# Query strings that make a route do representative work.
+ROUTE_QUERIES = {
+    'customer_search': 'q=pri',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'GET every route in production_tracker/urls.py in-process and report p50/p95/p99 latency, '
+        'query count and response size; save the results as a JSON baseline and compare against one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=30, help='Timed requests per route.')
+        parser.add_argument('--routes', nargs='+', help='Only these route names.')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='Show the change against this earlier --output file.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['routes']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        # Errors are reported as a 500 status, and fail the run once every
+        # route has been measured.
+        client = Client(raise_request_exception=False)
+        client.force_login(benchmarking.benchmark_user())
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url in self.route_urls(options['routes']):
+                results[name] = self.measure(client, url, options)
+
+        self.report(results, baseline)
+        failed = [name for name, result in results.items() if not 200 <= result['status'] < 300]
+        if failed:
+            # A baseline of error pages would hide the regression it is meant to catch.
+            raise CommandError(f"Routes did not return 2xx: {', '.join(failed)}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'meta': self.meta(options), 'routes': results}, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved {options['output']}")
+
+    def route_urls(self, only=None):
+        for pattern in urls.urlpatterns:
+            name = getattr(pattern, 'name', None)
+            if not isinstance(pattern, URLPattern) or not name or name in SKIPPED_ROUTES:
+                continue
+            if only and name not in only:
+                continue
+            args = ROUTE_ARGS[name]() if name in ROUTE_ARGS else []
+            if None in args or len(args) != len(pattern.pattern.converters):
+                self.stderr.write(f'Skipping {name}: no sample arguments (seed some data first).')
+                continue
+            url = reverse(name, args=args)
+            if name in ROUTE_QUERIES:
+                url = f'{url}?{ROUTE_QUERIES[name]}'
+            yield name, url
+
+    def measure(self, client, url, options):
+        # One counted request, which also warms caches, then the timed runs.
+        if options['cold']:
+            cache.clear()
+        # With DEBUG on, earlier runs may have filled the bounded query log,
+        # which would make the capture below come out empty.
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            size = len(_body(response))
+        # Read now: the log is reset by the requests that follow.
+        query_count = len(queries)
+
+        latencies = []
+        for _ in range(options['runs']):
+            if options['cold']:
+                cache.clear()
+            start = time.perf_counter()
+            _body(client.get(url))
+            latencies.append(time.perf_counter() - start)
+
+        summary = benchmarking.summarise(latencies, sum(latencies))
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': query_count,
+            'bytes': size,
+            'p50_ms': round(summary['p50'], 3),
+            'p95_ms': round(summary['p95'], 3),
+            'p99_ms': round(summary['p99'], 3),
+        }
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f"{'route':<24} {'status':>6} {'queries':>7} {'bytes':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for name, result in results.items():
+            line = (
+                f"{name:<24} {result['status']:>6} {result['queries']:>7} {result['bytes']:>9} "
+                f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            )
+            before = (baseline or {}).get(name)
+            if before:
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                line += f"  p50 {change:+.0f}%, queries {result['queries'] - before['queries']:+d}"
+            self.stdout.write(line)
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'runs': options['runs'],
+            'cold': options['cold'],
+            'orders': Order.objects.count(),
+            'customers': Customer.objects.count(),
+        }
+
+
+def _body(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
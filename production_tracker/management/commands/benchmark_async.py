@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from production_tracker import benchmarking
+from production_tracker.synthetic import generate
+
+# (page, sync path, async path)
+PAGES = [
+    ('dashboard', '/', '/async/'),
+    ('order list', '/orders/', '/async/orders/'),
+]
+DUMMY_CACHE = 'django.core.cache.backends.dummy.DummyCache'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync views under gunicorn (WSGI) with their async counterparts under '
+        'uvicorn (ASGI): requests/sec and latency percentiles under concurrent clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Generate this many synthetic orders first.')
+        parser.add_argument('--requests', type=int, default=1000, help='Timed requests per page and server.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Client threads.')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes for both servers.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker.')
+        parser.add_argument('--pool-size', type=int, default=10, help='Connection pool size per uvicorn worker.')
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Keep the configured cache. By default a dummy cache makes every dashboard request run its aggregates.',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            generate(options['seed'], stdout=self.stdout)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        headers = {'Cookie': benchmarking.session_cookie()}
+        env = {} if options['cache'] else {'CACHE_BACKEND': DUMMY_CACHE}
+
+        # Persistent connections are per thread, and ASGI runs each request's
+        # sync code on a fresh one, so the ASGI server has to use the pool.
+        asgi_env = {**env, 'DB_CONNECTIONS': 'pool', 'DB_POOL_MAX_SIZE': str(options['pool_size'])}
+        servers = [
+            ('wsgi', 1, benchmarking.Server.gunicorn(env, workers=options['workers'], threads=options['threads'])),
+            ('asgi', 2, benchmarking.Server.uvicorn(asgi_env, workers=options['workers'])),
+        ]
+        self.stdout.write(
+            f"{options['requests']} requests per page, {options['concurrency']} clients, "
+            f"{options['workers']} workers"
+        )
+        self.stdout.write(f"{'server':<7} {'page':<11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for label, column, server in servers:
+            with server:
+                for page, *paths in PAGES:
+                    result = benchmarking.load(
+                        server.base_url + paths[column - 1], options['requests'], options['concurrency'], headers,
+                    )
+                    self.stdout.write(
+                        f"{label:<7} {page:<11} {result['rps']:>8.1f} {result['p50']:>8.2f} "
+                        f"{result['p99']:>8.2f} {result['max']:>8.2f}"
+                    )
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from production_tracker import benchmarking
+
+MODES = list(settings.API_AUTHENTICATION_CLASSES)
+ENDPOINTS = {'vendors': '/api/vendors/', 'orders': '/api/orders/'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the app with gunicorn once per API_AUTHENTICATION mode and report requests/sec '
+        'and latency percentiles for bearer-token API requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+        parser.add_argument('--requests', type=int, default=2000, help='Timed requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Client threads.')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['requests']} requests per endpoint, {options['concurrency']} clients, "
+            f"{options['workers']} workers x {options['threads']} threads"
+        )
+        self.stdout.write(f"{'mode':<16} {'endpoint':<9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for mode in options['modes']:
+            server = benchmarking.Server.gunicorn(
+                env={'API_AUTHENTICATION': mode}, workers=options['workers'], threads=options['threads'],
+            )
+            with server:
+                for endpoint, path in ENDPOINTS.items():
+                    # A fresh token per run: access tokens only last ACCESS_TOKEN_LIFETIME.
+                    headers = {'Authorization': benchmarking.bearer_token()}
+                    result = benchmarking.load(
+                        server.base_url + path, options['requests'], options['concurrency'], headers,
+                    )
+                    self.stdout.write(
+                        f"{mode:<16} {endpoint:<9} {result['rps']:>8.1f} {result['p50']:>8.2f} "
+                        f"{result['p99']:>8.2f} {result['max']:>8.2f}"
+                    )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from production_tracker import benchmarking
+from production_tracker.synthetic import generate
+
+MODES = ['per-request', 'persistent', 'pool']
+PAGES = {'dashboard': '/', 'order list': '/orders/'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the app with gunicorn once per DB_CONNECTIONS mode and report requests/sec '
+        'and latency percentiles for the dashboard and the order list.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Generate this many synthetic orders first.')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+        parser.add_argument('--requests', type=int, default=2000, help='Timed requests per page and mode.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Client threads.')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker.')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            generate(options['seed'], stdout=self.stdout)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        headers = {'Cookie': benchmarking.session_cookie()}
+
+        self.stdout.write(
+            f"{options['requests']} requests per page, {options['concurrency']} clients, "
+            f"{options['workers']} workers x {options['threads']} threads"
+        )
+        self.stdout.write(f"{'mode':<12} {'page':<11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for mode in options['modes']:
+            server = benchmarking.Server.gunicorn(
+                env={'DB_CONNECTIONS': mode}, workers=options['workers'], threads=options['threads'],
+            )
+            with server:
+                for page, path in PAGES.items():
+                    result = benchmarking.load(
+                        server.base_url + path, options['requests'], options['concurrency'], headers,
+                    )
+                    self.stdout.write(
+                        f"{mode:<12} {page:<11} {result['rps']:>8.1f} {result['p50']:>8.2f} "
+                        f"{result['p99']:>8.2f} {result['max']:>8.2f}"
+                    )
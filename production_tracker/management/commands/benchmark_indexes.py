@@ -0,0 +1,102 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from production_tracker.models import Invoice, Order, OrderStage
+from production_tracker.synthetic import generate
+
+# The access-pattern indexes added by migration 0006; the "before" run goes
+# without these and only these.
+BENCHMARKED_INDEXES = (
+    'order_placed_on_id_idx',
+    'order_status_placed_on_idx',
+    'order_unfinished_status_idx',
+    'orderstage_order_stage_idx',
+    'orderstage_in_progress_idx',
+    'invoice_unpaid_idx',
+)
+
+# Dropping the indexes locks their tables for the whole "before" run, so the
+# command only runs against databases named as disposable.
+SCRATCH_PREFIXES = ('bench', 'scratch', 'test_')
+
+
+class Command(BaseCommand):
+    help = (
+        'Show EXPLAIN ANALYZE plans and timings for the hot Order, OrderStage and Invoice '
+        'queries with and without the access-pattern indexes. Runs only against a scratch '
+        'database (DB_NAME starting with bench, scratch or test_).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Generate this many synthetic orders first.')
+        parser.add_argument('--runs', type=int, default=20, help='Timed executions per query.')
+        parser.add_argument('--no-plans', action='store_true', help='Only print timings.')
+
+    def handle(self, *args, **options):
+        name = connection.settings_dict['NAME']
+        if not name.startswith(SCRATCH_PREFIXES):
+            raise CommandError(
+                f'Refusing to drop indexes in {name!r}: the "before" run locks Order, OrderStage and Invoice '
+                f'until it finishes. Run against a scratch database whose name starts with '
+                f'{", ".join(SCRATCH_PREFIXES)} (e.g. DB_NAME=bench_clothing).'
+            )
+        if options['seed']:
+            generate(options['seed'], stdout=self.stdout)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        queries = self.queries()
+        if not queries:
+            self.stderr.write('No orders found; run with --seed N to generate data.')
+            return
+
+        # The indexes are dropped inside a transaction that is always rolled
+        # back, so "before" is measured without touching the schema for real.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in BENCHMARKED_INDEXES:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index)}')
+            before = self.measure(queries, options)
+            transaction.set_rollback(True)
+        after = self.measure(queries, options)
+
+        for label in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {label}'))
+            for phase, results in (('before', before), ('after', after)):
+                median, plan = results[label]
+                self.stdout.write(f'{phase}: {median:.3f} ms median over {options["runs"]} runs')
+                if plan:
+                    self.stdout.write(plan)
+            speedup = before[label][0] / after[label][0] if after[label][0] else float('inf')
+            self.stdout.write(self.style.SUCCESS(f'speedup: {speedup:.1f}x\n'))
+
+    def queries(self):
+        sample = OrderStage.objects.filter(status='In Progress').values('order_id', 'stage_id').first()
+        if sample is None:
+            return {}
+        return {
+            'dashboard recent orders': Order.objects.order_by('-order_placed_on')[:5],
+            'order list ?status=Pending': Order.objects.filter(status='Pending').order_by('-order_placed_on', '-id')[:50],
+            'unfinished order counts': Order.objects.filter(status__in=['Pending', 'In Progress']).values('status').annotate(n=Count('id')),
+            'next stage for (order, stage)': OrderStage.objects.filter(
+                order_id=sample['order_id'], stage_id__gt=sample['stage_id']
+            ).order_by('stage_id')[:1],
+            'stages in progress by vendor': OrderStage.objects.filter(status='In Progress').values('assigned_vendor').annotate(n=Count('id')),
+            'unpaid invoices': Invoice.objects.filter(paid=False).order_by('id')[:50],
+        }
+
+    def measure(self, queries, options):
+        results = {}
+        for label, queryset in queries.items():
+            plan = None if options['no_plans'] else queryset.explain(analyze=True, buffers=True)
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(timings), plan)
+        return results
@@ -0,0 +1,311 @@
+import csv
+import io
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from production_tracker import durations, progress, workload
+from production_tracker.changes import mark_changed
+from production_tracker.models import Customer, Order, OrderStage, Particulars, PipelineStage, Vendor
+from production_tracker.pipeline import StageRow
+
+CSV_COLUMNS = [
+    'customer_name', 'customer_email', 'customer_phone', 'customer_address',
+    'order_placed_on', 'status', 'completion_date', 'particulars', 'stages',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream orders with their customer, particulars and stages from CSV or JSONL '
+        'and insert them in batches. Use - to read from stdin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file (.csv or .jsonl), or - for stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format; defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--copy', action='store_true', help='Load orders, particulars and stages with COPY.')
+        parser.add_argument('--checkpoint', help='File recording committed progress; an existing one is resumed.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        self.use_copy = options['copy']
+        if self.use_copy and connection.vendor != 'postgresql':
+            raise CommandError('--copy requires PostgreSQL.')
+
+        checkpoint = Path(options['checkpoint']) if options['checkpoint'] else None
+        skip = self.read_checkpoint(checkpoint, path)
+
+        self.stages = dict(PipelineStage.objects.values_list('name', 'id'))
+        self.vendors = dict(Vendor.objects.values_list('name', 'id'))
+        self.customers_by_email = {}
+        self.customers_by_phone = {}
+        # Customers with neither an email nor a phone can only be told apart by name.
+        self.customers_by_name = {}
+        customers = Customer.objects.values_list('id', 'name', 'email', 'phone')
+        for pk, name, email, phone in customers.iterator(chunk_size=10000):
+            self.remember_customer(pk, name, email, phone)
+
+        done = skip
+        batch = []
+        with self.open(path) as stream:
+            for number, record in self.records(stream, fmt):
+                if number <= skip:
+                    continue
+                batch.append((number, record))
+                if len(batch) >= options['batch_size']:
+                    done = self.flush(batch, checkpoint, path)
+                    batch = []
+            if batch:
+                done = self.flush(batch, checkpoint, path)
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {done - skip} orders ({done} records processed).'))
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        return open(path, encoding='utf-8', newline='')
+
+    def records(self, stream, fmt):
+        """(number, record) for every record in `stream`, numbered from 1."""
+        if fmt == 'jsonl':
+            lines = (line for line in stream if line.strip())
+            for number, line in enumerate(lines, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise CommandError(f'Record {number}: invalid JSON: {exc}')
+                yield number, record
+            return
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            missing = set(CSV_COLUMNS) - set(row)
+            if missing:
+                raise CommandError(f'CSV input is missing columns: {", ".join(sorted(missing))}')
+            try:
+                particulars = json.loads(row['particulars'] or '[]')
+                stages = json.loads(row['stages'] or '[]')
+            except ValueError as exc:
+                raise CommandError(f'Record {number}: invalid JSON in particulars or stages: {exc}')
+            yield number, {
+                'customer': {
+                    'name': row['customer_name'],
+                    'email': row['customer_email'],
+                    'phone': row['customer_phone'] or None,
+                    'address': row['customer_address'],
+                },
+                'order_placed_on': row['order_placed_on'],
+                'status': row['status'],
+                'completion_date': row['completion_date'] or None,
+                'particulars': particulars,
+                'stages': stages,
+            }
+
+    def read_checkpoint(self, checkpoint, path):
+        if not checkpoint or not checkpoint.exists():
+            return 0
+        state = json.loads(checkpoint.read_text())
+        if state['input'] != path:
+            raise CommandError(f'Checkpoint {checkpoint} belongs to {state["input"]}, not {path}.')
+        self.stdout.write(f'Resuming after record {state["records"]}.')
+        return state['records']
+
+    def write_checkpoint(self, checkpoint, path, records):
+        tmp = checkpoint.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'input': path, 'records': records}))
+        tmp.replace(checkpoint)
+
+    def flush(self, batch, checkpoint, path):
+        first, last = batch[0][0], batch[-1][0]
+        rows = []
+        for number, record in batch:
+            try:
+                rows.append(self.parse(number, record))
+            except (KeyError, TypeError, ValueError) as exc:
+                raise CommandError(f'Record {number}: {exc!r}')
+        try:
+            with transaction.atomic():
+                self.resolve_customers(rows)
+                if self.use_copy:
+                    order_ids = self.insert_with_copy(rows)
+                else:
+                    order_ids = self.insert_with_orm(rows)
+                progress.refresh(order_ids)
+                durations.record_completions(
+                    StageRow(None, order_id, stage_id, vendor_id, start, end)
+                    for order_id, row in zip(order_ids, rows)
+                    for stage_id, vendor_id, start, end, status in row['stages']
+                    if status == 'Completed' and end is not None
+                )
+                mark_changed(Customer, Order, OrderStage, Particulars)
+                transaction.on_commit(workload.invalidate)
+        except (DatabaseError, connection.Database.Error) as exc:
+            # COPY raises the driver's own errors.
+            raise CommandError(f'Records {first}-{last} were not imported: {exc}')
+        if checkpoint:
+            self.write_checkpoint(checkpoint, path, last)
+        self.stdout.write(f'{last} records committed')
+        return last
+
+    def parse(self, number, record):
+        customer = record['customer']
+        particulars = [
+            (p['name'], p.get('details', ''), int(p['amount'])) for p in record.get('particulars', [])
+        ]
+        stages = []
+        for s in record.get('stages', []):
+            if s['stage'] not in self.stages:
+                raise ValueError(f'record {number}: unknown pipeline stage {s["stage"]!r}')
+            vendor = s.get('vendor')
+            if vendor and vendor not in self.vendors:
+                raise ValueError(f'record {number}: unknown vendor {vendor!r}')
+            stages.append((
+                self.stages[s['stage']],
+                self.vendors[vendor] if vendor else None,
+                date.fromisoformat(s['start_date']),
+                date.fromisoformat(s['end_date']) if s.get('end_date') else None,
+                s['status'],
+            ))
+        return {
+            'customer': {
+                'name': customer['name'],
+                'email': customer.get('email') or '',
+                'phone': int(customer['phone']) if customer.get('phone') else None,
+                'address': customer.get('address') or '',
+            },
+            'order_placed_on': date.fromisoformat(record['order_placed_on']),
+            'status': record['status'],
+            'completion_date': date.fromisoformat(record['completion_date']) if record.get('completion_date') else None,
+            'amount': sum(amount for _, _, amount in particulars),
+            'particulars': particulars,
+            'stages': stages,
+        }
+
+    def remember_customer(self, pk, name, email, phone):
+        if email:
+            self.customers_by_email.setdefault(email.lower(), pk)
+        if phone:
+            self.customers_by_phone.setdefault(phone, pk)
+        if not email and not phone:
+            self.customers_by_name.setdefault(name, pk)
+
+    def lookup_customer(self, customer):
+        email = customer['email'].lower()
+        if not email and not customer['phone']:
+            return self.customers_by_name.get(customer['name'])
+        return (email and self.customers_by_email.get(email)) or (
+            customer['phone'] and self.customers_by_phone.get(customer['phone'])
+        )
+
+    def resolve_customers(self, rows):
+        pending = {}
+        new = []
+        for row in rows:
+            customer = row['customer']
+            row['customer_id'] = self.lookup_customer(customer)
+            if row['customer_id']:
+                continue
+            keys = [k for k in (customer['email'].lower(), customer['phone']) if k] or [customer['name']]
+            index = next((pending[k] for k in keys if k in pending), None)
+            if index is None:
+                index = len(new)
+                new.append(customer)
+            for key in keys:
+                pending.setdefault(key, index)
+            row['new_customer'] = index
+        if not new:
+            return
+
+        created = Customer.objects.bulk_create(Customer(**customer) for customer in new)
+        for obj in created:
+            self.remember_customer(obj.id, obj.name, obj.email, obj.phone)
+        for row in rows:
+            if 'new_customer' in row:
+                row['customer_id'] = created[row.pop('new_customer')].id
+
+    def insert_with_orm(self, rows):
+        orders = Order.objects.bulk_create(
+            Order(
+                customer_id=row['customer_id'],
+                order_placed_on=row['order_placed_on'],
+                status=row['status'],
+                completion_date=row['completion_date'],
+                amount=row['amount'],
+            )
+            for row in rows
+        )
+        Particulars.objects.bulk_create(
+            Particulars(order_id=order.id, name=name, details=details, amount=amount)
+            for order, row in zip(orders, rows)
+            for name, details, amount in row['particulars']
+        )
+        OrderStage.objects.bulk_create(
+            OrderStage(
+                order_id=order.id, stage_id=stage_id, assigned_vendor_id=vendor_id,
+                start_date=start, end_date=end, status=status,
+            )
+            for order, row in zip(orders, rows)
+            for stage_id, vendor_id, start, end, status in row['stages']
+        )
+        return [order.id for order in orders]
+
+    def insert_with_copy(self, rows):
+        # Reserve primary keys up front so child rows can reference their
+        # orders without a RETURNING round trip.
+        order_ids = self.reserve_ids(Order, len(rows))
+        particular_ids = iter(self.reserve_ids(Particulars, sum(len(row['particulars']) for row in rows)))
+        stage_ids = iter(self.reserve_ids(OrderStage, sum(len(row['stages']) for row in rows)))
+
+        self.copy(
+            Order,
+            ['id', 'customer_id', 'order_placed_on', 'status', 'completion_date', 'amount'],
+            ((order_id, row['customer_id'], row['order_placed_on'], row['status'], row['completion_date'], row['amount'])
+             for order_id, row in zip(order_ids, rows)),
+            not_null=['status'],
+        )
+        self.copy(
+            Particulars,
+            ['id', 'order_id', 'name', 'details', 'amount'],
+            ((next(particular_ids), order_id, name, details, amount)
+             for order_id, row in zip(order_ids, rows)
+             for name, details, amount in row['particulars']),
+            not_null=['name', 'details'],
+        )
+        self.copy(
+            OrderStage,
+            ['id', 'order_id', 'stage_id', 'assigned_vendor_id', 'start_date', 'end_date', 'status'],
+            ((next(stage_ids), order_id, *stage)
+             for order_id, row in zip(order_ids, rows)
+             for stage in row['stages']),
+            not_null=['status'],
+        )
+        return order_ids
+
+    def reserve_ids(self, model, count):
+        if not count:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                [model._meta.db_table, model._meta.pk.column, count],
+            )
+            return [pk for pk, in cursor.fetchall()]
+
+    def copy(self, model, columns, rows, not_null):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+        qn = connection.ops.quote_name
+        sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({}))'.format(
+            qn(model._meta.db_table),
+            ', '.join(qn(c) for c in columns),
+            ', '.join(qn(c) for c in not_null),
+        )
+        with connection.cursor() as cursor, cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
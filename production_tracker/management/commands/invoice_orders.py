@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from production_tracker import invoicing
+
+
+class Command(BaseCommand):
+    help = 'Create one invoice per customer for their completed orders that are not on an invoice yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until', type=date.fromisoformat,
+            help='Only invoice orders completed on or before this date (YYYY-MM-DD).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=invoicing.BATCH_SIZE, help='Customers invoiced per statement.',
+        )
+
+    def handle(self, *args, **options):
+        run = invoicing.invoice_completed_orders(until=options['until'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {run.invoices} invoices for {run.orders} orders totalling {run.total}.'
+        ))
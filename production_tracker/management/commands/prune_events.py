@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from production_tracker import events
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete transition events older than --days. Live pages only need the last few minutes of '
+        'the log, so run this from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Keep events from this many days back.')
+
+    def handle(self, *args, **options):
+        deleted = events.prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} transition events.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from production_tracker import authentication
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired outstanding JWT refresh tokens and their blacklist entries. '
+        'Every login issues one, so run this from cron, e.g. nightly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=authentication.PRUNE_BATCH_SIZE, help='Tokens deleted per statement.',
+        )
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = authentication.prune_expired_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding} expired tokens and {blacklisted} blacklist entries.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from production_tracker import durations
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the stage-duration rollup behind the dashboard analytics from OrderStage history, '
+        'archived and detached years included.'
+    )
+
+    def handle(self, *args, **options):
+        rows = durations.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} stage-duration rollup rows.'))
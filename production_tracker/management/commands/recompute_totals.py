@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from production_tracker import totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild Order.amount from Particulars and Invoice.total_amount from Orders, archived and detached '
+        'ones included, in a single SQL pass.'
+    )
+
+    def handle(self, *args, **options):
+        orders, invoices = totals.recompute()
+        self.stdout.write(self.style.SUCCESS(f'Repaired {orders} order amounts and {invoices} invoice totals.'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from production_tracker.models import Customer, Invoice, Measurement, Order, OrderStage, Particulars
+from production_tracker.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate realistic synthetic customers, measurements, orders, stages, particulars '
+        'and invoices, e.g. `seed_synthetic --orders 1000000` for production-scale volumes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100_000)
+        parser.add_argument('--customers', type=int, help='Defaults to one customer per five orders.')
+        parser.add_argument('--measurements', type=int, default=2, help='Average measurements per customer.')
+        parser.add_argument('--days', type=int, default=5 * 365, help='Spread orders over this many past days.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Orders (and customers) per transaction.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+
+    def handle(self, *args, **options):
+        models = (Customer, Measurement, Order, OrderStage, Particulars, Invoice)
+        before = {model: model.objects.count() for model in models}
+        start = time.perf_counter()
+        generate(
+            options['orders'],
+            customers=options['customers'],
+            measurements=options['measurements'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        elapsed = time.perf_counter() - start
+
+        for model in models:
+            added = model.objects.count() - before[model]
+            self.stdout.write(f'{model.__name__}: +{added}')
+        self.stdout.write(self.style.SUCCESS(f'Generated in {elapsed:.1f}s.'))
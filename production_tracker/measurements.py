@@ -0,0 +1,40 @@
+import re
+
+from django.db.models.fields.json import KeyTransform
+
+from .models import Measurement
+
+MEASUREMENT_KEY_RE = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+
+
+def search_measurements(queryset=None, *, measurement_type=None, has_keys=(), missing_keys=(), contains=None, ranges=()):
+    """
+    Filter measurements on their JSON ``value``.
+
+    ``has_keys``/``missing_keys`` test key existence, ``contains`` is a dict
+    the value must contain (``@>``) and ``ranges`` is a list of
+    ``(key, low, high)`` numeric bounds, either of which may be None.
+    Existence and containment use the GIN index; ranges on
+    INDEXED_MEASUREMENT_KEYS use the (measurement_type, value -> key) indexes.
+    """
+    if queryset is None:
+        queryset = Measurement.objects.all()
+    if measurement_type:
+        queryset = queryset.filter(measurement_type=measurement_type)
+    if has_keys:
+        queryset = queryset.filter(value__has_keys=list(has_keys))
+    for key in missing_keys:
+        queryset = queryset.exclude(value__has_key=key)
+    if contains:
+        queryset = queryset.filter(value__contains=contains)
+    for n, (key, low, high) in enumerate(ranges):
+        alias = f'_range_{n}'
+        queryset = queryset.alias(**{alias: KeyTransform(key, 'value')})
+        # jsonb sorts null < strings < numbers < booleans, so bounding both
+        # sides keeps non-numeric values out. Measurements are never negative,
+        # and `false` is the smallest jsonb above every number.
+        queryset = queryset.filter(**{
+            f'{alias}__gte': low if low is not None else 0,
+            f'{alias}__lte' if high is not None else f'{alias}__lt': high if high is not None else False,
+        })
+    return queryset
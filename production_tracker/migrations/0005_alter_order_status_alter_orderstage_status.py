@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0004_alter_measurement_measurement_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='orderstage',
+            name='status',
+            field=models.CharField(max_length=20),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:48
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('production_tracker', '0005_alter_order_status_alter_orderstage_status'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['id'], name='invoice_unpaid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['-order_placed_on', '-id'], name='order_placed_on_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['status', '-order_placed_on', '-id'], name='order_status_placed_on_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['Pending', 'In Progress'])), fields=['status'], name='order_unfinished_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderstage',
+            index=models.Index(fields=['order', 'stage'], name='orderstage_order_stage_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderstage',
+            index=models.Index(condition=models.Q(('status', 'In Progress')), fields=['assigned_vendor', 'stage'], name='orderstage_in_progress_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:57
+
+import django.contrib.postgres.indexes
+import django.db.models.fields.json
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('production_tracker', '0006_invoice_invoice_unpaid_idx_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['value'], name='measurement_value_gin'),
+        ),
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=models.Index(models.F('measurement_type'), django.db.models.fields.json.KeyTransform('chest', 'value'), name='measurement_chest_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=models.Index(models.F('measurement_type'), django.db.models.fields.json.KeyTransform('waist', 'value'), name='measurement_waist_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=models.Index(models.F('measurement_type'), django.db.models.fields.json.KeyTransform('hip', 'value'), name='measurement_hip_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=models.Index(models.F('measurement_type'), django.db.models.fields.json.KeyTransform('length', 'value'), name='measurement_length_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.comparison
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('production_tracker', '0007_measurement_measurement_value_gin_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', 'email', 'address', django.db.models.functions.comparison.Cast('phone', models.TextField()), config='simple'), name='customer_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='customer',
+            index=models.Index(fields=['name', 'id'], name='customer_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:03
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0008_customer_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageDurationRollup',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('month', models.DateField(help_text='First day of the month the stages were completed in.')),
+                ('count', models.IntegerField(default=0)),
+                ('total_days', models.BigIntegerField(default=0)),
+                ('histogram', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), help_text='Number of stages that took 0, 1, 2, ... days.', size=None)),
+                ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='production_tracker.pipelinestage')),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='production_tracker.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='stageduration_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stage', 'vendor', 'month'), name='stageduration_key', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# progress.REFRESH_SQL as of this migration, for every order.
+BACKFILL_SQL = """
+WITH stages AS (
+    SELECT o.id,
+           COUNT(s.id) AS total,
+           COUNT(s.id) FILTER (WHERE s.status = 'Completed') AS completed,
+           (array_agg(s.stage_id ORDER BY s.stage_id) FILTER (WHERE s.status <> 'Completed'))[1] AS stage_id,
+           (array_agg(s.assigned_vendor_id ORDER BY s.stage_id) FILTER (WHERE s.status <> 'Completed'))[1] AS vendor_id,
+           (array_agg(s.start_date ORDER BY s.stage_id) FILTER (WHERE s.status <> 'Completed'))[1] AS start_date,
+           MAX(s.end_date) FILTER (WHERE s.status = 'Completed') AS last_end
+    FROM production_tracker_order o
+    JOIN production_tracker_orderstage s ON s.order_id = o.id
+    GROUP BY o.id
+)
+UPDATE production_tracker_order o SET
+    current_stage_id = p.stage_id,
+    current_vendor_id = p.vendor_id,
+    stages_completed = p.completed,
+    stages_total = p.total,
+    current_stage_since = CASE WHEN p.stage_id IS NOT NULL THEN GREATEST(p.start_date, p.last_end) END
+FROM stages p
+WHERE o.id = p.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0009_stagedurationrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='current_stage',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text='First unfinished stage; empty once every stage is completed.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='production_tracker.pipelinestage'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='current_stage_since',
+            field=models.DateField(blank=True, editable=False, help_text='Date the current stage began.', null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='current_vendor',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text='Vendor assigned to the current stage.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='production_tracker.vendor'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stages_completed',
+            field=models.PositiveSmallIntegerField(db_default=0, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stages_total',
+            field=models.PositiveSmallIntegerField(db_default=0, default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('production_tracker', '0010_order_progress'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['current_stage', '-order_placed_on', '-id'], name='order_current_stage_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['current_vendor', '-order_placed_on', '-id'], name='order_current_vendor_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('current_stage_since__isnull', False)), fields=['current_stage_since', 'id'], name='order_stage_since_idx'),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Range-partitioned by year of order_placed_on, which PostgreSQL requires in
+# every unique constraint. Partitions are added by archive.ensure_partitions.
+CREATE_SQL = """
+CREATE TABLE production_tracker_order_archive (
+    id integer NOT NULL,
+    customer_id integer NOT NULL
+        REFERENCES production_tracker_customer (id) DEFERRABLE INITIALLY DEFERRED,
+    order_placed_on date NOT NULL,
+    status varchar(20) NOT NULL,
+    completion_date date NULL,
+    amount integer NOT NULL,
+    invoice_id integer NULL
+        REFERENCES production_tracker_invoice (id) DEFERRABLE INITIALLY DEFERRED,
+    archived_on date NOT NULL,
+    PRIMARY KEY (id, order_placed_on)
+) PARTITION BY RANGE (order_placed_on);
+CREATE INDEX order_archive_customer_idx ON production_tracker_order_archive (customer_id);
+CREATE INDEX order_archive_invoice_idx ON production_tracker_order_archive (invoice_id);
+
+CREATE TABLE production_tracker_orderstage_archive (
+    id integer NOT NULL,
+    order_id integer NOT NULL,
+    order_placed_on date NOT NULL,
+    stage_id smallint NOT NULL
+        REFERENCES production_tracker_pipelinestage (id) DEFERRABLE INITIALLY DEFERRED,
+    assigned_vendor_id smallint NULL
+        REFERENCES production_tracker_vendor (id) DEFERRABLE INITIALLY DEFERRED,
+    start_date date NOT NULL,
+    end_date date NULL,
+    status varchar(20) NOT NULL,
+    PRIMARY KEY (id, order_placed_on),
+    FOREIGN KEY (order_id, order_placed_on)
+        REFERENCES production_tracker_order_archive (id, order_placed_on) ON DELETE CASCADE
+) PARTITION BY RANGE (order_placed_on);
+CREATE INDEX orderstage_archive_order_idx ON production_tracker_orderstage_archive (order_id);
+CREATE INDEX orderstage_archive_vendor_idx ON production_tracker_orderstage_archive (assigned_vendor_id);
+
+CREATE TABLE production_tracker_particulars_archive (
+    id integer NOT NULL,
+    order_id integer NOT NULL,
+    order_placed_on date NOT NULL,
+    name varchar(20) NOT NULL,
+    details varchar(100) NOT NULL,
+    amount integer NOT NULL,
+    PRIMARY KEY (id, order_placed_on),
+    FOREIGN KEY (order_id, order_placed_on)
+        REFERENCES production_tracker_order_archive (id, order_placed_on) ON DELETE CASCADE
+) PARTITION BY RANGE (order_placed_on);
+CREATE INDEX particulars_archive_order_idx ON production_tracker_particulars_archive (order_id);
+"""
+
+DROP_SQL = """
+DROP TABLE production_tracker_particulars_archive;
+DROP TABLE production_tracker_orderstage_archive;
+DROP TABLE production_tracker_order_archive;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0011_order_progress_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(CREATE_SQL, DROP_SQL)],
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedOrder',
+                    fields=[
+                        ('id', models.IntegerField(primary_key=True, serialize=False)),
+                        ('order_placed_on', models.DateField()),
+                        ('status', models.CharField(max_length=20)),
+                        ('completion_date', models.DateField(blank=True, null=True)),
+                        ('amount', models.IntegerField(default=0)),
+                        ('archived_on', models.DateField()),
+                        ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='production_tracker.customer')),
+                        ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='production_tracker.invoice')),
+                    ],
+                    options={
+                        'db_table': 'production_tracker_order_archive',
+                    },
+                ),
+                migrations.CreateModel(
+                    name='ArchivedOrderStage',
+                    fields=[
+                        ('id', models.IntegerField(primary_key=True, serialize=False)),
+                        ('order_placed_on', models.DateField()),
+                        ('start_date', models.DateField()),
+                        ('end_date', models.DateField(blank=True, null=True)),
+                        ('status', models.CharField(max_length=20)),
+                        ('assigned_vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='production_tracker.vendor')),
+                        ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stages', to='production_tracker.archivedorder')),
+                        ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='production_tracker.pipelinestage')),
+                    ],
+                    options={
+                        'db_table': 'production_tracker_orderstage_archive',
+                    },
+                ),
+                migrations.CreateModel(
+                    name='ArchivedParticulars',
+                    fields=[
+                        ('id', models.IntegerField(primary_key=True, serialize=False)),
+                        ('order_placed_on', models.DateField()),
+                        ('name', models.CharField(max_length=20)),
+                        ('details', models.CharField(blank=True, max_length=100)),
+                        ('amount', models.IntegerField()),
+                        ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='particulars', to='production_tracker.archivedorder')),
+                    ],
+                    options={
+                        'db_table': 'production_tracker_particulars_archive',
+                    },
+                ),
+            ],
+        ),
+    ]
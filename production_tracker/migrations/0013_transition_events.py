@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:43
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+# Wakes events.Feed listeners once per committing transaction that appended to
+# the log (NOTIFY folds duplicates within a transaction). The channel name must
+# match events.CHANNEL.
+TRIGGER_SQL = """
+CREATE FUNCTION production_tracker_transitionevent_notify() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('transition_events', '');
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER transitionevent_notify
+    AFTER INSERT ON production_tracker_transitionevent
+    FOR EACH STATEMENT EXECUTE FUNCTION production_tracker_transitionevent_notify();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER transitionevent_notify ON production_tracker_transitionevent;
+DROP FUNCTION production_tracker_transitionevent_notify();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0012_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransitionEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('occurred_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+                ('kind', models.CharField(choices=[('order_created', 'Order created'), ('stage_started', 'Stage started'), ('stage_completed', 'Stage completed'), ('stage_updated', 'Stage updated')], max_length=20)),
+                ('status', models.CharField(help_text='Status of the order or stage after the change.', max_length=20)),
+                ('previous_status', models.CharField(blank=True, help_text='Status before the change; empty for new orders.', max_length=20)),
+                ('order', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='production_tracker.order')),
+                ('order_stage', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='production_tracker.orderstage')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['occurred_at'], name='transitionevent_occurred_brin')],
+            },
+        ),
+        migrations.RunSQL(TRIGGER_SQL, DROP_TRIGGER_SQL),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0013_transition_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stagedurationrollup',
+            name='vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='production_tracker.vendor'),
+        ),
+    ]
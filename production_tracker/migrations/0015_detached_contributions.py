@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_tracker', '0014_stageduration_vendor_set_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetachedInvoiceTotal',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('year', models.SmallIntegerField()),
+                ('amount', models.IntegerField(help_text="Sum of the detached orders' amounts on this invoice.")),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='production_tracker.invoice')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DetachedStageDuration',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('year', models.SmallIntegerField()),
+                ('month', models.DateField()),
+                ('bucket', models.SmallIntegerField(help_text='Histogram bucket: days taken, capped at DURATION_BUCKETS - 1.')),
+                ('count', models.IntegerField()),
+                ('total_days', models.BigIntegerField()),
+                ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='production_tracker.pipelinestage')),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='production_tracker.vendor')),
+            ],
+        ),
+    ]
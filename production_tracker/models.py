@@ -1,5 +1,18 @@
+from datetime import date
+
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Cast, Now
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVector
+
+# Document matched by the customer typeahead (customers.search_customers). The
+# search has to use this exact expression for customer_search_idx to apply.
+CUSTOMER_SEARCH_VECTOR = SearchVector(
+    'name', 'email', 'address', Cast('phone', models.TextField()), config='simple',
+)
 
 class Customer(models.Model):
     id = models.AutoField(primary_key=True)
@@ -8,6 +21,21 @@ class Customer(models.Model):
     phone = models.BigIntegerField(null=True, blank=True)
     address = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(CUSTOMER_SEARCH_VECTOR, name='customer_search_idx'),
+            # Lets a common prefix walk customers in name order and stop at
+            # the limit instead of sorting every match.
+            models.Index(fields=['name', 'id'], name='customer_name_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} <{self.email}>'
+
+# Measurement.value keys that get their own (measurement_type, value -> key) index
+# for range searches; any other key is still served by the GIN index.
+INDEXED_MEASUREMENT_KEYS = ['chest', 'waist', 'hip', 'length']
+
 class Measurement(models.Model):
     id = models.AutoField(primary_key=True)
     MEASUREMENT_CHOICES = [
@@ -20,10 +48,22 @@ class Measurement(models.Model):
     measurement_type = models.CharField(max_length=20, choices=MEASUREMENT_CHOICES)
     value = models.JSONField(blank=True, null=True, help_text="Stores measurement values in JSON format.")
 
+    class Meta:
+        indexes = [
+            # Key existence (?, ?|, ?&) and containment (@>) on value.
+            GinIndex(fields=['value'], name='measurement_value_gin'),
+        ] + [
+            models.Index(F('measurement_type'), KeyTransform(key, 'value'), name=f'measurement_{key}_idx')
+            for key in INDEXED_MEASUREMENT_KEYS
+        ]
+
 class VendorRole(models.Model):
     id = models.SmallAutoField(primary_key=True)
     name = models.CharField(max_length=10)
 
+    def __str__(self):
+        return self.name
+
 class Vendor(models.Model):
     id = models.SmallAutoField(primary_key=True)
     name = models.CharField(max_length=100)
@@ -32,18 +72,71 @@ class Vendor(models.Model):
     address = models.TextField(blank=True)
     remark = models.TextField(blank=True, help_text="Any additional remarks about the vendor.")
 
+    def __str__(self):
+        return self.name
+
 class PipelineStage(models.Model):
     id = models.SmallAutoField(primary_key=True)
     name = models.CharField(max_length=20)
 
+    def __str__(self):
+        return self.name
+
 class Order(models.Model):
     id = models.AutoField(primary_key=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     order_placed_on = models.DateField()
-    status = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
     completion_date = models.DateField(null=True, blank=True, help_text="Date when the order was completed.")
     amount = models.IntegerField(default=0, help_text="Total calculated amount for the order. Stored as integer, e.g., in cents/paise.")
     invoice = models.ForeignKey('Invoice', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    # Pipeline projection of the order's stages, kept current by progress.refresh().
+    current_stage = models.ForeignKey(
+        'PipelineStage', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+',
+        db_index=False, help_text="First unfinished stage; empty once every stage is completed.",
+    )
+    current_vendor = models.ForeignKey(
+        'Vendor', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+',
+        db_index=False, help_text="Vendor assigned to the current stage.",
+    )
+    stages_completed = models.PositiveSmallIntegerField(default=0, db_default=0, editable=False)
+    stages_total = models.PositiveSmallIntegerField(default=0, db_default=0, editable=False)
+    current_stage_since = models.DateField(null=True, blank=True, editable=False, help_text="Date the current stage began.")
+
+    class Meta:
+        indexes = [
+            # Dashboard recent orders and the order list's keyset ordering.
+            models.Index(fields=['-order_placed_on', '-id'], name='order_placed_on_id_idx'),
+            # Order list filtered by ?status=, in the same ordering.
+            models.Index(fields=['status', '-order_placed_on', '-id'], name='order_status_placed_on_idx'),
+            # Pending / In Progress counts; completed orders dominate the table.
+            models.Index(fields=['status'], name='order_unfinished_status_idx', condition=Q(status__in=['Pending', 'In Progress'])),
+            # Order list filtered by ?stage=, in the default ordering.
+            models.Index(fields=['current_stage', '-order_placed_on', '-id'], name='order_current_stage_idx'),
+            # Order list filtered by ?vendor=; also serves SET_NULL on vendor delete.
+            models.Index(fields=['current_vendor', '-order_placed_on', '-id'], name='order_current_vendor_idx'),
+            # Order list sorted by time in the current stage (?sort=waiting).
+            models.Index(fields=['current_stage_since', 'id'], name='order_stage_since_idx', condition=Q(current_stage_since__isnull=False)),
+        ]
+
+    # Maintained from other rows (production_tracker.totals and progress).
+    # Saving an existing order leaves them alone, so an instance loaded before
+    # they changed cannot write its stale copy back.
+    MAINTAINED_FIELDS = {
+        'amount', 'current_stage', 'current_vendor', 'stages_completed', 'stages_total', 'current_stage_since',
+    }
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def days_in_stage(self):
+        return (date.today() - self.current_stage_since).days if self.current_stage_since else None
 
 class OrderStage(models.Model):
     id = models.AutoField(primary_key=True)
@@ -52,7 +145,40 @@ class OrderStage(models.Model):
     assigned_vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, blank=True)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
-    status = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+
+    class Meta:
+        indexes = [
+            # Next-stage lookup in UpdateOrderStageView and the order detail stage list.
+            models.Index(fields=['order', 'stage'], name='orderstage_order_stage_idx'),
+            models.Index(fields=['assigned_vendor', 'stage'], name='orderstage_in_progress_idx', condition=Q(status='In Progress')),
+        ]
+
+# Durations of DURATION_BUCKETS - 1 days or more share the last histogram bucket.
+DURATION_BUCKETS = 61
+
+class StageDurationRollup(models.Model):
+    """
+    Completed-stage durations per stage, vendor and month of completion, kept
+    up to date by durations.record_completions as stages complete.
+    """
+    id = models.AutoField(primary_key=True)
+    stage = models.ForeignKey(PipelineStage, on_delete=models.CASCADE, related_name='+')
+    # SET_NULL like OrderStage.assigned_vendor: a deleted vendor's history is
+    # counted as unassigned (signals.unassign_vendor_durations merges it).
+    vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    month = models.DateField(help_text="First day of the month the stages were completed in.")
+    count = models.IntegerField(default=0)
+    total_days = models.BigIntegerField(default=0)
+    histogram = ArrayField(models.IntegerField(), help_text="Number of stages that took 0, 1, 2, ... days.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'vendor', 'month'], nulls_distinct=False, name='stageduration_key'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='stageduration_month_idx'),
+        ]
 
 class Invoice(models.Model):
     id = models.AutoField(primary_key=True)
@@ -60,9 +186,117 @@ class Invoice(models.Model):
     paid_on_date = models.DateField(null=True, blank=True)
     paid = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='invoice_unpaid_idx', condition=Q(paid=False)),
+        ]
+
 class Particulars(models.Model):
     id = models.AutoField(primary_key=True)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='particulars')
     name = models.CharField(max_length=20, help_text="Name or description of the particular item.")
     details = models.CharField(max_length=100, blank=True, help_text="Additional details about the particular item.")
     amount = models.IntegerField(help_text="Amount for this particular item. Stored as integer, e.g., in cents/paise.")
+
+# Completed, invoiced orders moved out of the live tables by archive.archive_orders,
+# with their stages and particulars. The tables are partitioned by the year of
+# order_placed_on (created by migration 0012; partitions by archive.ensure_partitions),
+# so their primary keys are really (id, order_placed_on). Rows are read-only history.
+
+class ArchivedOrder(models.Model):
+    id = models.IntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='archived_orders')
+    order_placed_on = models.DateField()
+    status = models.CharField(max_length=20)
+    completion_date = models.DateField(null=True, blank=True)
+    amount = models.IntegerField(default=0)
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+    archived_on = models.DateField()
+
+    class Meta:
+        db_table = 'production_tracker_order_archive'
+
+class ArchivedOrderStage(models.Model):
+    id = models.IntegerField(primary_key=True)
+    # The database cascades deletes from the archived order.
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.DO_NOTHING, db_constraint=False, related_name='stages')
+    order_placed_on = models.DateField()
+    stage = models.ForeignKey(PipelineStage, on_delete=models.CASCADE, related_name='+')
+    assigned_vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=20)
+
+    class Meta:
+        db_table = 'production_tracker_orderstage_archive'
+
+class ArchivedParticulars(models.Model):
+    id = models.IntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.DO_NOTHING, db_constraint=False, related_name='particulars')
+    order_placed_on = models.DateField()
+    name = models.CharField(max_length=20)
+    details = models.CharField(max_length=100, blank=True)
+    amount = models.IntegerField()
+
+    class Meta:
+        db_table = 'production_tracker_particulars_archive'
+
+# What the archive years detached by archive.detach_year added to invoice
+# totals and the duration rollup, so totals.recompute() and durations.rebuild()
+# can count them once the detached tables are dropped. A year may be saved more
+# than once if it is archived and detached again; readers sum the rows.
+
+class DetachedInvoiceTotal(models.Model):
+    id = models.AutoField(primary_key=True)
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='+')
+    year = models.SmallIntegerField()
+    amount = models.IntegerField(help_text="Sum of the detached orders' amounts on this invoice.")
+
+class DetachedStageDuration(models.Model):
+    id = models.AutoField(primary_key=True)
+    year = models.SmallIntegerField()
+    stage = models.ForeignKey(PipelineStage, on_delete=models.CASCADE, related_name='+')
+    vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    month = models.DateField()
+    bucket = models.SmallIntegerField(help_text="Histogram bucket: days taken, capped at DURATION_BUCKETS - 1.")
+    count = models.IntegerField()
+    total_days = models.BigIntegerField()
+
+class TransitionEvent(models.Model):
+    """
+    Append-only log of order creations and stage changes, streamed to open
+    dashboards and order lists by events.py. Rows are written in the
+    transaction that made the change, and a trigger (migration 0013) NOTIFYs
+    listeners when it commits. The references carry no constraints so the log
+    is unaffected by archiving and deleting orders; prune it with
+    `manage.py prune_events`.
+    """
+    ORDER_CREATED = 'order_created'
+    STAGE_STARTED = 'stage_started'
+    STAGE_COMPLETED = 'stage_completed'
+    STAGE_UPDATED = 'stage_updated'
+    KIND_CHOICES = [
+        (ORDER_CREATED, 'Order created'),
+        (STAGE_STARTED, 'Stage started'),
+        (STAGE_COMPLETED, 'Stage completed'),
+        (STAGE_UPDATED, 'Stage updated'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    occurred_at = models.DateTimeField(db_default=Now())
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    order = models.ForeignKey(
+        Order, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+',
+    )
+    order_stage = models.ForeignKey(
+        OrderStage, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, blank=True,
+        related_name='+',
+    )
+    status = models.CharField(max_length=20, help_text="Status of the order or stage after the change.")
+    previous_status = models.CharField(max_length=20, blank=True, help_text="Status before the change; empty for new orders.")
+
+    class Meta:
+        indexes = [
+            # prune_events; rows are appended in occurred_at order.
+            BrinIndex(fields=['occurred_at'], name='transitionevent_occurred_brin'),
+        ]
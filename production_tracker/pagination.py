@@ -0,0 +1,170 @@
+import base64
+import json
+from dataclasses import dataclass
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from . import counts
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginationMixin:
+    """
+    Paginate a ListView by seeking past the last row shown instead of using
+    OFFSET, so every page costs one index range scan however deep it is.
+
+    ``keyset_ordering`` must end in a unique field (normally ``id``) so the
+    ordering is total. Cursors are passed as ``?after=`` / ``?before=`` and
+    every other query parameter (e.g. ``?status=``) is preserved.
+    """
+    keyset_ordering = ('id',)
+    keyset_page_size = 50
+
+    def get_context_data(self, **kwargs):
+        # Async views fetch the page themselves and pass it in.
+        page = kwargs.pop('page', None) or self.paginate_keyset(self.object_list)
+        context = super().get_context_data(object_list=page.object_list, **kwargs)
+        context['page'] = page
+        return context
+
+    def paginate_keyset(self, queryset):
+        queryset, backwards, after = self.keyset_queryset(queryset)
+        return self.keyset_page(list(queryset), backwards, after)
+
+    async def apaginate_keyset(self, queryset):
+        queryset, backwards, after = self.keyset_queryset(queryset)
+        return self.keyset_page([row async for row in queryset], backwards, after)
+
+    def keyset_queryset(self, queryset):
+        """
+        Return (queryset, backwards, after) for the requested page. The
+        queryset fetches one row more than a page to tell whether more follow.
+        """
+        after = self.decode_cursor(self.request.GET.get('after'))
+        before = self.decode_cursor(self.request.GET.get('before'))
+        queryset, backwards = keyset_rows(queryset, self.keyset_ordering, self.keyset_page_size, after, before)
+        return queryset, backwards, after
+
+    def keyset_page(self, rows, backwards, after):
+        return keyset_page(rows, self.keyset_ordering, self.keyset_page_size, backwards, after)
+
+    def encode_cursor(self, obj):
+        return encode_cursor(obj, self.keyset_ordering)
+
+    def decode_cursor(self, cursor):
+        return decode_cursor(cursor, self.keyset_ordering, self.model)
+
+
+def keyset_rows(queryset, ordering, size, after=None, before=None):
+    """
+    Return (queryset, backwards): the `size` rows after the decoded cursor
+    `after`, or before `before`, in `ordering`, plus one to tell whether more
+    follow. Rows before a cursor come in reverse order.
+    """
+    if before is not None:
+        reverse = [_flip(field) for field in ordering]
+        return queryset.filter(_seek(reverse, before)).order_by(*reverse)[:size + 1], True
+    if after is not None:
+        queryset = queryset.filter(_seek(ordering, after))
+    return queryset.order_by(*ordering)[:size + 1], False
+
+
+def keyset_page(rows, ordering, size, backwards, after):
+    """KeysetPage of the rows fetched by keyset_rows()."""
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+        has_next, has_previous = bool(rows), has_more
+    else:
+        has_next = has_more
+        has_previous = after is not None and bool(rows)
+
+    return KeysetPage(
+        object_list=rows,
+        next_cursor=encode_cursor(rows[-1], ordering) if has_next else None,
+        previous_cursor=encode_cursor(rows[0], ordering) if has_previous else None,
+    )
+
+
+def encode_cursor(obj, ordering):
+    values = [getattr(obj, _name(field)) for field in ordering]
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering, model):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(ordering):
+            raise ValueError
+        opts = model._meta
+        return [
+            (_name(field), opts.get_field(_name(field)).to_python(value))
+            for field, value in zip(ordering, values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        raise Http404('Invalid page cursor.')
+
+
+def _name(field):
+    return field.lstrip('-')
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _seek(ordering, values):
+    # Rows strictly after `values` in `ordering`:
+    # a >= x AND ((a > x) OR (a = x AND b > y) OR ...)
+    # The redundant bound on the leading column is what PostgreSQL can start
+    # the index range scan from; it cannot derive one from the OR.
+    condition = Q()
+    equal = Q()
+    for field, (name, value) in zip(ordering, values):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    if len(values) > 1:
+        field, (name, value) = ordering[0], values[0]
+        condition &= Q(**{f'{name}__{"lte" if field.startswith("-") else "gte"}': value})
+    return condition
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count is estimated (counts.count) for an unfiltered list of
+    at least `exact_count_limit` rows, so a changelist over a large table costs
+    no COUNT(*). Filtered and searched lists are counted exactly. Estimates can
+    be off by a few percent, so the last page may come up short or empty.
+    """
+    exact_count_limit = counts.EXACT_COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return counts.count(self.object_list, approximate=True, exact_limit=self.exact_count_limit)
+        return super().count
@@ -0,0 +1,90 @@
+from collections import namedtuple
+from datetime import date
+
+from django.db import connection, transaction
+
+from . import durations, progress, workload
+from .changes import mark_changed
+from .models import OrderStage, TransitionEvent
+
+StageRow = namedtuple('StageRow', ['id', 'order_id', 'stage_id', 'assigned_vendor_id', 'start_date', 'end_date'])
+Transition = namedtuple('Transition', ['completed', 'started'])
+
+# Completes the selected stages and moves the first unfinished stage after each
+# of them to 'In Progress', in one statement. Rows already completed are left
+# alone, so a double submit cannot advance an order twice, and a next stage
+# already in progress is not started again. Both changes are
+# appended to the transition log; every part of the statement sees the rows as
+# they were before it, so joining {table} again yields the previous statuses.
+ADVANCE_SQL = """
+WITH done AS (
+    UPDATE {table} SET status = 'Completed', end_date = %(today)s
+    WHERE {where} AND status <> 'Completed'
+    RETURNING id, order_id, stage_id, assigned_vendor_id, start_date, end_date
+),
+next AS (
+    SELECT DISTINCT ON (s.order_id) s.id
+    FROM {table} s
+    JOIN done d ON s.order_id = d.order_id AND s.stage_id > d.stage_id
+    WHERE s.status <> 'Completed' AND s.id NOT IN (SELECT id FROM done)
+    ORDER BY s.order_id, s.stage_id
+),
+started AS (
+    UPDATE {table} s SET status = 'In Progress'
+    FROM next WHERE s.id = next.id AND s.status <> 'In Progress'
+    RETURNING s.id, s.order_id, s.stage_id, s.assigned_vendor_id, s.start_date, s.end_date
+),
+events AS (
+    INSERT INTO {events} (kind, order_id, order_stage_id, status, previous_status)
+    SELECT 'stage_completed', d.order_id, d.id, 'Completed', old.status
+    FROM done d JOIN {table} old ON old.id = d.id
+    UNION ALL
+    SELECT 'stage_started', s.order_id, s.id, 'In Progress', old.status
+    FROM started s JOIN {table} old ON old.id = s.id
+)
+SELECT 'completed', * FROM done
+UNION ALL
+SELECT 'started', * FROM started
+"""
+
+
+def _advance(where, params):
+    qn = connection.ops.quote_name
+    sql = ADVANCE_SQL.format(
+        table=qn(OrderStage._meta.db_table), events=qn(TransitionEvent._meta.db_table), where=where,
+    )
+    completed, started = [], []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, {'today': date.today(), **params})
+        for kind, *row in cursor.fetchall():
+            (completed if kind == 'completed' else started).append(StageRow(*row))
+        transition = Transition(completed, started)
+        if completed:
+            # The UPDATEs and INSERT bypass model signals.
+            mark_changed(OrderStage, TransitionEvent)
+            durations.record_completions(completed)
+            progress.refresh({row.order_id for row in completed})
+            transaction.on_commit(lambda: workload.apply_transition(transition))
+    return transition
+
+
+def complete_stages(stage_ids):
+    """Complete the given OrderStage rows and start the stage that follows each one."""
+    if not stage_ids:
+        return Transition([], [])
+    return _advance('id = ANY(%(ids)s)', {'ids': list(stage_ids)})
+
+
+def advance_orders(order_ids, stage=None):
+    """
+    Complete the stage currently in progress on each order (only `stage`,
+    if given) and start the next one.
+    """
+    if not order_ids:
+        return Transition([], [])
+    where = "order_id = ANY(%(ids)s) AND status = 'In Progress'"
+    params = {'ids': list(order_ids)}
+    if stage is not None:
+        where += ' AND stage_id = %(stage)s'
+        params['stage'] = getattr(stage, 'pk', stage)
+    return _advance(where, params)
@@ -0,0 +1,70 @@
+from django.db import connection
+
+from .changes import mark_changed
+from .models import Order, OrderStage
+
+# Recomputes Order's pipeline projection (current stage and vendor, stages
+# completed out of total, and when the current stage began) from its stages.
+# The current stage is the first unfinished one in stage order, the same rule
+# pipeline.ADVANCE_SQL uses to pick the next stage. It began when the stage
+# before it ended, or on its own start date if that is later.
+REFRESH_SQL = """
+WITH stages AS (
+    SELECT o.id,
+           COUNT(s.id) AS total,
+           COUNT(s.id) FILTER (WHERE s.status = 'Completed') AS completed,
+           (array_agg(s.stage_id ORDER BY s.stage_id) FILTER (WHERE s.status <> 'Completed'))[1] AS stage_id,
+           (array_agg(s.assigned_vendor_id ORDER BY s.stage_id) FILTER (WHERE s.status <> 'Completed'))[1] AS vendor_id,
+           (array_agg(s.start_date ORDER BY s.stage_id) FILTER (WHERE s.status <> 'Completed'))[1] AS start_date,
+           MAX(s.end_date) FILTER (WHERE s.status = 'Completed') AS last_end
+    FROM {order} o
+    LEFT JOIN {stage} s ON s.order_id = o.id
+    {where}
+    GROUP BY o.id
+),
+progress AS (
+    SELECT id, total, completed, stage_id, vendor_id,
+           CASE WHEN stage_id IS NOT NULL THEN GREATEST(start_date, last_end) END AS since
+    FROM stages
+)
+UPDATE {order} o SET
+    current_stage_id = p.stage_id,
+    current_vendor_id = p.vendor_id,
+    stages_completed = p.completed,
+    stages_total = p.total,
+    current_stage_since = p.since
+FROM progress p
+WHERE o.id = p.id
+  AND (o.current_stage_id, o.current_vendor_id, o.stages_completed, o.stages_total, o.current_stage_since)
+      IS DISTINCT FROM (p.stage_id, p.vendor_id, p.completed, p.total, p.since)
+"""
+
+
+def refresh(order_ids=None):
+    """
+    Bring the projection of the given orders (all orders if None) up to date
+    with their OrderStage rows. Call it in the transaction that changed the
+    stages; returns the number of orders that changed.
+    """
+    if order_ids is not None and not order_ids:
+        return 0
+    qn = connection.ops.quote_name
+    tables = {'order': qn(Order._meta.db_table), 'stage': qn(OrderStage._meta.db_table)}
+    params = {}
+    where = ''
+    with connection.cursor() as cursor:
+        if order_ids is not None:
+            params['ids'] = sorted(set(order_ids))
+            where = 'WHERE o.id = ANY(%(ids)s)'
+            # Wait for concurrent refreshes of these orders first: the UPDATE
+            # below reads the stages as of when it starts, so it has to start
+            # after their transactions commit.
+            cursor.execute(
+                'SELECT id FROM {order} WHERE id = ANY(%(ids)s) ORDER BY id FOR UPDATE'.format(**tables), params,
+            )
+        cursor.execute(REFRESH_SQL.format(where=where, **tables), params)
+        updated = cursor.rowcount
+    if updated:
+        # The UPDATE bypasses model signals.
+        mark_changed(Order)
+    return updated
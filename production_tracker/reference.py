@@ -0,0 +1,47 @@
+from django.core.cache import cache
+
+from .models import PipelineStage, Vendor, VendorRole
+
+REFERENCE_KEY = 'reference-data:v1:{}'
+# Signals invalidate on every save and delete; the timeout only bounds
+# staleness after bulk writes, which bypass them.
+REFERENCE_TIMEOUT = 3600
+
+
+QUERIES = {
+    'stages': lambda: PipelineStage.objects.order_by('id'),
+    'roles': lambda: VendorRole.objects.order_by('name'),
+    'vendors': lambda: Vendor.objects.select_related('role').order_by('role__name', 'name'),
+}
+
+
+def _get(kind):
+    key = REFERENCE_KEY.format(kind)
+    objects = cache.get(key)
+    if objects is None:
+        objects = list(QUERIES[kind]())
+        cache.set(key, objects, REFERENCE_TIMEOUT)
+    return objects
+
+
+def invalidate():
+    # Vendors embed their role, so any change drops every list.
+    cache.delete_many([REFERENCE_KEY.format(kind) for kind in QUERIES])
+
+
+def stages():
+    """Every PipelineStage in pipeline order."""
+    return _get('stages')
+
+
+def roles():
+    return _get('roles')
+
+
+def vendors():
+    """Every Vendor, with its role, ordered by role and name."""
+    return _get('vendors')
+
+
+def vendors_by_id():
+    return {vendor.pk: vendor for vendor in vendors()}
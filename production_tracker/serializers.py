@@ -0,0 +1,76 @@
+from rest_framework import serializers
+
+from .models import Customer, Invoice, Measurement, Order, OrderStage, Particulars, Vendor
+
+
+class SparseFieldsMixin:
+    """
+    Drop fields not named in ``?fields=a,b,c``. Only the view's top-level
+    serializer is trimmed; nested serializers always render in full.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        view = self.context.get('view')
+        requested = view.requested_fields() if view is not None else None
+        if requested and type(self) is view.get_serializer_class():
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = ['id', 'name', 'email', 'phone', 'address']
+
+
+class MeasurementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Measurement
+        fields = ['id', 'customer', 'measurement_type', 'value']
+
+
+class VendorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    role_name = serializers.CharField(source='role.name', read_only=True)
+
+    class Meta:
+        model = Vendor
+        fields = ['id', 'name', 'role', 'role_name', 'phone_numbers', 'address', 'remark']
+
+
+class OrderStageSerializer(serializers.ModelSerializer):
+    stage_name = serializers.CharField(source='stage.name', read_only=True)
+    assigned_vendor_name = serializers.CharField(source='assigned_vendor.name', read_only=True, default=None)
+
+    class Meta:
+        model = OrderStage
+        fields = ['id', 'stage', 'stage_name', 'assigned_vendor', 'assigned_vendor_name', 'start_date', 'end_date', 'status']
+
+
+class ParticularsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Particulars
+        fields = ['id', 'name', 'details', 'amount']
+
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    customer_name = serializers.CharField(source='customer.name', read_only=True)
+    stages = OrderStageSerializer(source='orderstage_set', many=True, read_only=True)
+    particulars = ParticularsSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'customer', 'customer_name', 'order_placed_on', 'status', 'completion_date',
+            'amount', 'invoice', 'current_stage', 'current_vendor', 'stages_completed', 'stages_total',
+            'current_stage_since', 'stages', 'particulars',
+        ]
+
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    orders = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    archived_orders = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Invoice
+        fields = ['id', 'total_amount', 'paid_on_date', 'paid', 'orders', 'archived_orders']
@@ -0,0 +1,176 @@
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import authentication, durations, events, progress, reference, totals, workload
+from .changes import mark_changed
+from .models import Order, OrderStage, Particulars, PipelineStage, Vendor, VendorRole
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def record_change(sender, **kwargs):
+    if sender._meta.app_label == 'production_tracker':
+        mark_changed(sender)
+
+
+@receiver(post_save, sender=OrderStage)
+@receiver(post_delete, sender=OrderStage)
+def invalidate_vendor_workload(sender, **kwargs):
+    # Pipeline transitions update the snapshot incrementally; any other stage
+    # edit (reassignment, admin changes) forces a rebuild.
+    transaction.on_commit(workload.invalidate)
+
+
+@receiver(post_save, sender=Order)
+def log_order_created(sender, instance, created, **kwargs):
+    if created:
+        events.record_order_created(instance)
+
+
+# Ids of the orders each delete() (keyed by its origin) is removing, recorded
+# before any row goes, so receivers for their particulars and stages can skip
+# work the order's own deletion makes moot.
+_deleting_orders = WeakKeyDictionary()
+
+
+@receiver(pre_delete, sender=Order)
+def remember_deleting_order(sender, instance, origin=None, **kwargs):
+    if origin is not None:
+        _deleting_orders.setdefault(origin, set()).add(instance.pk)
+
+
+def _order_being_deleted(origin, order_id):
+    return origin is not None and order_id in _deleting_orders.get(origin, ())
+
+
+# Orders whose stages a cascading delete (e.g. of a PipelineStage) removed,
+# keyed by its origin, to be refreshed once the cascade is past OrderStage.
+_cascaded_progress = WeakKeyDictionary()
+
+
+def _deleting_stages_directly(origin):
+    return isinstance(origin, OrderStage) or (isinstance(origin, QuerySet) and origin.model is OrderStage)
+
+
+@receiver(post_save, sender=OrderStage)
+@receiver(post_delete, sender=OrderStage)
+def refresh_order_progress(sender, instance, origin=None, **kwargs):
+    # Nothing to refresh when the order itself is being deleted.
+    if _order_being_deleted(origin, instance.order_id):
+        return
+    if origin is not None and not _deleting_stages_directly(origin):
+        _cascaded_progress.setdefault(origin, set()).add(instance.order_id)
+        return
+    progress.refresh([instance.order_id])
+
+
+@receiver(post_delete)
+def refresh_cascaded_progress(sender, origin=None, **kwargs):
+    # The collector deletes one model at a time, children first: the first
+    # row of another model to go means every stage of the cascade is gone.
+    if sender is OrderStage or origin is None:
+        return
+    order_ids = _cascaded_progress.pop(origin, None)
+    if order_ids:
+        progress.refresh(order_ids)
+
+
+@receiver(post_save, sender=PipelineStage)
+@receiver(post_delete, sender=PipelineStage)
+@receiver(post_save, sender=VendorRole)
+@receiver(post_delete, sender=VendorRole)
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_reference_data(sender, **kwargs):
+    transaction.on_commit(reference.invalidate)
+
+
+@receiver(pre_delete, sender=Vendor)
+def unassign_vendor_durations(sender, instance, **kwargs):
+    # Before SET_NULL, which would collide with the rollup's unassigned rows.
+    durations.unassign_vendor(instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_token_user(sender, instance, **kwargs):
+    # Drop the API's cached copy (authentication.CachedJWTAuthentication), so
+    # deactivation and permission changes apply to tokens already issued.
+    transaction.on_commit(lambda: authentication.invalidate_user(instance.pk))
+
+
+# Order.amount is the sum of its particulars and Invoice.total_amount the sum
+# of its orders' amounts. Both are kept in sync by applying deltas; run
+# `manage.py recompute_totals` to repair them after bulk writes.
+
+@receiver(pre_save, sender=Particulars)
+def remember_particular_amount(sender, instance, **kwargs):
+    instance._previous_total = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_total = Particulars.objects.filter(pk=instance.pk).values_list('order_id', 'amount').first()
+
+
+@receiver(post_save, sender=Particulars)
+def apply_particular_amount(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_total', None)
+    if created or previous is None:
+        totals.apply_order_delta(instance.order_id, instance.amount)
+    elif previous[0] == instance.order_id:
+        totals.apply_order_delta(instance.order_id, instance.amount - previous[1])
+    else:
+        totals.apply_order_delta(previous[0], -previous[1])
+        totals.apply_order_delta(instance.order_id, instance.amount)
+
+
+@receiver(post_delete, sender=Particulars)
+def remove_particular_amount(sender, instance, origin=None, **kwargs):
+    # When the order itself is being deleted, whether directly or by a
+    # customer's cascade, its invoice is adjusted once by remove_order_amount
+    # instead of once per particular.
+    if _order_being_deleted(origin, instance.order_id):
+        return
+    totals.apply_order_delta(instance.order_id, -instance.amount)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_amount(sender, instance, **kwargs):
+    instance._previous_total = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_total = Order.objects.filter(pk=instance.pk).values_list('invoice_id', 'amount').first()
+
+
+@receiver(post_save, sender=Order)
+def apply_order_amount(sender, instance, created, update_fields=None, **kwargs):
+    previous = getattr(instance, '_previous_total', None)
+    if created or previous is None:
+        totals.apply_invoice_delta(instance.invoice_id, instance.amount)
+        return
+    invoice_id = instance.invoice_id if update_fields is None or 'invoice' in update_fields else previous[0]
+    if update_fields is None or 'amount' in update_fields:
+        amount = instance.amount
+    else:
+        # Left out of the save (Order.MAINTAINED_FIELDS): the stored amount
+        # stands, and the instance picks it up.
+        amount = instance.amount = previous[1]
+    if previous[0] == invoice_id:
+        totals.apply_invoice_delta(invoice_id, amount - previous[1])
+    else:
+        totals.apply_invoice_delta(previous[0], -previous[1])
+        totals.apply_invoice_delta(invoice_id, amount)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_deleted_order_amount(sender, instance, **kwargs):
+    instance._previous_total = Order.objects.filter(pk=instance.pk).values_list('invoice_id', 'amount').first()
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_amount(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_total', None)
+    if previous:
+        totals.apply_invoice_delta(previous[0], -previous[1])
@@ -0,0 +1,43 @@
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.customer-autocomplete').forEach(function (box) {
+        var hidden = box.querySelector('input[type=hidden]');
+        var input = box.querySelector('input[type=text]');
+        var options = box.querySelector('datalist');
+        var timer = null;
+        var pending = null;
+
+        function label(customer) {
+            return customer.name + ' <' + customer.email + '>';
+        }
+
+        input.addEventListener('input', function () {
+            // A picked suggestion fills the box with its label; map it back to the id.
+            var picked = Array.prototype.find.call(options.options, function (option) {
+                return option.value === input.value;
+            });
+            hidden.value = picked ? picked.dataset.id : '';
+            if (picked) {
+                return;
+            }
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                if (pending) {
+                    pending.abort();
+                }
+                pending = new AbortController();
+                var url = box.dataset.searchUrl + '?q=' + encodeURIComponent(input.value);
+                fetch(url, {signal: pending.signal, credentials: 'same-origin'})
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        options.replaceChildren.apply(options, data.results.map(function (customer) {
+                            var option = document.createElement('option');
+                            option.value = label(customer);
+                            option.dataset.id = customer.id;
+                            return option;
+                        }));
+                    })
+                    .catch(function () {});
+            }, 150);
+        });
+    });
+});
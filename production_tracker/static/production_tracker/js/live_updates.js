@@ -0,0 +1,87 @@
+// Applies the server-sent transition events (events.stream) to the page it was
+// loaded with: tile deltas to [data-tile] counters, order changes to rows marked
+// [data-order-id], and new orders to [data-live-orders] or [data-live-new-orders].
+document.addEventListener('DOMContentLoaded', function () {
+    var root = document.querySelector('[data-live-url]');
+    if (!root || !window.EventSource) {
+        return;
+    }
+    var recentLimit = 5;
+    var newOrders = 0;
+
+    function applyTiles(tiles) {
+        Object.keys(tiles).forEach(function (name) {
+            document.querySelectorAll('[data-tile="' + name + '"]').forEach(function (tile) {
+                tile.textContent = Number(tile.textContent) + tiles[name];
+            });
+        });
+    }
+
+    function orderFields(order) {
+        return {
+            status: order.status,
+            current_stage: order.current_stage || '—',
+            current_vendor: order.current_vendor || '—',
+            progress: order.stages_completed + '/' + order.stages_total,
+            days_in_stage: order.days_in_stage === null ? '—' : order.days_in_stage
+        };
+    }
+
+    function updateRows(order) {
+        var fields = orderFields(order);
+        document.querySelectorAll('[data-order-id="' + order.id + '"]').forEach(function (row) {
+            row.querySelectorAll('[data-field]').forEach(function (cell) {
+                if (cell.dataset.field in fields) {
+                    cell.textContent = fields[cell.dataset.field];
+                }
+            });
+        });
+    }
+
+    function addRecent(order) {
+        var body = document.querySelector('[data-live-orders]');
+        if (body) {
+            var row = document.createElement('tr');
+            row.dataset.orderId = order.id;
+            var link = document.createElement('a');
+            link.href = order.url;
+            link.textContent = order.id;
+            var cells = [link, order.customer, order.placed_on, order.status];
+            cells.forEach(function (content, index) {
+                var cell = document.createElement('td');
+                cell.append(content);
+                if (index === 3) {
+                    cell.dataset.field = 'status';
+                }
+                row.append(cell);
+            });
+            body.prepend(row);
+            while (body.rows.length > recentLimit) {
+                body.deleteRow(-1);
+            }
+        }
+        var notice = document.querySelector('[data-live-new-orders]');
+        if (notice) {
+            newOrders += 1;
+            notice.textContent = newOrders + ' new order' + (newOrders === 1 ? '' : 's') + ' — reload to see them.';
+            notice.hidden = false;
+        }
+    }
+
+    var source = new EventSource(root.dataset.liveUrl + '?after=' + encodeURIComponent(root.dataset.liveAfter));
+    source.addEventListener('transition', function (message) {
+        var event = JSON.parse(message.data);
+        applyTiles(event.tiles);
+        if (event.order) {
+            if (event.kind === 'order_created') {
+                addRecent(event.order);
+            }
+            updateRows(event.order);
+        }
+        document.dispatchEvent(new CustomEvent('live:transition', {detail: event}));
+    });
+    source.addEventListener('reload', function () {
+        source.close();
+        window.location.reload();
+    });
+});
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from . import counts, durations
+from .concurrency import run_in_thread
+from .models import ArchivedOrder, Customer, Invoice, Order, OrderStage, StageDurationRollup, Vendor
+
+# Bump when the shape of a snapshot changes so old entries are never read back.
+SNAPSHOT_VERSION = 1
+# Safety net for writes that bypass signals (queryset.update(), raw SQL).
+SNAPSHOT_TIMEOUT = 300
+
+
+def _count(queryset):
+    return counts.count(queryset, approximate=settings.DASHBOARD_COUNTS == 'approximate')
+
+
+def _order_tiles():
+    rows = None if settings.DASHBOARD_COUNTS == 'exact' else counts.estimate(Order.objects.all())
+    if rows is None or rows < counts.EXACT_COUNT_LIMIT:
+        tiles = Order.objects.aggregate(
+            total_orders=Count('id'),
+            pending_orders=Count('id', filter=Q(status='Pending')),
+            in_progress_orders=Count('id', filter=Q(status='In Progress')),
+            completed_orders=Count('id', filter=Q(status='Completed')),
+        )
+    else:
+        # Too many orders to scan: pending and in-progress orders come from
+        # order_unfinished_status_idx, the total from the table statistics,
+        # and everything else is counted as completed.
+        tiles = Order.objects.filter(status__in=['Pending', 'In Progress']).aggregate(
+            pending_orders=Count('id', filter=Q(status='Pending')),
+            in_progress_orders=Count('id', filter=Q(status='In Progress')),
+        )
+        tiles['total_orders'] = rows
+        tiles['completed_orders'] = max(rows - tiles['pending_orders'] - tiles['in_progress_orders'], 0)
+    # Archived orders are all completed.
+    archived = _count(ArchivedOrder.objects.all())
+    tiles['total_orders'] += archived
+    tiles['completed_orders'] += archived
+    return tiles
+
+
+def _invoice_tiles():
+    # The total has to read every invoice anyway, so the counts come with it.
+    tiles = Invoice.objects.aggregate(
+        total_invoice_amount=Sum('total_amount'),
+        paid_invoices=Count('id', filter=Q(paid=True)),
+        unpaid_invoices=Count('id', filter=Q(paid=False)),
+    )
+    tiles['total_invoice_amount'] = tiles['total_invoice_amount'] or 0
+    return tiles
+
+
+def _stage_tiles():
+    # orderstage_in_progress_idx
+    return {'stages_in_progress': OrderStage.objects.filter(status='In Progress').count()}
+
+
+def _vendor_tiles():
+    return {'total_vendors': _count(Vendor.objects.all())}
+
+
+def _customer_tiles():
+    return {'total_customers': _count(Customer.objects.all())}
+
+
+def _duration_tiles():
+    return {
+        'stage_durations': durations.by_stage(),
+        'vendor_durations': durations.by_vendor(),
+        'monthly_durations': durations.by_month(),
+    }
+
+
+SECTIONS = {
+    'orders': _order_tiles,
+    'invoices': _invoice_tiles,
+    'stages': _stage_tiles,
+    'vendors': _vendor_tiles,
+    'customers': _customer_tiles,
+    'durations': _duration_tiles,
+}
+
+SECTION_MODELS = {
+    Order: 'orders',
+    ArchivedOrder: 'orders',
+    Invoice: 'invoices',
+    OrderStage: 'stages',
+    Vendor: 'vendors',
+    Customer: 'customers',
+    StageDurationRollup: 'durations',
+}
+
+
+def _version_key(section):
+    return f'dashboard:{SNAPSHOT_VERSION}:{section}:version'
+
+
+def _snapshot_key(section, version):
+    return f'dashboard:{SNAPSHOT_VERSION}:{section}:{version}'
+
+
+def _versions(sections):
+    keys = {section: _version_key(section) for section in sections}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for section, key in keys.items():
+        if key not in found:
+            # A fresh, unique starting point so an evicted counter can never
+            # collide with a snapshot written under an earlier version.
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[section] = found[key]
+    return versions
+
+
+def _cached_snapshots():
+    versions = _versions(SECTIONS)
+    keys = {section: _snapshot_key(section, version) for section, version in versions.items()}
+    return keys, cache.get_many(keys.values())
+
+
+def _merge(keys, cached, computed):
+    stats = {}
+    fresh = {}
+    for section, key in keys.items():
+        if key in cached:
+            tiles = cached[key]
+        else:
+            tiles = computed[section]
+            fresh[key] = tiles
+        stats.update(tiles)
+
+    if fresh:
+        cache.set_many(fresh, SNAPSHOT_TIMEOUT)
+    return stats
+
+
+def get_dashboard_stats():
+    keys, cached = _cached_snapshots()
+    computed = {section: SECTIONS[section]() for section, key in keys.items() if key not in cached}
+    return _merge(keys, cached, computed)
+
+
+async def aget_dashboard_stats():
+    """get_dashboard_stats() for async views: stale sections are recomputed concurrently."""
+    keys, cached = await sync_to_async(_cached_snapshots)()
+    stale = [section for section, key in keys.items() if key not in cached]
+    results = await asyncio.gather(*(run_in_thread(SECTIONS[section]) for section in stale))
+    return await sync_to_async(_merge)(keys, cached, dict(zip(stale, results)))
+
+
+def invalidate(*sections):
+    """Move the given sections to a new version; old snapshots are never read again."""
+    for section in sections or SECTIONS:
+        key = _version_key(section)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
@@ -0,0 +1,157 @@
+import random
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from . import durations, progress, reference, workload
+from .changes import mark_changed
+from .models import Customer, Invoice, Measurement, Order, OrderStage, Particulars, PipelineStage, Vendor, VendorRole
+
+STAGE_NAMES = ['Cutting', 'Stitching', 'Embroidery', 'Finishing', 'Ironing', 'Packing']
+ROLE_NAMES = ['Cutter', 'Tailor', 'Embroider', 'Finisher', 'Presser', 'Packer']
+ITEM_NAMES = ['Shirt', 'Pant', 'Suite', 'Kurta', 'Sherwani', 'Waistcoat']
+FIRST_NAMES = ['Aarav', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Nikhil', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Sana', 'Vikram']
+LAST_NAMES = ['Shah', 'Patel', 'Iyer', 'Khan', 'Mehta', 'Joshi', 'Kulkarni', 'Reddy', 'Sharma', 'Singh', 'Verma', 'Desai']
+STREETS = ['Market Road', 'MG Road', 'Station Road', 'Temple Street', 'Lake View', 'Hill Road']
+# Keys recorded per measurement type, with a plausible (low, high) range in inches.
+MEASUREMENT_KEYS = {
+    'Shirt': {'chest': (34, 48), 'waist': (28, 44), 'length': (27, 33), 'sleeve': (22, 27), 'neck': (14, 18)},
+    'Pant': {'waist': (28, 44), 'hip': (34, 48), 'length': (38, 44), 'inseam': (28, 34)},
+    'Suite': {'chest': (34, 48), 'waist': (28, 44), 'hip': (34, 48), 'length': (28, 32), 'sleeve': (23, 27)},
+}
+
+
+def reference_data():
+    """Return (stages, vendors), creating the pipeline and a vendor pool if they are missing."""
+    stages = list(PipelineStage.objects.order_by('id'))
+    if not stages:
+        stages = PipelineStage.objects.bulk_create(PipelineStage(name=name) for name in STAGE_NAMES)
+    vendors = list(Vendor.objects.order_by('id'))
+    if not vendors:
+        roles = VendorRole.objects.bulk_create(VendorRole(name=name) for name in ROLE_NAMES)
+        vendors = Vendor.objects.bulk_create(
+            Vendor(name=f'{role.name} {n}', role=role) for role in roles for n in range(1, 6)
+        )
+    return stages, vendors
+
+
+def generate(orders, customers=None, measurements=2, days=5 * 365, batch_size=5000, seed=0, stdout=None):
+    """
+    Bulk-insert `orders` synthetic orders with their stages and particulars,
+    spread over the last `days` days, for `customers` customers with about
+    `measurements` measurements each. Older orders are completed and grouped
+    into invoices; recent ones are still moving through the pipeline.
+    """
+    rng = random.Random(seed)
+    stages, vendors = reference_data()
+    customers = customers or max(orders // 5, 1)
+    today = date.today()
+
+    customer_ids = []
+    for start in range(0, customers, batch_size):
+        with transaction.atomic():
+            rows = Customer.objects.bulk_create(
+                _customer(rng, n) for n in range(start, min(start + batch_size, customers))
+            )
+            Measurement.objects.bulk_create(
+                _measurement(rng, row.id)
+                for row in rows
+                for _ in range(rng.randint(0, 2 * measurements))
+            )
+        customer_ids.extend(row.id for row in rows)
+
+    for start in range(0, orders, batch_size):
+        count = min(batch_size, orders - start)
+        with transaction.atomic():
+            _generate_batch(rng, count, customer_ids, stages, vendors, today, days)
+        if stdout:
+            stdout.write(f'{start + count}/{orders} orders')
+
+    # bulk_create skips the signals that keep caches and rollups current.
+    mark_changed(Customer, Measurement, Order, OrderStage, Particulars, Invoice, PipelineStage, Vendor, VendorRole)
+    durations.rebuild()
+    transaction.on_commit(reference.invalidate)
+    transaction.on_commit(workload.invalidate)
+
+
+def _customer(rng, n):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return Customer(
+        name=f'{first} {last}',
+        email=f'{first}.{last}{n}@example.com'.lower(),
+        phone=9000000000 + n,
+        address=f'{rng.randint(1, 999)} {rng.choice(STREETS)}',
+    )
+
+
+def _measurement(rng, customer_id):
+    measurement_type = rng.choice(list(MEASUREMENT_KEYS))
+    keys = MEASUREMENT_KEYS[measurement_type]
+    value = {key: round(rng.uniform(low, high) * 2) / 2 for key, (low, high) in keys.items()}
+    if measurement_type != 'Pant':
+        value['fit'] = rng.choice(['slim', 'regular', 'relaxed'])
+    return Measurement(customer_id=customer_id, measurement_type=measurement_type, value=value)
+
+
+def _generate_batch(rng, count, customer_ids, stages, vendors, today, days):
+    specs = []
+    for _ in range(count):
+        placed = today - timedelta(days=rng.randrange(days))
+        age = (today - placed).days
+        # Orders move through roughly one stage every few days.
+        done = min(len(stages), age // rng.randint(2, 6))
+        items = [(rng.choice(ITEM_NAMES), rng.randrange(500, 5000) * 100) for _ in range(rng.randint(1, 4))]
+        specs.append((placed, done, items))
+
+    order_rows = Order.objects.bulk_create(
+        Order(
+            customer_id=rng.choice(customer_ids),
+            order_placed_on=placed,
+            status='Completed' if done == len(stages) else 'In Progress' if done else 'Pending',
+            completion_date=placed + timedelta(days=done * 3) if done == len(stages) else None,
+            amount=sum(amount for _, amount in items),
+        )
+        for placed, done, items in specs
+    )
+
+    invoices = {}
+    for order in order_rows:
+        if order.status == 'Completed' and (today - order.order_placed_on).days > 30:
+            invoices.setdefault(order.customer_id, []).append(order)
+    if invoices:
+        invoice_rows = Invoice.objects.bulk_create(
+            Invoice(
+                total_amount=sum(order.amount for order in grouped),
+                paid=rng.random() < 0.8,
+            )
+            for grouped in invoices.values()
+        )
+        for invoice, grouped in zip(invoice_rows, invoices.values()):
+            for order in grouped:
+                order.invoice = invoice
+        Order.objects.bulk_update([o for grouped in invoices.values() for o in grouped], ['invoice'])
+
+    order_stages = []
+    particulars = []
+    for order, (placed, done, items) in zip(order_rows, specs):
+        for n, stage in enumerate(stages):
+            start = placed + timedelta(days=n * 3)
+            if n < done:
+                status, end = 'Completed', start + timedelta(days=rng.randint(1, 5))
+            elif n == done and done:
+                status, end = 'In Progress', None
+            else:
+                status, end = 'Pending', None
+            order_stages.append(OrderStage(
+                order=order,
+                stage=stage,
+                assigned_vendor=rng.choice(vendors),
+                start_date=start,
+                end_date=end,
+                status=status,
+            ))
+        particulars.extend(Particulars(order=order, name=name, amount=amount) for name, amount in items)
+
+    OrderStage.objects.bulk_create(order_stages)
+    Particulars.objects.bulk_create(particulars)
+    progress.refresh([order.id for order in order_rows])
@@ -1,3 +1,1332 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import api, archive, authentication, benchmarking, changes, counts, durations, events, exports, instrumentation, invoicing, progress, reference, totals, urls
+from .models import (
+    DURATION_BUCKETS, ArchivedOrder, Customer, Invoice, Measurement, Order, OrderStage, Particulars, PipelineStage,
+    StageDurationRollup, TransitionEvent, Vendor, VendorRole,
+)
+from . import workload
+from .customers import search_customers
+from .forms import MeasurementSearchForm, OrderStageCreateForm, OrderStageUpdateForm
+from .pagination import EstimatedCountPaginator, _seek
+from .management.commands import bench
+from .measurements import search_measurements
+from .pipeline import advance_orders, complete_stages
+from .stats import get_dashboard_stats
+
+# Maximum queries per GET, including the session and user lookups done by
+# LoginRequiredMixin. Every named route in production_tracker/urls.py must
+# either have a budget here or be listed in UNBUDGETED_ROUTES.
+QUERY_BUDGETS = {
+    'dashboard': 14,
+    'order_list': 5,
+    'order_new': 3,
+    'order_detail': 7,
+    'customer_list': 3,
+    'customer_new': 2,
+    'customer_search': 3,
+    'measurement_list': 3,
+    'measurement_new': 3,
+    'vendorrole_list': 3,
+    'vendor_list': 3,
+    'vendor_workload': 5,
+    'pipelinestage_list': 3,
+    'invoice_list': 3,
+    'bulk_stage_transition': 3,
+    'order_export': 4,
+    'invoice_export': 3,
+    'invoice_batch': 3,
+    'order_stage_export': 3,
+}
+
+# Routes that are not rendered by an authenticated GET.
+UNBUDGETED_ROUTES = {'login', 'logout', 'update_order_stage'}
+
+# Routes whose query count still depends on the number of rows shown.
+UNBOUNDED_ROUTES = set()
+
+STAGE_NAMES = ['Cutting', 'Stitching', 'Embroidery', 'Finishing', 'Ironing', 'Packing', 'QC', 'Dispatch']
+
+
+def seed(customers=20, orders_per_customer=3):
+    role = VendorRole.objects.create(name='Tailor')
+    vendors = Vendor.objects.bulk_create(
+        Vendor(name=f'Vendor {i}', role=role) for i in range(10)
+    )
+    stages = PipelineStage.objects.bulk_create(PipelineStage(name=name) for name in STAGE_NAMES)
+    customer_rows = Customer.objects.bulk_create(
+        Customer(name=f'Customer {i}', email=f'customer{i}@example.com', phone=9000000000 + i)
+        for i in range(customers)
+    )
+    Measurement.objects.bulk_create(
+        Measurement(customer=customer, measurement_type='Shirt', value={'chest': 40, 'waist': 34})
+        for customer in customer_rows
+    )
+    invoices = Invoice.objects.bulk_create(Invoice(total_amount=1000) for _ in customer_rows)
+
+    today = date.today()
+    order_rows = Order.objects.bulk_create(
+        Order(
+            customer=customer,
+            order_placed_on=today - timedelta(days=n),
+            status='In Progress',
+            amount=1000,
+            invoice=invoices[i],
+        )
+        for i, customer in enumerate(customer_rows)
+        for n in range(orders_per_customer)
+    )
+    OrderStage.objects.bulk_create(
+        OrderStage(
+            order=order,
+            stage=stage,
+            assigned_vendor=vendors[n % len(vendors)],
+            start_date=order.order_placed_on,
+            status='Completed' if n == 0 else 'In Progress' if n == 1 else 'Pending',
+        )
+        for order in order_rows
+        for n, stage in enumerate(stages)
+    )
+    Particulars.objects.bulk_create(
+        Particulars(order=order, name='Shirt', amount=1000) for order in order_rows
+    )
+    return order_rows
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        orders = seed()
+        # order_detail links to the invoice, so budget it against an uninvoiced order.
+        cls.detail_order = orders[0]
+        Order.objects.filter(pk=cls.detail_order.pk).update(invoice=None)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def url_for(self, name):
+        if name == 'order_detail':
+            return reverse(name, args=[self.detail_order.pk])
+        return reverse(name)
+
+    def count_queries(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url_for(name))
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, name)
+        return len(queries)
+
+    def test_every_route_has_a_budget(self):
+        names = {p.name for p in urls.urlpatterns if isinstance(p, URLPattern) and p.name}
+        self.assertEqual(names - UNBUDGETED_ROUTES, set(QUERY_BUDGETS))
+
+    def test_routes_stay_within_budget(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(route=name):
+                cache.clear()
+                self.assertLessEqual(self.count_queries(name), budget)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        before = {}
+        for name in QUERY_BUDGETS.keys() - UNBOUNDED_ROUTES:
+            cache.clear()
+            before[name] = self.count_queries(name)
+
+        seed(customers=40, orders_per_customer=5)
+
+        for name, count in before.items():
+            with self.subTest(route=name):
+                cache.clear()
+                self.assertEqual(self.count_queries(name), count)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        seed(customers=60, orders_per_customer=2)
+        pending = Order.objects.order_by('id').values_list('id', flat=True)[::3]
+        Order.objects.filter(id__in=pending).update(status='Pending')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, url, params):
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            page = response.context['page']
+            pages.append([obj.pk for obj in page.object_list])
+            if not page.has_next:
+                return pages, response
+            response = self.client.get(url, {**params, 'after': page.next_cursor})
+
+    def test_order_pages_cover_filtered_rows_in_order(self):
+        expected = list(
+            Order.objects.filter(status='In Progress').order_by('-order_placed_on', '-id').values_list('id', flat=True)
+        )
+        pages, _ = self.walk(reverse('order_list'), {'status': 'In Progress'})
+        self.assertGreater(len(pages), 1)
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_previous_cursor_returns_the_prior_page(self):
+        pages, response = self.walk(reverse('customer_list'), {})
+        for expected in reversed(pages[:-1]):
+            page = response.context['page']
+            response = self.client.get(reverse('customer_list'), {'before': page.previous_cursor})
+            self.assertEqual([obj.pk for obj in response.context['page'].object_list], expected)
+        self.assertFalse(response.context['page'].has_previous)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('invoice_list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_later_pages_start_the_index_scan_at_the_cursor(self):
+        ordering = ('-order_placed_on', '-id')
+        last = Order.objects.order_by(*ordering)[10]
+        seek = _seek(ordering, [('order_placed_on', last.order_placed_on), ('id', last.id)])
+        with connection.cursor() as cursor:
+            # The table is small enough for a sequential scan to win otherwise.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Order.objects.filter(seek).order_by(*ordering)[:51].explain()
+        self.assertRegex(plan, r'Index Cond: \(order_placed_on <= ')
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        cls.orders = seed(customers=3, orders_per_customer=2)
+        cls.pending = cls.orders[1]
+        Order.objects.filter(pk=cls.pending.pk).update(status='Pending')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, name, params=None):
+        response = self.client.get(reverse(name), params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_order_export(self):
+        rows = self.export('order_export')
+        self.assertEqual(rows[0], exports.ORDER_HEADER)
+        self.assertEqual(len(rows), 1 + len(self.orders))
+        order = self.orders[0]
+        self.assertEqual(rows[1], [
+            str(order.id), order.customer.name, order.customer.email, str(order.order_placed_on), 'In Progress',
+            '', '1000', str(order.invoice_id), 'Shirt', '', '1000',
+        ])
+
+    def test_filters_are_applied(self):
+        rows = self.export('order_export', {'status': 'Pending'})
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.pending.id)])
+        rows = self.export('order_export', {'date_from': date.today()})
+        self.assertEqual(len(rows), 1 + 3)
+
+        rows = self.export('invoice_export', {'status': 'Pending'})
+        self.assertEqual(rows[0], exports.INVOICE_HEADER)
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.pending.invoice_id)])
+
+        rows = self.export('order_stage_export', {'status': 'Pending'})
+        self.assertEqual(rows[0], exports.STAGE_HEADER)
+        self.assertEqual({row[0] for row in rows[1:]}, {str(self.pending.id)})
+        self.assertEqual(len(rows), 1 + len(STAGE_NAMES))
+
+    def test_invoices_of_archived_orders(self):
+        moved = self.orders[2:4]
+        Order.objects.filter(pk__in=[o.pk for o in moved]).update(
+            status='Completed', order_placed_on=date(date.today().year - 3, 6, 1),
+        )
+        archive.archive_orders(date(date.today().year - 1, 1, 1))
+        invoice = str(moved[0].invoice_id)
+
+        rows = {row[0]: row for row in self.export('invoice_export')[1:]}
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[invoice][4], '2')
+        rows = self.export('invoice_export', {'status': 'Completed'})
+        self.assertEqual([row[0] for row in rows[1:]], [invoice])
+        # Archived orders have no current stage.
+        rows = self.export('invoice_export', {'status': 'Completed', 'stage': PipelineStage.objects.first().pk})
+        self.assertEqual(rows[1:], [])
+
+    def test_invalid_filters_are_rejected(self):
+        for name in ('order_export', 'invoice_export', 'order_stage_export'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name), {'date_from': 'garbage'})
+                self.assertEqual(response.status_code, 400)
+
+
+class AdminTests(TestCase):
+    # Queries per admin page, whatever the number of rows.
+    BUDGETS = {
+        'order_changelist': 7,
+        'orderstage_changelist': 7,
+        'particulars_changelist': 5,
+        'customer_changelist': 5,
+        'measurement_changelist': 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', password='secret')
+        cls.orders = seed(customers=20, orders_per_customer=3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_changelists_stay_within_budget(self):
+        for name, budget in self.BUDGETS.items():
+            with self.subTest(page=name), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(f'admin:production_tracker_{name}'))
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(queries), budget)
+
+    def test_order_change_form_reads_choices_from_cache(self):
+        url = reverse('admin:production_tracker_order_change', args=[self.orders[0].pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # Session, user, order, stages, particulars, and the autocomplete's
+        # selected customer; no query per inline row.
+        self.assertLessEqual(len(queries), 7)
+        self.assertContains(response, STAGE_NAMES[0])
+
+    def test_customer_search_uses_the_full_text_index(self):
+        response = self.client.get(reverse('admin:production_tracker_customer_changelist'), {'q': 'customer1'})
+        self.assertEqual(response.context['cl'].result_count, 11)
+
+    def test_large_counts_are_estimated(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(connection.ops.quote_name(Order._meta.db_table)))
+        paginator = EstimatedCountPaginator(Order.objects.order_by('id'), 10)
+        paginator.exact_count_limit = 1
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 60)
+        self.assertEqual(len(queries), 1)
+
+        # Filtered and searched lists are counted exactly, whatever their size.
+        few = [order.pk for order in self.orders[:3]]
+        filtered = EstimatedCountPaginator(Order.objects.filter(pk__in=few).order_by('id'), 10)
+        filtered.exact_count_limit = 1
+        self.assertEqual(filtered.count, 3)
+
+
+class CountsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+
+    def test_approximate_counts_use_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(connection.ops.quote_name(Particulars._meta.db_table)))
+        # Deleting rows leaves the table's size, and so the estimate, as it was.
+        Particulars.objects.filter(pk__in=Particulars.objects.order_by('id').values('pk')[:10]).delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counts.count(Particulars.objects.all(), approximate=True, exact_limit=1), 60)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(counts.count(Particulars.objects.all()), 50)
+        # Below the limit the count is exact.
+        self.assertEqual(counts.count(Particulars.objects.all(), approximate=True), 50)
+
+    def test_unanalyzed_tables_are_counted(self):
+        self.assertIsNone(counts.estimate(Vendor.objects.all()))
+        self.assertEqual(counts.count(Vendor.objects.all(), approximate=True, exact_limit=1), 10)
+
+    def test_filtered_counts_are_exact(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(connection.ops.quote_name(Order._meta.db_table)))
+        in_progress = Order.objects.filter(status='In Progress')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counts.count(in_progress, approximate=True, exact_limit=1), 60)
+        self.assertIn('COUNT(*)', queries[0]['sql'])
+
+    @override_settings(DASHBOARD_COUNTS='exact')
+    def test_dashboard_counts_can_be_exact(self):
+        stats = get_dashboard_stats()
+        self.assertEqual((stats['total_orders'], stats['total_customers'], stats['total_vendors']), (60, 20, 10))
+        self.assertEqual(stats['stages_in_progress'], 60)
+
+    def test_dashboard_estimates_only_large_order_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(connection.ops.quote_name(Order._meta.db_table)))
+        first, second = Order.objects.order_by('id').values_list('pk', flat=True)[:2]
+        Order.objects.filter(pk=first).update(status='Pending')
+        cache.clear()
+        stats = get_dashboard_stats()
+        self.assertEqual((stats['total_orders'], stats['pending_orders'], stats['completed_orders']), (60, 1, 0))
+
+        # Past the limit the total is the estimate and completed orders the rest.
+        Order.objects.filter(pk=second).delete()
+        cache.clear()
+        with mock.patch.object(counts, 'EXACT_COUNT_LIMIT', 10):
+            stats = get_dashboard_stats()
+        self.assertEqual((stats['total_orders'], stats['pending_orders'], stats['in_progress_orders']), (60, 1, 58))
+        self.assertEqual(stats['completed_orders'], 1)
+
+
+class ImportOrdersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role = VendorRole.objects.create(name='Tailor')
+        Vendor.objects.create(name='Vendor 0', role=role)
+        PipelineStage.objects.bulk_create(PipelineStage(name=name) for name in STAGE_NAMES[:2])
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def record(self, n, **customer):
+        return {
+            'customer': customer or {'name': f'Customer {n}', 'email': f'c{n}@example.com', 'phone': 9000000000 + n},
+            'order_placed_on': '2025-01-0{}'.format(n % 9 + 1),
+            'status': 'In Progress',
+            'particulars': [{'name': 'Shirt', 'amount': 500}, {'name': 'Trousers', 'details': 'Wool', 'amount': 700}],
+            'stages': [
+                {'stage': 'Cutting', 'vendor': 'Vendor 0', 'start_date': '2025-01-01', 'end_date': '2025-01-02', 'status': 'Completed'},
+                {'stage': 'Stitching', 'start_date': '2025-01-02', 'status': 'In Progress'},
+            ],
+        }
+
+    def write(self, name, records):
+        path = Path(self.dir.name) / name
+        path.write_text(''.join((line if isinstance(line, str) else json.dumps(line)) + '\n' for line in records))
+        return str(path)
+
+    def run_import(self, path, **options):
+        out = io.StringIO()
+        call_command('import_orders', path, stdout=out, **options)
+        return out.getvalue()
+
+    def assert_imported(self, orders):
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertEqual(set(Order.objects.values_list('amount', flat=True)), {1200})
+        self.assertEqual(Particulars.objects.count(), 2 * orders)
+        self.assertEqual(OrderStage.objects.filter(assigned_vendor__name='Vendor 0').count(), orders)
+        # The current-stage projection is refreshed for imported orders.
+        self.assertEqual(set(Order.objects.values_list('current_stage__name', flat=True)), {'Stitching'})
+        # Imported completions are in the duration rollup.
+        rollup = StageDurationRollup.objects.values_list('stage__name', 'count', 'total_days')
+        self.assertEqual(list(rollup), [('Cutting', orders, orders)])
+
+    def test_orm_import(self):
+        path = self.write('orders.jsonl', [self.record(n) for n in range(5)] + [self.record(0)])
+        workload.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(path, batch_size=2)
+        self.assert_imported(6)
+        self.assertIsNone(cache.get(workload.WORKLOAD_KEY))
+        # The repeated customer is matched, across batches, by email.
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_copy_import(self):
+        path = self.write('orders.jsonl', [self.record(n) for n in range(5)])
+        self.run_import(path, batch_size=2, copy=True)
+        self.assert_imported(5)
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_csv_import(self):
+        path = Path(self.dir.name) / 'orders.csv'
+        record = self.record(1)
+        with path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'customer_name', 'customer_email', 'customer_phone', 'customer_address',
+                'order_placed_on', 'status', 'completion_date', 'particulars', 'stages',
+            ])
+            writer.writerow([
+                'Customer 1', 'c1@example.com', '9000000001', '', record['order_placed_on'], record['status'], '',
+                json.dumps(record['particulars']), json.dumps(record['stages']),
+            ])
+        self.run_import(str(path))
+        self.assert_imported(1)
+
+    def test_customers_without_contact_details_are_matched_by_name(self):
+        records = [self.record(n, name='Walk-in') for n in range(3)]
+        self.run_import(self.write('orders.jsonl', records), batch_size=1)
+        self.run_import(self.write('again.jsonl', records[:1]))
+        self.assertEqual(Customer.objects.count(), 1)
+        self.assertEqual(Order.objects.count(), 4)
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = str(Path(self.dir.name) / 'import.checkpoint')
+        records = [self.record(n) for n in range(5)]
+        broken = records[:3] + [{**records[3], 'stages': [{'stage': 'Unknown'}]}] + records[4:]
+        path = self.write('orders.jsonl', broken)
+        with self.assertRaisesMessage(CommandError, 'Record 4'):
+            self.run_import(path, batch_size=2, checkpoint=checkpoint)
+        # The first two batches committed; the third did not.
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(json.loads(Path(checkpoint).read_text())['records'], 2)
+
+        self.write('orders.jsonl', records)
+        output = self.run_import(path, batch_size=2, checkpoint=checkpoint)
+        self.assertIn('Resuming after record 2', output)
+        self.assert_imported(5)
+
+    def test_errors_name_the_record(self):
+        path = self.write('orders.jsonl', [self.record(1), '{not json'])
+        with self.assertRaisesMessage(CommandError, 'Record 2: invalid JSON'):
+            self.run_import(path)
+
+        for copy in (False, True):
+            with self.subTest(copy=copy):
+                path = self.write('orders.jsonl', [self.record(1), {**self.record(2), 'status': 'x' * 21}])
+                with self.assertRaisesMessage(CommandError, 'Records 1-2 were not imported'):
+                    self.run_import(path, copy=copy)
+        self.assertFalse(Order.objects.exists())
+
+
+class TotalsTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Asha', email='asha@example.com')
+        self.invoice = Invoice.objects.create()
+        self.order = Order.objects.create(customer=self.customer, order_placed_on=date.today(), status='Pending', invoice=self.invoice)
+
+    def assertTotals(self, order_amount, invoice_amount):
+        self.order.refresh_from_db()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.order.amount, self.invoice.total_amount), (order_amount, invoice_amount))
+
+    def test_particular_changes_apply_deltas(self):
+        shirt = Particulars.objects.create(order=self.order, name='Shirt', amount=1500)
+        Particulars.objects.create(order=self.order, name='Pant', amount=1000)
+        self.assertTotals(2500, 2500)
+
+        shirt.amount = 1800
+        shirt.save()
+        self.assertTotals(2800, 2800)
+
+        shirt.delete()
+        self.assertTotals(1000, 1000)
+
+    def test_moving_an_order_between_invoices(self):
+        Particulars.objects.create(order=self.order, name='Shirt', amount=1500)
+        other = Invoice.objects.create()
+        # self.order still holds the amount it was created with.
+        self.order.invoice = other
+        self.order.save()
+        self.assertEqual(self.order.amount, 1500)
+        other.refresh_from_db()
+        self.assertTotals(1500, 0)
+        self.assertEqual(other.total_amount, 1500)
+
+    def test_deleting_an_order_subtracts_it_once(self):
+        Particulars.objects.create(order=self.order, name='Shirt', amount=1500)
+        keep = Order.objects.create(customer=self.customer, order_placed_on=date.today(), status='Pending', invoice=self.invoice)
+        Particulars.objects.create(order=keep, name='Pant', amount=700)
+        self.order.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total_amount, 700)
+
+    def test_deleting_a_customer_subtracts_their_orders_once(self):
+        Particulars.objects.create(order=self.order, name='Shirt', amount=1500)
+        other = Customer.objects.create(name='Other', email='other@example.com')
+        keep = Order.objects.create(customer=other, order_placed_on=date.today(), status='Pending', invoice=self.invoice)
+        Particulars.objects.create(order=keep, name='Pant', amount=700)
+        self.customer.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total_amount, 700)
+
+    def test_recompute_repairs_drift(self):
+        Particulars.objects.create(order=self.order, name='Shirt', amount=1500)
+        Order.objects.filter(pk=self.order.pk).update(amount=1)
+        Invoice.objects.filter(pk=self.invoice.pk).update(total_amount=2)
+        self.assertEqual(totals.recompute(), (1, 1))
+        self.assertTotals(1500, 1500)
+
+
+class StageAdvanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        cls.orders = seed(customers=10, orders_per_customer=1)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def statuses(self, order):
+        return list(order.orderstage_set.order_by('stage_id').values_list('status', flat=True))
+
+    def test_completing_a_stage_starts_the_next_one(self):
+        order = self.orders[0]
+        current = order.orderstage_set.get(status='In Progress')
+        self.client.post(reverse('update_order_stage', args=[current.pk]), {'status': 'Completed'})
+        current.refresh_from_db()
+        self.assertEqual(current.end_date, date.today())
+        self.assertEqual(self.statuses(order)[:4], ['Completed', 'Completed', 'In Progress', 'Pending'])
+
+    def test_double_submit_does_not_advance_twice(self):
+        order = self.orders[0]
+        current = order.orderstage_set.get(status='In Progress')
+        for _ in range(2):
+            self.client.post(reverse('update_order_stage', args=[current.pk]), {'status': 'Completed'})
+        self.assertEqual(self.statuses(order)[:4], ['Completed', 'Completed', 'In Progress', 'Pending'])
+
+    def test_bulk_advance_runs_in_constant_queries(self):
+        stitching = PipelineStage.objects.get(name='Stitching')
+        ids = ' '.join(str(order.pk) for order in self.orders)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('bulk_stage_transition'), {'stage': stitching.pk, 'orders': ids})
+        self.assertEqual(len(response.context['transition'].completed), len(self.orders))
+        # Session, user, stage choice, the advance statement and its savepoint,
+        # the duration rollup upsert, the order progress lock and refresh and
+        # the stage choices of the re-rendered form.
+        self.assertLessEqual(len(queries), 10)
+        for order in self.orders:
+            self.assertEqual(self.statuses(order)[:3], ['Completed', 'Completed', 'In Progress'])
+
+    def test_advance_only_matches_the_given_stage(self):
+        cutting = PipelineStage.objects.get(name='Cutting')
+        transition = advance_orders([order.pk for order in self.orders], stage=cutting)
+        self.assertEqual(transition, ([], []))
+
+
+class OrderProgressTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        cls.orders = seed(customers=4, orders_per_customer=1)
+        progress.refresh()
+        cls.stitching = PipelineStage.objects.get(name='Stitching')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_projection_follows_transitions(self):
+        order = Order.objects.get(pk=self.orders[0].pk)
+        current = order.orderstage_set.get(status='In Progress')
+        self.assertEqual((order.current_stage, order.current_vendor_id), (self.stitching, current.assigned_vendor_id))
+        self.assertEqual((order.stages_completed, order.stages_total), (1, len(STAGE_NAMES)))
+
+        advance_orders([order.pk])
+        embroidery = order.orderstage_set.get(stage__name='Embroidery')
+        self.client.post(reverse('update_order_stage', args=[embroidery.pk]), {'status': 'Completed'})
+        order.refresh_from_db()
+        self.assertEqual(order.current_stage.name, 'Finishing')
+        self.assertEqual(order.stages_completed, 3)
+        self.assertEqual(order.current_stage_since, date.today())
+        self.assertEqual(progress.refresh(), 0)
+
+    def test_saving_a_stale_order_keeps_the_projection(self):
+        stale = Order.objects.get(pk=self.orders[0].pk)
+        stitching = stale.orderstage_set.get(stage=self.stitching)
+        self.client.post(reverse('update_order_stage', args=[stitching.pk]), {'status': 'Completed'})
+        stale.save()
+        order = Order.objects.get(pk=stale.pk)
+        self.assertEqual((order.current_stage.name, order.stages_completed), ('Embroidery', 2))
+        self.assertEqual(progress.refresh(), 0)
+
+    def test_cascades_refresh_each_surviving_order_once(self):
+        customer = self.orders[0].customer
+        with CaptureQueriesContext(connection) as queries:
+            customer.delete()
+        # The order goes with its customer: no refresh, whatever its stage count.
+        self.assertFalse(any('FOR UPDATE' in query['sql'] for query in queries))
+
+        stitching = PipelineStage.objects.get(name='Stitching')
+        with CaptureQueriesContext(connection) as queries:
+            stitching.delete()
+        self.assertEqual(sum('FOR UPDATE' in query['sql'] for query in queries), 1)
+        order = Order.objects.get(pk=self.orders[1].pk)
+        self.assertEqual((order.current_stage.name, order.stages_total), ('Embroidery', len(STAGE_NAMES) - 1))
+        self.assertEqual(progress.refresh(), 0)
+
+    def test_order_list_filters_and_sorts_on_the_projection(self):
+        OrderStage.objects.filter(order__in=self.orders[1:]).update(start_date=date.today() - timedelta(days=10))
+        progress.refresh()
+        advance_orders([self.orders[0].pk])
+        response = self.client.get(reverse('order_list'), {'stage': self.stitching.pk})
+        self.assertEqual({o.pk for o in response.context['orders']}, {o.pk for o in self.orders[1:]})
+
+        response = self.client.get(reverse('order_list'), {'sort': 'waiting'})
+        since = [o.current_stage_since for o in response.context['orders']]
+        self.assertEqual(since, sorted(since))
+        self.assertEqual(response.context['orders'][-1].pk, self.orders[0].pk)
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        seed(customers=10, orders_per_customer=3)
+
+    def setUp(self):
+        cache.clear()
+        token = AccessToken.for_user(self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_requires_authentication(self):
+        del self.client.defaults['HTTP_AUTHORIZATION']
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_order_list_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/', {'page_size': 20})
+        self.assertEqual(len(response.json()['results']), 20)
+        self.assertEqual(len(response.json()['results'][0]['stages']), len(STAGE_NAMES))
+        # User lookup, orders, stages, particulars.
+        self.assertEqual(len(queries), 4)
+
+    def test_sparse_fields_skip_nested_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/', {'fields': 'id,status'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'status'})
+        self.assertEqual(len(queries), 2)
+
+    def test_order_pages_seek_past_orders_placed_the_same_day(self):
+        Order.objects.update(order_placed_on=date.today())
+        expected = list(Order.objects.order_by('-id').values_list('id', flat=True))
+        seen, url, params = [], '/api/orders/', {'page_size': 7, 'fields': 'id'}
+        # Past offset_cutoff, DRF's cursor repeats rows sharing a date.
+        with mock.patch.object(api.OrderCursorPagination, 'offset_cutoff', 5):
+            while url:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params).json()
+                self.assertNotIn('OFFSET', queries[-1]['sql'])
+                seen += [order['id'] for order in response['results']]
+                url, params = response['next'], None
+        self.assertEqual(seen, expected)
+        previous = self.client.get(response['previous']).json()
+        self.assertEqual([order['id'] for order in previous['results']], expected[-9:-2])
+
+    def test_invoices_list_archived_orders(self):
+        order = Order.objects.order_by('id').first()
+        Order.objects.filter(pk=order.pk).update(status='Completed', order_placed_on=date(date.today().year - 3, 6, 1))
+        archive.archive_orders(date(date.today().year - 1, 1, 1))
+        response = self.client.get(f'/api/invoices/{order.invoice_id}/')
+        self.assertEqual(response.json()['archived_orders'], [order.pk])
+        self.assertEqual(len(response.json()['orders']), 2)
+
+    def test_unchanged_data_is_not_modified(self):
+        first = self.client.get('/api/customers/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/customers/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        # The user was cached by the first request.
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='New', email='new@example.com')
+        third = self.client.get('/api/customers/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_last_modified_covers_the_whole_second(self):
+        cache.set(changes._key(Customer), 1000.8, None)
+        # A validator from earlier in that second predates the change.
+        response = self.client.get('/api/customers/', HTTP_IF_MODIFIED_SINCE=http_date(1000))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], http_date(1001))
+        response = self.client.get('/api/customers/', HTTP_IF_MODIFIED_SINCE=http_date(1001))
+        self.assertEqual(response.status_code, 304)
+
+        # Until the second of the latest change is over, only the ETag is sent.
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='New', email='new@example.com')
+        response = self.client.get('/api/customers/')
+        self.assertNotIn('Last-Modified', response)
+
+
+class AuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.header = f'Bearer {AccessToken.for_user(self.user)}'
+
+    def authenticate(self, authentication_class, method='get'):
+        request = getattr(self.factory, method)('/api/orders/', HTTP_AUTHORIZATION=self.header)
+        return authentication_class().authenticate(request)
+
+    def test_cached_user_is_reused_until_the_user_changes(self):
+        with self.assertNumQueries(1):
+            self.authenticate(authentication.CachedJWTAuthentication)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(authentication.CachedJWTAuthentication)
+        self.assertEqual(user, self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertNumQueries(1), self.assertRaises(AuthenticationFailed):
+            self.authenticate(authentication.CachedJWTAuthentication)
+
+    def test_stateless_reads_skip_the_user_lookup(self):
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(authentication.StatelessReadJWTAuthentication)
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual(user.id, str(self.user.id))
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(authentication.StatelessReadJWTAuthentication, method='post')
+        self.assertEqual(user, self.user)
+
+    def test_prune_tokens_deletes_expired_tokens(self):
+        tokens = [RefreshToken.for_user(self.user) for _ in range(3)]
+        for token in tokens[:2]:
+            token.blacklist()
+        expired = [token['jti'] for token in tokens[1:]]
+        OutstandingToken.objects.filter(jti__in=expired).update(expires_at=timezone.now() - timedelta(days=1))
+
+        out = io.StringIO()
+        call_command('prune_tokens', batch_size=1, stdout=out)
+        self.assertIn('Deleted 2 expired tokens and 1 blacklist entries', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [tokens[0]['jti']])
+        self.assertEqual(BlacklistedToken.objects.get().token.jti, tokens[0]['jti'])
+
+
+class VendorWorkloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.orders = seed(customers=5, orders_per_customer=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_transitions_match_a_rebuild(self):
+        workload.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            advance_orders([order.pk for order in self.orders[:4]])
+        incremental = workload.get_snapshot()['entries']
+        workload.invalidate()
+        self.assertEqual(incremental, workload.get_snapshot()['entries'])
+
+    def test_next_stage_already_in_progress_is_not_opened_again(self):
+        first, second = OrderStage.objects.filter(order=self.orders[0]).order_by('stage_id')[:2]
+        OrderStage.objects.filter(pk=first.pk).update(status='In Progress')
+        workload.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            transition = complete_stages([first.pk])
+        self.assertEqual(transition.started, [])
+        incremental = workload.get_snapshot()['entries']
+        workload.invalidate()
+        self.assertEqual(incremental, workload.get_snapshot()['entries'])
+
+    def test_completing_a_stage_updates_the_snapshot_in_place(self):
+        user = get_user_model().objects.create_user('staff', password='secret')
+        self.client.force_login(user)
+        current = OrderStage.objects.filter(order=self.orders[0], status='In Progress').get()
+        workload.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('update_order_stage', args=[current.pk]),
+                {'status': 'Completed', 'assigned_vendor': current.assigned_vendor_id},
+            )
+        # Folded in by apply_transition rather than dropped for a rebuild.
+        incremental = cache.get(workload.WORKLOAD_KEY)
+        self.assertIsNotNone(incremental)
+        workload.invalidate()
+        self.assertEqual(incremental['entries'], workload.get_snapshot()['entries'])
+
+    def test_suggests_least_loaded_vendor_for_stage(self):
+        stitching = PipelineStage.objects.get(name='Stitching')
+        busy = OrderStage.objects.filter(stage=stitching, status='In Progress').values_list('assigned_vendor', flat=True)[0]
+        idle = Vendor.objects.exclude(pk=busy).first()
+        OrderStage.objects.create(
+            order=self.orders[0], stage=stitching, assigned_vendor=idle, start_date=date.today(),
+            end_date=date.today(), status='Completed',
+        )
+        workload.invalidate()
+        self.assertEqual(workload.suggest_vendor(stitching.pk), idle.pk)
+        self.assertEqual(workload.suggest_vendors([stitching.pk])[stitching.pk], workload.qualified_vendors(stitching.pk)[0])
+
+
+class MeasurementSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name='Fit', email='fit@example.com')
+        values = [
+            {'chest': 38, 'waist': 32, 'fit': 'slim'},
+            {'chest': 41, 'waist': 34, 'fit': 'regular'},
+            {'chest': 44, 'sleeve': 25},
+            {'chest': 'n/a'},
+        ]
+        cls.measurements = Measurement.objects.bulk_create(
+            Measurement(customer=customer, measurement_type='Shirt', value=value) for value in values
+        )
+
+    def search(self, **kwargs):
+        return set(search_measurements(**kwargs).values_list('pk', flat=True))
+
+    def ids(self, *indexes):
+        return {self.measurements[i].pk for i in indexes}
+
+    def test_key_existence_and_containment(self):
+        self.assertEqual(self.search(has_keys=['waist']), self.ids(0, 1))
+        self.assertEqual(self.search(missing_keys=['waist']), self.ids(2, 3))
+        self.assertEqual(self.search(contains={'fit': 'slim'}), self.ids(0))
+
+    def test_ranges_skip_non_numeric_values(self):
+        self.assertEqual(self.search(ranges=[('chest', 40, 44)]), self.ids(1, 2))
+        self.assertEqual(self.search(ranges=[('chest', None, 42)]), self.ids(0, 1))
+        self.assertEqual(self.search(ranges=[('chest', 40, None)]), self.ids(1, 2))
+
+    def test_form_ignores_invalid_fields(self):
+        form = MeasurementSearchForm({'has': 'waist', 'missing': 'bad key', 'chest_min': '40'})
+        found = set(form.filter(Measurement.objects.all()).values_list('pk', flat=True))
+        self.assertEqual(found, self.ids(1))
+
+
+class CustomerSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        cls.ada = Customer.objects.create(
+            name='Ada Lovelace', email='ada.king@example.com', phone=9876543210, address='12 St. James Square',
+        )
+        cls.alan = Customer.objects.create(name='Alan Turing', email='alan@example.org', address='Bletchley Park')
+
+    def search(self, query):
+        return list(search_customers(query))
+
+    def test_matches_prefixes_of_every_field(self):
+        self.assertEqual(self.search('lov'), [self.ada])
+        self.assertEqual(self.search('ada.ki'), [self.ada])
+        self.assertEqual(self.search('98765'), [self.ada])
+        self.assertEqual(self.search('bletch'), [self.alan])
+        self.assertEqual(self.search('a'), [self.ada, self.alan])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('ad squ'), [self.ada])
+        self.assertEqual(self.search('alan square'), [])
+        self.assertEqual(self.search(" ' & "), [])
+
+    def test_endpoint_returns_json(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('customer_search'), {'q': 'turing'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.alan.pk])
+
+
+class StageDurationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.orders = seed(customers=5, orders_per_customer=2)
+
+    def rollup(self):
+        return sorted(
+            StageDurationRollup.objects.values_list('stage', 'vendor', 'month', 'count', 'total_days', 'histogram')
+        )
+
+    def test_completions_match_a_rebuild(self):
+        durations.rebuild()
+        advance_orders([order.pk for order in self.orders])
+        advance_orders([order.pk for order in self.orders[:3]])
+        incremental = self.rollup()
+        durations.rebuild()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_reopened_stages_are_counted_once(self):
+        self.client.force_login(get_user_model().objects.create_user('staff', password='secret'))
+        stage = OrderStage.objects.get(order=self.orders[0], status='In Progress')
+        advance_orders([self.orders[0].pk])
+        url = reverse('update_order_stage', args=[stage.pk])
+        self.client.post(url, {'status': 'In Progress', 'assigned_vendor': stage.assigned_vendor_id})
+        stage.refresh_from_db()
+        self.assertIsNone(stage.end_date)
+        self.client.post(url, {'status': 'Completed', 'assigned_vendor': stage.assigned_vendor_id})
+        # A completed stage moved to another vendor goes with it.
+        other = Vendor.objects.exclude(pk=stage.assigned_vendor_id).first()
+        self.client.post(url, {'status': 'Completed', 'assigned_vendor': other.pk})
+        incremental = [row for row in self.rollup() if row[3]]
+        durations.rebuild()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_deleted_vendors_history_counts_as_unassigned(self):
+        in_progress = OrderStage.objects.filter(order=self.orders[0], status='In Progress')
+        vendor = in_progress.get().assigned_vendor
+        in_progress.update(assigned_vendor=None)
+        # Completes stages of `vendor` and an unassigned one of the same stage and month.
+        advance_orders([order.pk for order in self.orders])
+        self.assertTrue(StageDurationRollup.objects.filter(vendor=vendor).exists())
+        vendor.delete()
+        merged = self.rollup()
+        durations.rebuild()
+        self.assertEqual(merged, self.rollup())
+
+    def test_percentiles_come_from_the_histogram(self):
+        histogram = [0] * DURATION_BUCKETS
+        histogram[1], histogram[3], histogram[DURATION_BUCKETS - 1] = 5, 4, 1
+        self.assertEqual(durations.percentile(histogram, 0.5), 1)
+        self.assertEqual(durations.percentile(histogram, 0.9), 3)
+        self.assertEqual(durations.percentile(histogram, 1), DURATION_BUCKETS - 1)
+        self.assertIsNone(durations.percentile([0] * DURATION_BUCKETS, 0.5))
+
+
+class ReferenceDataTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        seed(customers=2, orders_per_customer=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_stage_forms_render_from_cache(self):
+        reference.stages(), reference.vendors(), workload.get_snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            OrderStageCreateForm().as_p()
+            OrderStageUpdateForm().as_p()
+        self.assertEqual(len(queries), 0)
+
+    def test_saves_invalidate_choices(self):
+        role = VendorRole.objects.get()
+        reference.vendors()
+        with self.captureOnCommitCallbacks(execute=True):
+            Vendor.objects.create(name='Newcomer', role=role)
+        self.assertIn('Newcomer', [vendor.name for vendor in reference.vendors()])
+
+
+class BenchmarkingTests(TestCase):
+
+    def test_summarise_reports_rate_and_percentiles(self):
+        result = benchmarking.summarise([0.001 * n for n in range(1, 101)], elapsed=2.0)
+        self.assertEqual(result['requests'], 100)
+        self.assertEqual(result['rps'], 50.0)
+        self.assertAlmostEqual(result['p50'], 50.5)
+        self.assertAlmostEqual(result['p99'], 99.01)
+        self.assertAlmostEqual(result['max'], 100.0)
+
+    def test_index_benchmark_drops_only_its_own_indexes(self):
+        seed()
+        out = io.StringIO()
+        call_command('benchmark_indexes', runs=1, no_plans=True, stdout=out)
+        self.assertIn('speedup', out.getvalue())
+        # Rolled back: every index is still there.
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Order._meta.db_table)
+        self.assertIn('order_placed_on_id_idx', constraints)
+
+    def test_index_benchmark_refuses_live_databases(self):
+        with mock.patch.dict(connection.settings_dict, NAME='clothing'):
+            with self.assertRaises(CommandError):
+                call_command('benchmark_indexes', stdout=io.StringIO())
+
+
+class AsyncViewTests(TransactionTestCase):
+    # Dashboard sections run on other threads and connections, which cannot
+    # see data held in TestCase's open transaction.
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('staff', password='secret')
+        seed(customers=5, orders_per_customer=3)
+
+    async def test_dashboard_matches_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('async_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_orders'], 15)
+        self.assertEqual(len(response.context['recent_orders']), 5)
+        self.assertEqual(response.context['user'], self.user)
+
+    async def test_order_list_pages_with_keyset_cursors(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('async_order_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['orders']), 15)
+        self.assertFalse(response.context['page'].has_next)
+
+    async def test_requires_login(self):
+        response = await self.async_client.get(reverse('async_order_list'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_event_stream_sends_backlog_then_new_transitions(self):
+        await self.async_client.aforce_login(self.user)
+        after = await sync_to_async(events.latest_id)()
+        order = await Order.objects.order_by('id').afirst()
+        await sync_to_async(advance_orders)([order.pk])
+
+        response = await self.async_client.get(reverse('transition_stream'), {'after': after})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await anext(content)).startswith(b'retry:'))
+            backlog = [await anext(content), await anext(content)]
+            self.assertIn(b'"kind": "stage_completed"', backlog[0])
+            self.assertIn(b'"kind": "stage_started"', backlog[1])
+
+            await sync_to_async(advance_orders)([order.pk])
+            live = await asyncio.wait_for(anext(content), 5)
+            self.assertIn(b'"kind": "stage_completed"', live)
+            self.assertIn(f'"id": {order.pk}'.encode(), live)
+        finally:
+            await content.aclose()
+
+
+class TransitionEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret')
+        cls.orders = seed(customers=2, orders_per_customer=1)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_stage_changes_are_logged_with_tile_deltas(self):
+        after = events.latest_id()
+        advance_orders([self.orders[0].pk])
+        stage = OrderStage.objects.filter(order=self.orders[1], status='Pending').order_by('stage_id').first()
+        self.client.post(
+            reverse('update_order_stage', args=[stage.pk]),
+            {'status': 'In Progress', 'assigned_vendor': stage.assigned_vendor_id},
+        )
+
+        logged = events.read(after)
+        self.assertEqual(
+            [(event['kind'], event['previous_status'], event['status'], event['tiles']) for event in logged],
+            [
+                ('stage_completed', 'In Progress', 'Completed', {'stages_in_progress': -1}),
+                ('stage_started', 'Pending', 'In Progress', {'stages_in_progress': 1}),
+                ('stage_updated', 'Pending', 'In Progress', {'stages_in_progress': 1}),
+            ],
+        )
+        self.assertEqual(logged[0]['order']['stages_completed'], 2)
+        self.assertEqual(logged[0]['order']['current_stage'], STAGE_NAMES[2])
+
+    def test_new_orders_are_logged_until_pruned(self):
+        after = events.latest_id()
+        order = Order.objects.create(customer=self.orders[0].customer, order_placed_on=date.today(), status='Pending')
+        [event] = events.read(after)
+        self.assertEqual(event['order']['id'], order.pk)
+        self.assertEqual(event['tiles'], {'total_orders': 1, 'pending_orders': 1})
+
+        logged = TransitionEvent.objects.count()
+        self.assertEqual(events.prune(timezone.now() + timedelta(minutes=1)), logged)
+        self.assertEqual(events.read(0), [])
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_seed_synthetic_generates_every_model(self):
+        call_command('seed_synthetic', orders=50, customers=10, measurements=3, stdout=io.StringIO())
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertEqual(Customer.objects.count(), 10)
+        self.assertEqual(OrderStage.objects.count(), 50 * PipelineStage.objects.count())
+        self.assertTrue(Measurement.objects.filter(value__has_key='waist').exists())
+        completed = OrderStage.objects.filter(status='Completed').count()
+        self.assertEqual(StageDurationRollup.objects.aggregate(n=Sum('count'))['n'], completed)
+
+    def test_bench_writes_a_baseline(self):
+        orders = seed(customers=2, orders_per_customer=1)
+        Order.objects.filter(pk=orders[0].pk).update(invoice=None)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'baseline.json'
+            call_command('bench', runs=2, routes=['dashboard', 'order_detail'], output=str(path), stdout=io.StringIO())
+            routes = json.loads(path.read_text())['routes']
+        self.assertEqual(set(routes), {'dashboard', 'order_detail'})
+        self.assertEqual(routes['dashboard']['status'], 200)
+        self.assertGreater(routes['order_detail']['queries'], 0)
+
+    def test_bench_fails_on_error_pages(self):
+        seed(customers=2, orders_per_customer=1)
+        # An existing benchmark user is made staff, so staff-only pages render.
+        get_user_model().objects.create_user(benchmarking.BENCHMARK_USER)
+        out = io.StringIO()
+        call_command('bench', runs=1, stdout=out, stderr=io.StringIO())
+        self.assertRegex(out.getvalue(), r'invoice_batch +200')
+
+        with mock.patch.dict(bench.ROUTE_ARGS, {'order_detail': lambda: [0]}):
+            with self.assertRaisesMessage(CommandError, 'order_detail'):
+                call_command('bench', runs=1, routes=['order_detail'], stdout=io.StringIO())
+
+
+class InstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        seed(customers=2, orders_per_customer=1)
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.clear()
+        self.client.force_login(self.user)
+
+    def test_server_timing_and_metrics(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order_list'))
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertGreater(instrumentation.registry.render_time.sums['order_list', 'GET'], 0)
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="order_list",method="GET"} 1', metrics)
+        self.assertIn('http_request_queries_bucket{view="order_list",method="GET",le="+Inf"} 1', metrics)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_log_their_sql(self):
+        with self.assertLogs('production_tracker.slow_requests') as logs:
+            self.client.get(reverse('order_list'))
+        self.assertIn('(order_list)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        response = self.client.get(reverse('order_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.registry.duration.counts, {})
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_metrics_require_the_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape'})
+        self.assertEqual(response.status_code, 200)
+
+
+class BatchInvoiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers = Customer.objects.bulk_create(
+            Customer(name=f'Customer {i}', email=f'customer{i}@example.com') for i in range(5)
+        )
+        today = date.today()
+        Order.objects.bulk_create(
+            Order(
+                customer=customer, order_placed_on=today, status=status, amount=100 * (n + 1),
+                completion_date=today - timedelta(days=n * 20) if status == 'Completed' else None,
+            )
+            for customer in cls.customers
+            for n, status in enumerate(['Completed', 'Completed', 'In Progress'])
+        )
+
+    def test_invoices_each_customers_completed_orders(self):
+        run = invoicing.invoice_completed_orders(batch_size=2)
+        self.assertEqual(run, invoicing.InvoiceRun(invoices=5, orders=10, total=5 * 300))
+        for customer in self.customers:
+            orders = Order.objects.filter(customer=customer, status='Completed')
+            invoice_ids = set(orders.values_list('invoice_id', flat=True))
+            self.assertEqual(len(invoice_ids), 1)
+            self.assertEqual(Invoice.objects.get(pk=invoice_ids.pop()).total_amount, 300)
+        self.assertFalse(Order.objects.filter(status='In Progress', invoice__isnull=False).exists())
+
+    def test_rerun_and_cutoff_skip_orders(self):
+        run = invoicing.invoice_completed_orders(until=date.today() - timedelta(days=1))
+        self.assertEqual((run.invoices, run.orders), (5, 5))
+        self.assertEqual(invoicing.pending_summary()['orders'], 5)
+        self.assertEqual(invoicing.invoice_completed_orders().orders, 5)
+        self.assertEqual(invoicing.invoice_completed_orders(), invoicing.InvoiceRun(0, 0, 0))
+
+    def test_batch_invoicing_is_staff_only(self):
+        user = get_user_model().objects.create_user('clerk', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.client.post(reverse('invoice_batch')).status_code, 403)
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_preview_uses_the_cutoff(self):
+        staff = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        until = date.today() - timedelta(days=1)
+        response = self.client.get(reverse('invoice_batch'), {'until': until})
+        self.assertEqual(response.context['pending']['orders'], 5)
+        response = self.client.post(reverse('invoice_batch'), {'until': until})
+        self.assertEqual(response.context['run'].orders, 5)
+        # Nothing left before the cutoff; the rest stay pending.
+        self.assertEqual(response.context['pending']['orders'], 0)
+        self.assertEqual(self.client.get(reverse('invoice_batch')).context['pending']['orders'], 5)
+
+
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        orders = seed(customers=4, orders_per_customer=2)
+        cls.old = orders[:3]
+        placed = date(date.today().year - 3, 6, 1)
+        Order.objects.filter(pk__in=[o.pk for o in cls.old]).update(status='Completed', order_placed_on=placed)
+        OrderStage.objects.filter(order__in=cls.old).update(status='Completed', end_date=placed + timedelta(days=2))
+        cls.cutoff = date(date.today().year - 1, 1, 1)
+
+    def test_moves_old_completed_orders_with_their_rows(self):
+        totals.recompute()
+        rollup_rows = durations.rebuild()
+
+        run = archive.archive_orders(self.cutoff, batch_size=2)
+        self.assertEqual(run, archive.ArchiveRun(3, 3 * len(STAGE_NAMES), 3))
+        self.assertFalse(Order.objects.filter(pk__in=[o.pk for o in self.old]).exists())
+        archived = ArchivedOrder.objects.prefetch_related('stages', 'particulars').get(pk=self.old[0].pk)
+        self.assertEqual(len(archived.stages.all()), len(STAGE_NAMES))
+        self.assertEqual(archived.particulars.get().amount, 1000)
+
+        # Invoice totals, dashboard counts and the duration rollup still include them.
+        self.assertEqual(totals.recompute(), (0, 0))
+        self.assertEqual(durations.rebuild(), rollup_rows)
+        cache.clear()
+        self.assertEqual(get_dashboard_stats()['total_orders'], 8)
+        self.assertEqual(archive.archive_orders(self.cutoff), archive.ArchiveRun(0, 0, 0))
+
+    def test_detach_year_leaves_standalone_tables(self):
+        archive.archive_orders(self.cutoff)
+        year = date.today().year - 3
+        tables = archive.detach_year(year)
+        self.assertEqual(len(tables), 3)
+        self.assertFalse(ArchivedOrder.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM production_tracker_order_archive_{year}')
+            self.assertEqual(cursor.fetchone()[0], 3)
+        self.assertEqual(archive.detach_year(year), [])
+
+    def test_repairs_keep_detached_years(self):
+        totals.recompute()
+        durations.rebuild()
+        invoice_totals = dict(Invoice.objects.values_list('id', 'total_amount'))
+        rollup = sorted(StageDurationRollup.objects.values_list('stage', 'vendor', 'month', 'count', 'total_days', 'histogram'))
+
+        archive.archive_orders(self.cutoff)
+        archive.detach_year(date.today().year - 3)
+        self.assertEqual(totals.recompute(), (0, 0))
+        self.assertEqual(dict(Invoice.objects.values_list('id', 'total_amount')), invoice_totals)
+        durations.rebuild()
+        self.assertEqual(
+            sorted(StageDurationRollup.objects.values_list('stage', 'vendor', 'month', 'count', 'total_days', 'histogram')),
+            rollup,
+        )
@@ -0,0 +1,110 @@
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .changes import mark_changed
+from .models import ArchivedOrder, DetachedInvoiceTotal, Invoice, Order, Particulars
+
+
+def apply_order_delta(order_id, delta):
+    """Add `delta` to an order's amount and to the total of the invoice it belongs to."""
+    if not delta or order_id is None:
+        return
+    Order.objects.filter(pk=order_id).update(amount=F('amount') + delta)
+    if Invoice.objects.filter(orders__id=order_id).update(total_amount=F('total_amount') + delta):
+        mark_changed(Order, Invoice)
+    else:
+        mark_changed(Order)
+
+
+def apply_invoice_delta(invoice_id, delta):
+    if not delta or invoice_id is None:
+        return
+    Invoice.objects.filter(pk=invoice_id).update(total_amount=F('total_amount') + delta)
+    mark_changed(Invoice)
+
+
+RECOMPUTE_SQL = """
+WITH order_totals AS (
+    SELECT o.id, o.invoice_id, COALESCE(SUM(p.amount), 0) AS total
+    FROM {order} o
+    LEFT JOIN {particulars} p ON p.order_id = o.id
+    GROUP BY o.id
+),
+updated_orders AS (
+    UPDATE {order} o
+    SET amount = t.total
+    FROM order_totals t
+    WHERE o.id = t.id AND o.amount <> t.total
+    RETURNING o.id
+),
+updated_invoices AS (
+    UPDATE {invoice} i
+    SET total_amount = s.total
+    FROM (
+        SELECT i.id, COALESCE(SUM(t.total), 0) AS total
+        FROM {invoice} i
+        LEFT JOIN (
+            SELECT invoice_id, total FROM order_totals
+            UNION ALL
+            -- Archived orders keep the amount they were archived with.
+            SELECT invoice_id, amount FROM {order_archive}
+            UNION ALL
+            -- Detached archive years, as saved by archive.detach_year.
+            SELECT invoice_id, amount FROM {detached}
+        ) t ON t.invoice_id = i.id
+        GROUP BY i.id
+    ) s
+    WHERE i.id = s.id AND i.total_amount <> s.total
+    RETURNING i.id
+)
+SELECT (SELECT COUNT(*) FROM updated_orders), (SELECT COUNT(*) FROM updated_invoices)
+"""
+
+
+# Saves what a year's archived orders add to each invoice's total, before
+# archive.detach_year detaches them.
+SAVE_DETACHED_SQL = """
+INSERT INTO {detached} (invoice_id, year, amount)
+SELECT invoice_id, %(year)s, SUM(amount) FROM {order_archive}
+WHERE order_placed_on >= %(start)s AND order_placed_on < %(end)s AND invoice_id IS NOT NULL
+GROUP BY invoice_id
+"""
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {
+        'order': qn(Order._meta.db_table),
+        'order_archive': qn(ArchivedOrder._meta.db_table),
+        'detached': qn(DetachedInvoiceTotal._meta.db_table),
+        'particulars': qn(Particulars._meta.db_table),
+        'invoice': qn(Invoice._meta.db_table),
+    }
+
+
+def save_detached(year):
+    """Save what `year`'s archived orders add to invoice totals, in the caller's transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SAVE_DETACHED_SQL.format(**_tables()),
+            {'year': year, 'start': date(year, 1, 1), 'end': date(year + 1, 1, 1)},
+        )
+
+
+def recompute():
+    """
+    Rebuild every Order.amount from its particulars and every
+    Invoice.total_amount from its orders, archived and detached ones included,
+    in one statement. Returns the number of (orders, invoices) that were out
+    of sync.
+    """
+    tables = _tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Hold off writers so no delta lands between the read and the update.
+        cursor.execute('LOCK TABLE {particulars}, {order}, {order_archive}, {detached} IN SHARE MODE'.format(**tables))
+        cursor.execute(RECOMPUTE_SQL.format(**tables))
+        orders, invoices = cursor.fetchone()
+        mark_changed(Order, Invoice)
+    return orders, invoices
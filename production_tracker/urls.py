@@ -1,11 +1,12 @@
 from django.urls import path
 from .views import (
     DashboardView,
-    OrderListView, OrderDetailView, UpdateOrderStageView, OrderCreateView,
-    CustomerListView, CustomerCreateView,
+    OrderExportView, InvoiceExportView, OrderStageExportView,
+    OrderListView, OrderDetailView, UpdateOrderStageView, BulkStageTransitionView, OrderCreateView,
+    CustomerListView, CustomerCreateView, CustomerSearchView,
     MeasurementListView, MeasurementCreateView,
-    VendorRoleListView, VendorListView,
-    PipelineStageListView, InvoiceListView,
+    VendorRoleListView, VendorListView, VendorWorkloadView,
+    PipelineStageListView, InvoiceListView, BatchInvoiceView,
     CustomLoginView
 )
 from django.contrib.auth.views import LogoutView
@@ -15,15 +16,22 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
     path('', DashboardView.as_view(), name='dashboard'),
     path('orders/', OrderListView.as_view(), name='order_list'),
+    path('orders/export/', OrderExportView.as_view(), name='order_export'),
     path('orders/new/', OrderCreateView.as_view(), name='order_new'),
     path('orders/<int:pk>/', OrderDetailView.as_view(), name='order_detail'),
     path('order-stage/<int:pk>/update/', UpdateOrderStageView.as_view(), name='update_order_stage'),
+    path('order-stage/export/', OrderStageExportView.as_view(), name='order_stage_export'),
+    path('order-stage/bulk-advance/', BulkStageTransitionView.as_view(), name='bulk_stage_transition'),
     path('customers/', CustomerListView.as_view(), name='customer_list'),
     path('customers/new/', CustomerCreateView.as_view(), name='customer_new'),
+    path('customers/search/', CustomerSearchView.as_view(), name='customer_search'),
     path('measurements/', MeasurementListView.as_view(), name='measurement_list'),
     path('measurements/new/', MeasurementCreateView.as_view(), name='measurement_new'),
     path('vendor-roles/', VendorRoleListView.as_view(), name='vendorrole_list'),
     path('vendors/', VendorListView.as_view(), name='vendor_list'),
+    path('vendors/workload/', VendorWorkloadView.as_view(), name='vendor_workload'),
     path('pipeline-stages/', PipelineStageListView.as_view(), name='pipelinestage_list'),
     path('invoices/', InvoiceListView.as_view(), name='invoice_list'),
+    path('invoices/export/', InvoiceExportView.as_view(), name='invoice_export'),
+    path('invoices/batch/', BatchInvoiceView.as_view(), name='invoice_batch'),
 ]
\ No newline at end of file
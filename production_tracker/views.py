@@ -1,14 +1,23 @@
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.views import View
-from django.views.generic import ListView, DetailView, TemplateView, CreateView
+from django.views.generic import ListView, DetailView, TemplateView, CreateView, FormView
 from django.urls import reverse_lazy
-from .models import Order, OrderStage, Customer, Measurement, VendorRole, Vendor, PipelineStage, Invoice
-from .forms import OrderStageUpdateForm, OrderForm, CustomerForm, MeasurementForm, OrderStageCreateForm
-from datetime import date
+from .models import Order, OrderStage, Customer, Measurement, VendorRole, Vendor, PipelineStage, Invoice, ArchivedOrder
+from .forms import (
+    OrderStageUpdateForm, OrderForm, CustomerForm, MeasurementForm, OrderStageCreateForm, BulkStageTransitionForm,
+    OrderFilterForm, MeasurementSearchForm, BatchInvoiceForm,
+)
 from django.contrib.auth.views import LoginView
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum, Count
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.db import transaction
+from django.db.models import Prefetch
+from . import durations, events, exports, invoicing, reference, workload
+from .customers import filter_customers, search_customers
+from .pagination import KeysetPaginationMixin
+from .pipeline import StageRow, advance_orders, complete_stages
+from .stats import get_dashboard_stats
 
 class CustomLoginView(LoginView):
     template_name = 'production_tracker/login.html'
@@ -31,51 +40,97 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # Order Analytics
-        context['total_orders'] = Order.objects.count()
-        context['pending_orders'] = Order.objects.filter(status='Pending').count()
-        context['in_progress_orders'] = Order.objects.filter(status='In Progress').count()
-        context['completed_orders'] = Order.objects.filter(status='Completed').count()
-        context['recent_orders'] = Order.objects.order_by('-order_placed_on')[:5]
 
-        # Vendor Analytics
-        context['total_vendors'] = Vendor.objects.count()
-
-        # Customer Analytics
-        context['total_customers'] = Customer.objects.count()
-
-        # Invoice Analytics
-        context['total_invoice_amount'] = Invoice.objects.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        context['paid_invoices'] = Invoice.objects.filter(paid=True).count()
-        context['unpaid_invoices'] = Invoice.objects.filter(paid=False).count()
-
-        # Order Stage Analytics
-        context['stages_in_progress'] = OrderStage.objects.filter(status='In Progress').count()
+        # Order, invoice, stage, vendor and customer tiles come from a cached snapshot
+        context.update(get_dashboard_stats())
+        context['recent_orders'] = Order.objects.select_related('customer').order_by('-order_placed_on')[:5]
+        # Where the page's live updates (events.stream) pick up.
+        context['live_after'] = events.latest_id
 
         return context
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Order
     template_name = 'production_tracker/order_list.html'
     context_object_name = 'orders'
+    # ?sort=waiting lists orders still in the pipeline, longest in their current stage first.
+    SORTS = {
+        'placed': ('-order_placed_on', '-id'),
+        'waiting': ('current_stage_since', 'id'),
+    }
+
+    @property
+    def keyset_ordering(self):
+        return self.SORTS.get(self.request.GET.get('sort'), self.SORTS['placed'])
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        status = self.request.GET.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        return queryset
+        queryset = super().get_queryset().select_related('customer', 'current_stage', 'current_vendor')
+        if self.request.GET.get('sort') == 'waiting':
+            queryset = queryset.filter(current_stage_since__isnull=False)
+        return OrderFilterForm(self.request.GET).filter(queryset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Called by the template while rendering, which the async list view does off the event loop.
+        context['stages'] = reference.stages
+        context['live_after'] = events.latest_id
+        return context
+
+class ExportView(LoginRequiredMixin, View):
+    """
+    CSV export of the rows matching the order filters. Unlike the order list,
+    which applies whichever filters validate, an invalid filter is a 400: a
+    mistyped date must not export the whole table.
+    """
+
+    def get(self, request):
+        form = OrderFilterForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text(), content_type='text/plain')
+        return self.export(form)
+
+class OrderExportView(ExportView):
+    def export(self, form):
+        orders = form.filter(Order.objects.all())
+        return exports.stream_csv('orders.csv', exports.ORDER_HEADER, exports.order_rows(orders))
+
+class InvoiceExportView(ExportView):
+    def export(self, form):
+        orders = form.filter(Order.objects.all())
+        archived = form.filter_archive(ArchivedOrder.objects.all())
+        return exports.stream_csv('invoices.csv', exports.INVOICE_HEADER, exports.invoice_rows(orders, archived))
+
+class OrderStageExportView(ExportView):
+    def export(self, form):
+        stages = form.filter(OrderStage.objects.all(), prefix='order__')
+        return exports.stream_csv('order_stages.csv', exports.STAGE_HEADER, exports.stage_rows(stages))
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
     model = Order
     template_name = 'production_tracker/order_detail.html'
     context_object_name = 'order'
 
+    def get_queryset(self):
+        stages = OrderStage.objects.select_related('stage', 'assigned_vendor').order_by('stage_id')
+        return super().get_queryset().select_related('customer', 'invoice').prefetch_related(
+            Prefetch('orderstage_set', queryset=stages)
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['stage_update_form'] = OrderStageUpdateForm()
         context['stage_create_form'] = OrderStageCreateForm()
+
+        # Least-loaded vendor that has handled each stage, from the cached workload index
+        stages = reference.stages()
+        suggested = workload.suggest_vendors([stage.id for stage in stages])
+        vendors = reference.vendors_by_id()
+        for order_stage in self.object.orderstage_set.all():
+            if order_stage.status != 'Completed':
+                order_stage.suggested_vendor = vendors.get(suggested.get(order_stage.stage_id))
+        context['stage_suggestions'] = [
+            (stage, vendors[suggested[stage.id]]) for stage in stages if suggested[stage.id] in vendors
+        ]
         return context
 
     def post(self, request, *args, **kwargs):
@@ -93,37 +148,128 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
 
 class UpdateOrderStageView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        order_stage = get_object_or_404(OrderStage, pk=pk)
-        form = OrderStageUpdateForm(request.POST, instance=order_stage)
-        if form.is_valid():
-            updated_stage = form.save(commit=False)
-            if updated_stage.status == 'Completed':
-                updated_stage.end_date = date.today()
-                
-                # Get the next stage in the sequence
-                # Assuming stages are ordered by their ID for simplicity in this example
-                next_stage = OrderStage.objects.filter(
-                    order=updated_stage.order, 
-                    stage__id__gt=updated_stage.stage.id
-                ).order_by('stage__id').first()
-
-                if next_stage:
-                    next_stage.status = 'In Progress'
-                    next_stage.save()
-
-            updated_stage.save()
-        return redirect('order_detail', pk=order_stage.order.pk)
-
-class CustomerListView(LoginRequiredMixin, ListView):
+        with transaction.atomic():
+            order_stage = get_object_or_404(OrderStage.objects.select_for_update(), pk=pk)
+            previous_status = order_stage.status
+            previous = StageRow(
+                order_stage.pk, order_stage.order_id, order_stage.stage_id, order_stage.assigned_vendor_id,
+                order_stage.start_date, order_stage.end_date,
+            )
+            form = OrderStageUpdateForm(request.POST, instance=order_stage)
+            if form.is_valid():
+                updated_stage = form.save(commit=False)
+                if updated_stage.status == 'Completed' and previous_status != 'Completed':
+                    # A reassignment moves the stage between vendors, which
+                    # rebuilds the workload snapshot; otherwise the transition
+                    # is folded into it incrementally.
+                    if 'assigned_vendor' in form.changed_data:
+                        updated_stage.save(update_fields=['assigned_vendor'])
+                    # Status, end date and the next stage are set in one statement.
+                    complete_stages([updated_stage.pk])
+                else:
+                    if previous_status == 'Completed' and form.has_changed():
+                        # Reopened or reassigned: its completion leaves the
+                        # duration rollup, to be counted again when it completes.
+                        if previous.end_date is not None:
+                            durations.remove_completions([previous])
+                        if updated_stage.status == 'Completed':
+                            if updated_stage.end_date is not None:
+                                durations.record_completions([updated_stage])
+                        else:
+                            updated_stage.end_date = None
+                    updated_stage.save()
+                    if form.has_changed():
+                        events.record_stage_update(updated_stage, previous_status)
+        return redirect('order_detail', pk=order_stage.order_id)
+
+class BulkStageTransitionView(LoginRequiredMixin, FormView):
+    form_class = BulkStageTransitionForm
+    template_name = 'production_tracker/bulk_stage_transition.html'
+
+    def form_valid(self, form):
+        transition = advance_orders(form.cleaned_data['orders'], stage=form.cleaned_data['stage'])
+        advanced = {row.order_id for row in transition.completed}
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(),
+            transition=transition,
+            skipped=[pk for pk in form.cleaned_data['orders'] if pk not in advanced],
+        ))
+
+class BatchInvoiceView(LoginRequiredMixin, UserPassesTestMixin, FormView):
+    """Staff only: one POST invoices every completed order in the system."""
+    form_class = BatchInvoiceForm
+    template_name = 'production_tracker/batch_invoice.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        # ?until= previews what a run with that cutoff would invoice.
+        if self.request.method == 'GET' and 'until' in self.request.GET:
+            kwargs['data'] = self.request.GET
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = context['form']
+        until = form.cleaned_data.get('until') if form.is_bound and form.is_valid() else form.initial.get('until')
+        context['until'] = until
+        context['pending'] = invoicing.pending_summary(until)
+        return context
+
+    def form_valid(self, form):
+        until = form.cleaned_data['until']
+        run = invoicing.invoice_completed_orders(until=until)
+        return self.render_to_response(self.get_context_data(form=self.form_class(initial={'until': until}), run=run))
+
+class VendorWorkloadView(LoginRequiredMixin, TemplateView):
+    template_name = 'production_tracker/vendor_workload.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        loads = workload.vendor_loads()
+        stages = reference.stages()
+        vendors = reference.vendors()
+        for vendor in vendors:
+            vendor.load = loads.get(vendor.pk) or workload.VendorLoad(vendor.pk)
+            vendor.stage_counts = [vendor.load.open_by_stage.get(stage.id, 0) for stage in stages]
+        by_id = {vendor.pk: vendor for vendor in vendors}
+        context['stages'] = stages
+        context['vendors'] = vendors
+        suggested = workload.suggest_vendors([stage.id for stage in stages])
+        context['suggestions'] = [(stage, by_id.get(suggested[stage.id])) for stage in stages]
+        return context
+
+class CustomerListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Customer
     template_name = 'production_tracker/customer_list.html'
     context_object_name = 'customers'
 
-class MeasurementListView(LoginRequiredMixin, ListView):
+    def get_queryset(self):
+        return filter_customers(super().get_queryset(), self.request.GET.get('q'))
+
+class CustomerSearchView(LoginRequiredMixin, View):
+    """JSON matches for the customer autocomplete widget."""
+
+    def get(self, request):
+        customers = search_customers(request.GET.get('q'))
+        return JsonResponse({'results': list(customers.values('id', 'name', 'email', 'phone'))})
+
+class MeasurementListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Measurement
     template_name = 'production_tracker/measurement_list.html'
     context_object_name = 'measurements'
 
+    def get_queryset(self):
+        self.search_form = MeasurementSearchForm(self.request.GET)
+        return self.search_form.filter(super().get_queryset().select_related('customer'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_form'] = self.search_form
+        return context
+
 class VendorRoleListView(LoginRequiredMixin, ListView):
     model = VendorRole
     template_name = 'production_tracker/vendorrole_list.html'
@@ -134,12 +280,15 @@ class VendorListView(LoginRequiredMixin, ListView):
     template_name = 'production_tracker/vendor_list.html'
     context_object_name = 'vendors'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('role')
+
 class PipelineStageListView(LoginRequiredMixin, ListView):
     model = PipelineStage
     template_name = 'production_tracker/pipelinestage_list.html'
     context_object_name = 'pipeline_stages'
 
-class InvoiceListView(LoginRequiredMixin, ListView):
+class InvoiceListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Invoice
     template_name = 'production_tracker/invoice_list.html'
     context_object_name = 'invoices'
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum, Value
+
+from .models import OrderStage
+
+WORKLOAD_KEY = 'vendor-workload:v1'
+# Incremental updates are read-modify-write on the cache, so concurrent
+# transitions can drift slightly; a periodic rebuild bounds that.
+WORKLOAD_TIMEOUT = 600
+# Average turnaround only looks at recently completed stages.
+TURNAROUND_WINDOW = timedelta(days=180)
+
+
+def _compute():
+    as_of = date.today()
+    rows = (
+        OrderStage.objects
+        .filter(assigned_vendor__isnull=False)
+        .filter(Q(status='In Progress') | Q(status='Completed', end_date__gte=as_of - TURNAROUND_WINDOW))
+        .values('assigned_vendor_id', 'stage_id')
+        .annotate(
+            open=Count('id', filter=Q(status='In Progress')),
+            open_age=Sum(Value(as_of) - F('start_date'), filter=Q(status='In Progress')),
+            completed=Count('id', filter=Q(status='Completed')),
+            turnaround=Sum(F('end_date') - F('start_date'), filter=Q(status='Completed')),
+        )
+    )
+    entries = {
+        (row['assigned_vendor_id'], row['stage_id']): {
+            'open': row['open'],
+            'open_age': row['open_age'].days if row['open_age'] else 0,
+            'completed': row['completed'],
+            'turnaround': row['turnaround'].days if row['turnaround'] else 0,
+        }
+        for row in rows
+    }
+    return {'as_of': as_of, 'entries': entries}
+
+
+def get_snapshot():
+    snapshot = cache.get(WORKLOAD_KEY)
+    if snapshot is None:
+        snapshot = _compute()
+        cache.set(WORKLOAD_KEY, snapshot, WORKLOAD_TIMEOUT)
+    return snapshot
+
+
+def invalidate():
+    cache.delete(WORKLOAD_KEY)
+
+
+def apply_transition(transition):
+    """Fold a pipeline.Transition into the cached snapshot instead of rebuilding it."""
+    snapshot = cache.get(WORKLOAD_KEY)
+    if snapshot is None:
+        return
+    as_of = snapshot['as_of']
+    entries = snapshot['entries']
+    empty = {'open': 0, 'open_age': 0, 'completed': 0, 'turnaround': 0}
+    for row in transition.completed:
+        if row.assigned_vendor_id is None:
+            continue
+        entry = entries.setdefault((row.assigned_vendor_id, row.stage_id), dict(empty))
+        entry['open'] = max(entry['open'] - 1, 0)
+        entry['open_age'] -= (as_of - row.start_date).days
+        entry['completed'] += 1
+        entry['turnaround'] += (row.end_date - row.start_date).days
+    for row in transition.started:
+        if row.assigned_vendor_id is None:
+            continue
+        entry = entries.setdefault((row.assigned_vendor_id, row.stage_id), dict(empty))
+        entry['open'] += 1
+        entry['open_age'] += (as_of - row.start_date).days
+    cache.set(WORKLOAD_KEY, snapshot, WORKLOAD_TIMEOUT)
+
+
+class VendorLoad:
+    def __init__(self, vendor_id):
+        self.vendor_id = vendor_id
+        self.open = 0
+        self.completed = 0
+        self.open_by_stage = {}
+        self._open_age = 0
+        self._turnaround = 0
+
+    @property
+    def avg_turnaround(self):
+        return round(self._turnaround / self.completed, 1) if self.completed else None
+
+    @property
+    def backlog_age(self):
+        return round(self._open_age / self.open, 1) if self.open else None
+
+
+def vendor_loads(snapshot=None):
+    """Return {vendor_id: VendorLoad} for every vendor with open or recent work."""
+    snapshot = snapshot or get_snapshot()
+    # Ages were summed as of the snapshot date; shift them to today.
+    drift = (date.today() - snapshot['as_of']).days
+    loads = {}
+    for (vendor_id, stage_id), entry in snapshot['entries'].items():
+        load = loads.setdefault(vendor_id, VendorLoad(vendor_id))
+        load.open += entry['open']
+        load.completed += entry['completed']
+        load._open_age += entry['open_age'] + drift * entry['open']
+        load._turnaround += entry['turnaround']
+        if entry['open']:
+            load.open_by_stage[stage_id] = entry['open']
+    return loads
+
+
+def _load_order(loads):
+    # Fewest open stages first, then the fastest turnaround.
+    return lambda vendor_id: (loads[vendor_id].open, loads[vendor_id].avg_turnaround or 0, vendor_id)
+
+
+def qualified_vendors(stage_id):
+    """Vendor ids that have handled `stage_id` recently, least loaded first."""
+    snapshot = get_snapshot()
+    candidates = [vendor_id for vendor_id, stage in snapshot['entries'] if stage == stage_id]
+    return sorted(candidates, key=_load_order(vendor_loads(snapshot)))
+
+
+def suggest_vendors(stage_ids):
+    """{stage_id: least-loaded qualified vendor id, or None}, from one pass over the snapshot."""
+    snapshot = get_snapshot()
+    by_load = _load_order(vendor_loads(snapshot))
+    best = {}
+    for vendor_id, stage_id in snapshot['entries']:
+        if stage_id not in best or by_load(vendor_id) < by_load(best[stage_id]):
+            best[stage_id] = vendor_id
+    return {stage_id: best.get(stage_id) for stage_id in stage_ids}
+
+
+def suggest_vendor(stage_id):
+    return suggest_vendors([stage_id])[stage_id]